@@ -0,0 +1,1429 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks do Sistema Acadêmico
+- Rodam sempre em um banco temporário (nunca no gestor_academico.db)
+- Uso:
+    python3 benchmarks.py [cenario ...]
+    python3 benchmarks.py gerar --alunos 100000 --banco dados.db
+    python3 benchmarks.py suite --alunos 10000 [--json saida.json] [--comparar anterior.json]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import sistema_academico as sa
+
+
+# ============================
+# UTILITÁRIOS
+# ============================
+def banco_temporario() -> str:
+    """Aponta o sistema para um arquivo novo e cria o schema."""
+    pasta = tempfile.mkdtemp(prefix="bench_academico_")
+    sa.fechar_conexoes()
+    sa.DB_NAME = os.path.join(pasta, "bench.db")
+    sa.inicializar()
+    return sa.DB_NAME
+
+def cronometrar(func, repeticoes: int):
+    """Executa func(i) repeticoes vezes e devolve a lista de latências (s)."""
+    tempos = []
+    for i in range(repeticoes):
+        t0 = time.perf_counter()
+        func(i)
+        tempos.append(time.perf_counter() - t0)
+    return tempos
+
+def resumo(nome: str, tempos):
+    media = statistics.mean(tempos)
+    print(f"{nome:<40} média {media * 1e6:9.1f} µs | total {sum(tempos):7.3f} s | n={len(tempos)}")
+    return media
+
+def popular_basico(n_cursos: int = 50, n_turmas: int = 200, n_alunos: int = 1000):
+    with sa.transacao() as con:
+        con.executemany("INSERT INTO cursos (codigo, nome) VALUES (?,?)",
+                        [(f"C{i:04d}", f"Curso {i}") for i in range(n_cursos)])
+        turmas = []
+        for i in range(n_turmas):
+            horario = f"{('seg', 'ter', 'qua', 'qui', 'sex')[i % 5]}-{8 + (i // 5) % 12}-{9 + (i // 5) % 12}"
+            turmas.append((f"T{i:05d}", f"C{i % n_cursos:04d}", f"Prof {i % 40}", horario, 10_000,
+                           *sa.colunas_horario(horario)))
+        con.executemany("INSERT INTO turmas (codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas, dia, hora_ini, hora_fim) VALUES (?,?,?,?,?,0,?,?,?)",
+                        turmas)
+        con.executemany("INSERT INTO alunos (matricula, nome) VALUES (?,?)",
+                        [(f"A{i:07d}", f"Aluno {i}") for i in range(n_alunos)])
+
+
+# ============================
+# GERADOR DE DADOS SINTÉTICOS
+# ============================
+DIAS = ("seg", "ter", "qua", "qui", "sex")
+NOMES = ("Ana", "Bruno", "Carla", "Diego", "Elaine", "Fábio", "Gabriela", "Heitor", "Íris", "João",
+         "Karina", "Lucas", "Marina", "Nicolas", "Otávio", "Paula", "Rafael", "Sofia", "Tiago", "Vitória")
+SOBRENOMES = ("Silva", "Souza", "Oliveira", "Santos", "Lima", "Pereira", "Ferreira", "Costa",
+              "Rodrigues", "Almeida", "Nascimento", "Araújo", "Gomes", "Ribeiro", "Conceição")
+
+def gerar_dados(n_alunos: int, semente: int = 42, historico_por_aluno: int = 6,
+                correntes_por_aluno: int = 2, bloco: int = 20_000) -> dict:
+    """
+    Popula o banco atual (sa.DB_NAME) de forma determinística para a semente dada:
+    - cursos com pré-requisitos formando um DAG (só apontam para cursos anteriores)
+    - turmas com horário, professor e vagas
+    - alunos com histórico (notas, respeitando pré-requisitos) e matrículas correntes
+    Escala de 1 mil a 1 milhão de alunos; alunos/matrículas são gravados em blocos.
+    """
+    rnd = random.Random(semente)
+    n_cursos = min(2000, max(20, n_alunos // 50))
+    n_professores = max(10, n_cursos // 3)
+
+    prereqs = []
+    for i in range(n_cursos):
+        candidatos = range(max(0, i - 40), i)
+        qtd = rnd.choice((0, 0, 1, 1, 2)) if i else 0
+        prereqs.append(sorted(rnd.sample(candidatos, min(qtd, len(candidatos)))))
+
+    turmas_do_curso = []
+    turmas = []
+    for c in range(n_cursos):
+        codigos = []
+        for k in range(rnd.choice((1, 2, 2, 3))):
+            codigo = f"T{len(turmas):06d}"
+            ini = rnd.randrange(8, 21, 2)
+            horario = f"{rnd.choice(DIAS)}-{ini}-{ini + 2}"
+            turmas.append([codigo, f"C{c:04d}", f"Prof {rnd.randrange(n_professores):04d}", horario, 0, 0])
+            codigos.append(len(turmas) - 1)
+        turmas_do_curso.append(codigos)
+
+    with sa.transacao() as con:
+        con.executemany("INSERT INTO cursos (codigo, nome) VALUES (?,?)",
+                        [(f"C{c:04d}", f"Curso {c}") for c in range(n_cursos)])
+        con.executemany("INSERT INTO prerequisitos VALUES (?,?,?)",
+                        [(f"C{c:04d}", f"C{p:04d}", pos) for c, ps in enumerate(prereqs) for pos, p in enumerate(ps)])
+        con.executemany("""
+            INSERT INTO turmas (codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas, dia, hora_ini, hora_fim)
+            VALUES (?,?,?,?,0,0,?,?,?)
+        """, [(codigo, curso, prof, horario, *sa.colunas_horario(horario)) for codigo, curso, prof, horario, _, _ in turmas])
+
+    total_matriculas = 0
+    for inicio in range(0, n_alunos, bloco):
+        alunos, matriculas = [], []
+        for a in range(inicio, min(n_alunos, inicio + bloco)):
+            matricula = f"A{a:07d}"
+            alunos.append((matricula, f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"))
+            aprovados = set()
+            cursados = set()
+            # histórico: percorre cursos em ordem (ordem topológica do DAG)
+            for c in sorted(rnd.sample(range(n_cursos), min(n_cursos, historico_por_aluno * 2))):
+                if len(cursados) >= historico_por_aluno:
+                    break
+                if not all(p in aprovados for p in prereqs[c]):
+                    continue
+                t = rnd.choice(turmas_do_curso[c])
+                nota = round(min(10.0, max(0.0, rnd.gauss(7.0, 2.0))), 1)
+                freq = float(rnd.randrange(40, 101))
+                matriculas.append((matricula, turmas[t][0], nota, freq))
+                turmas[t][5] += 1
+                cursados.add(c)
+                if nota >= 6:
+                    aprovados.add(c)
+            # semestre corrente: sem nota
+            candidatos = rnd.sample(range(n_cursos), min(n_cursos, correntes_por_aluno * 8))
+            livres = [c for c in candidatos if c not in cursados and all(p in aprovados for p in prereqs[c])]
+            for c in livres[:correntes_por_aluno]:
+                t = rnd.choice(turmas_do_curso[c])
+                matriculas.append((matricula, turmas[t][0], None, None))
+                turmas[t][5] += 1
+        with sa.transacao() as con:
+            con.executemany("INSERT INTO alunos (matricula, nome) VALUES (?,?)", alunos)
+            con.executemany("INSERT INTO matriculas (aluno_matricula, turma_codigo, nota, frequencia) VALUES (?,?,?,?)",
+                            matriculas)
+        total_matriculas += len(matriculas)
+
+    with sa.transacao() as con:
+        con.executemany("UPDATE turmas SET limite_vagas=?, vagas_ocupadas=? WHERE codigo=?",
+                        [(t[5] + rnd.randrange(5, 40), t[5], t[0]) for t in turmas])
+    sa.reconstruir_desempenho()
+    sa.obter_conexao().execute("ANALYZE")
+    return {"alunos": n_alunos, "cursos": n_cursos, "turmas": len(turmas),
+            "matriculas": total_matriculas, "semente": semente}
+
+
+# ============================
+# SUÍTE PONTA A PONTA (p50/p95/p99, JSON)
+# ============================
+def percentis(tempos):
+    ordenados = sorted(tempos)
+    def p(q):
+        return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+    total = sum(tempos)
+    return {"n": len(tempos), "p50_ms": p(0.50) * 1e3, "p95_ms": p(0.95) * 1e3, "p99_ms": p(0.99) * 1e3,
+            "media_ms": total / len(tempos) * 1e3, "ops_s": len(tempos) / total if total else None}
+
+def bench_suite(n_alunos: int = 10_000, semente: int = 42, amostras: int = 2000,
+                saida_json: Optional[str] = None, comparar: Optional[str] = None) -> dict:
+    """Gera um banco sintético e mede os fluxos principais; opcionalmente salva/compara JSON."""
+    banco_temporario()
+    t0 = time.perf_counter()
+    dados = gerar_dados(n_alunos, semente)
+    print(f"\n=== Suíte ({dados['alunos']} alunos, {dados['cursos']} cursos, {dados['turmas']} turmas, "
+          f"{dados['matriculas']} matrículas; gerado em {time.perf_counter() - t0:.1f} s) ===")
+
+    rnd = random.Random(semente + 1)
+    con = sa.obter_conexao()
+    alunos = [f"A{rnd.randrange(n_alunos):07d}" for _ in range(amostras)]
+    turmas = [r[0] for r in con.execute("SELECT codigo FROM turmas")]
+    cursos_com_turma = [r[0] for r in con.execute("SELECT DISTINCT curso_codigo FROM turmas")]
+    turmas_com_matricula = [r[0] for r in con.execute("SELECT DISTINCT turma_codigo FROM matriculas")]
+    alunos_com_matricula = [r[0] for r in con.execute("SELECT DISTINCT aluno_matricula FROM matriculas LIMIT ?",
+                                                      (amostras,))]
+
+    operacoes = {
+        "matricular": (lambda i: sa.matricular(alunos[i], rnd.choice(turmas)), amostras),
+        "relatorio_historico": (lambda i: sa.relatorio_historico(alunos[i]), amostras),
+        "calcular_cr": (lambda i: sa.calcular_cr(alunos[i]), amostras),
+        "ranking_cr_top100": (lambda i: sa.ranking_cr(100), min(amostras, 200)),
+        "listar_cursos": (lambda i: sa.listar_cursos(), 20),
+        "listar_turmas": (lambda i: sa.listar_turmas(), 20),
+        "listar_alunos": (lambda i: sa.listar_alunos(), 3),
+        "iterar_alunos_1a_pagina": (lambda i: next(iter(sa.iterar_alunos())), min(amostras, 500)),
+        "guarda_excluir_curso": (lambda i: sa.excluir_curso(cursos_com_turma[i % len(cursos_com_turma)]), amostras),
+        "guarda_excluir_turma": (lambda i: sa.excluir_turma(turmas_com_matricula[i % len(turmas_com_matricula)]), amostras),
+        "guarda_excluir_aluno": (lambda i: sa.excluir_aluno(alunos_com_matricula[i % len(alunos_com_matricula)]), amostras),
+    }
+    resultados = {}
+    for nome, (func, n) in operacoes.items():
+        resultados[nome] = percentis(cronometrar(func, n))
+        r = resultados[nome]
+        print(f"{nome:<26} p50 {r['p50_ms']:9.3f} ms | p95 {r['p95_ms']:9.3f} ms | p99 {r['p99_ms']:9.3f} ms "
+              f"| {r['ops_s']:10.0f} ops/s")
+    sa.fechar_conexoes()
+
+    relatorio = {
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "versao_schema": sa.SCHEMA_VERSAO,
+        "dados": dados,
+        "operacoes": resultados,
+    }
+    if saida_json:
+        with open(saida_json, "w", encoding="utf-8") as arq:
+            json.dump(relatorio, arq, indent=2, ensure_ascii=False)
+        print(f"Resultados salvos em {saida_json}")
+    if comparar:
+        with open(comparar, encoding="utf-8") as arq:
+            anterior = json.load(arq)
+        print(f"\n--- comparação com {comparar} (p95; >1 = mais lento agora) ---")
+        for nome, r in resultados.items():
+            antes = anterior.get("operacoes", {}).get(nome)
+            if antes and antes["p95_ms"]:
+                razao = r["p95_ms"] / antes["p95_ms"]
+                alerta = "  ⚠ regressão" if razao > 1.2 else ""
+                print(f"{nome:<26} {antes['p95_ms']:9.3f} -> {r['p95_ms']:9.3f} ms ({razao:4.2f}x){alerta}")
+    return relatorio
+
+
+# ============================
+# CENÁRIOS
+# ============================
+def bench_conexoes(repeticoes: int = 2000):
+    """Conexão por chamada (comportamento antigo) x conexão reaproveitada."""
+    banco_temporario()
+    popular_basico()
+
+    def legado_curso_por_codigo(i):
+        # mesmo padrão das versões anteriores: abre, consulta e fecha
+        con = sqlite3.connect(sa.DB_NAME)
+        cur = con.cursor()
+        cur.execute("SELECT codigo, nome FROM cursos WHERE codigo=?", (f"C{i % 50:04d}",))
+        cur.fetchone()
+        con.close()
+
+    def legado_registrar_nota(i):
+        con = sqlite3.connect(sa.DB_NAME)
+        cur = con.cursor()
+        cur.execute("UPDATE matriculas SET nota=? WHERE aluno_matricula=? AND turma_codigo=?",
+                    (7.0, f"A{i % 1000:07d}", "T00000"))
+        con.commit()
+        con.close()
+
+    print("\n=== Conexões: por chamada x gerenciador ===")
+    antigo = resumo("curso_por_codigo (conexão por chamada)", cronometrar(legado_curso_por_codigo, repeticoes))
+    novo = resumo("curso_por_codigo (gerenciador)", cronometrar(lambda i: sa.curso_por_codigo(f"C{i % 50:04d}"), repeticoes))
+    print(f"  -> ganho: {antigo / novo:.1f}x")
+    antigo = resumo("registrar_nota (conexão por chamada)", cronometrar(legado_registrar_nota, repeticoes))
+    novo = resumo("registrar_nota (gerenciador)", cronometrar(lambda i: sa.registrar_nota(f"A{i % 1000:07d}", "T00000", 7.0), repeticoes))
+    print(f"  -> ganho: {antigo / novo:.1f}x")
+    sa.fechar_conexoes()
+
+
+def _trabalhador_matricula(args):
+    """Processo filho: tenta matricular sua fatia de alunos (duas vezes cada) na mesma turma."""
+    caminho, turma, alunos = args
+    sa.DB_NAME = caminho
+    resultados = {"ok": 0, "sem_vaga": 0, "duplicada": 0, "outros": 0}
+    for a in alunos:
+        for _ in range(2):
+            msg = sa.matricular(a, turma)
+            if msg.startswith("✅"):
+                resultados["ok"] += 1
+            elif "sem vagas" in msg:
+                resultados["sem_vaga"] += 1
+            elif "já está matriculado" in msg:
+                resultados["duplicada"] += 1
+            else:
+                resultados["outros"] += 1
+    sa.fechar_conexoes()
+    return resultados
+
+def bench_concorrencia(n_alunos: int = 2000, limite: int = 500, trabalhadores=(1, 2, 4, 8)):
+    """N processos matriculando na mesma turma: nunca pode haver overbooking nem duplicidade."""
+    print("\n=== Matrícula concorrente (multi-processo) ===")
+    for n in trabalhadores:
+        caminho = banco_temporario()
+        popular_basico(n_turmas=1, n_alunos=n_alunos)
+        with sa.transacao() as con:
+            con.execute("UPDATE turmas SET limite_vagas=? WHERE codigo='T00000'", (limite,))
+        sa.fechar_conexoes()
+
+        alunos = [f"A{i:07d}" for i in range(n_alunos)]
+        fatias = [(caminho, "T00000", alunos[i::n]) for i in range(n)]
+        t0 = time.perf_counter()
+        with multiprocessing.Pool(n) as pool:
+            parciais = pool.map(_trabalhador_matricula, fatias)
+        duracao = time.perf_counter() - t0
+
+        total = {k: sum(p[k] for p in parciais) for k in parciais[0]}
+        con = sa.obter_conexao()
+        ocupadas = con.execute("SELECT vagas_ocupadas FROM turmas WHERE codigo='T00000'").fetchone()[0]
+        linhas = con.execute("SELECT COUNT(*) FROM matriculas WHERE turma_codigo='T00000'").fetchone()[0]
+        distintas = con.execute("SELECT COUNT(DISTINCT aluno_matricula) FROM matriculas").fetchone()[0]
+        sa.fechar_conexoes()
+
+        assert total["ok"] == ocupadas == linhas == distintas == limite, (total, ocupadas, linhas, distintas)
+        assert total["outros"] == 0, total
+        print(f"{n} processo(s): {2 * n_alunos / duracao:8.0f} tentativas/s | "
+              f"ok={total['ok']} sem_vaga={total['sem_vaga']} duplicada={total['duplicada']} "
+              f"| vagas_ocupadas={ocupadas}/{limite} ✔")
+
+
+def _pedidos_semestre(n_alunos: int, n_turmas: int, por_aluno: int):
+    """Pedidos determinísticos, com repetições e choques de horário de propósito."""
+    return [(f"A{a:07d}", f"T{(a * 7 + k * 13) % n_turmas:05d}")
+            for a in range(n_alunos) for k in range(por_aluno)]
+
+def bench_lote(n_alunos: int = 5000, n_turmas: int = 400, por_aluno: int = 4):
+    """matricular() em laço x matricular_lote() sobre o mesmo conjunto de pedidos."""
+    pedidos = _pedidos_semestre(n_alunos, n_turmas, por_aluno)
+    print(f"\n=== Matrícula em lote ({len(pedidos)} pedidos) ===")
+
+    banco_temporario()
+    popular_basico(n_turmas=n_turmas, n_alunos=n_alunos)
+    t0 = time.perf_counter()
+    esperado = [sa.matricular(a, t) for a, t in pedidos]
+    laco = time.perf_counter() - t0
+    estado_laco = sa.obter_conexao().execute(
+        "SELECT aluno_matricula, turma_codigo FROM matriculas ORDER BY 1, 2").fetchall()
+
+    banco_temporario()
+    popular_basico(n_turmas=n_turmas, n_alunos=n_alunos)
+    t0 = time.perf_counter()
+    obtido = sa.matricular_lote(pedidos)
+    lote = time.perf_counter() - t0
+    estado_lote = sa.obter_conexao().execute(
+        "SELECT aluno_matricula, turma_codigo FROM matriculas ORDER BY 1, 2").fetchall()
+    sa.fechar_conexoes()
+
+    assert obtido == esperado, "matricular_lote divergiu de matricular()"
+    assert estado_lote == estado_laco
+    print(f"{'laço de matricular()':<40} {laco:7.3f} s | {len(pedidos) / laco:9.0f} pedidos/s")
+    print(f"{'matricular_lote()':<40} {lote:7.3f} s | {len(pedidos) / lote:9.0f} pedidos/s")
+    print(f"  -> ganho: {laco / lote:.1f}x | {len(estado_lote)} matrículas efetivadas (mesmo resultado)")
+    print(f"  -> meta de 10x: {'atingida' if laco / lote >= 10 else 'NÃO atingida'}")
+
+def bench_conflitos(n_horarios: int = 60, candidatos: int = 5000):
+    """Laço par a par com horarios_conflitam() x AgendaAluno (máscara por dia)."""
+    dias = ("seg", "ter", "qua", "qui", "sex", "sab")
+    # aluno com muitas turmas, todas sem conflito entre si
+    ocupados = [f"{dias[i % 6]}-{i // 6}-{i // 6 + 1}" for i in range(n_horarios)]
+    novos = [f"{dias[i % 6]}-{(i * 7) % 24}-{(i * 7) % 24 + 2}" for i in range(candidatos)]
+
+    agenda = sa.AgendaAluno()
+    for h in ocupados:
+        agenda.adicionar(h, *sa.colunas_horario(h))
+
+    def laco(i):
+        h_novo = novos[i]
+        return any(sa.horarios_conflitam(h, h_novo) for h in ocupados)
+
+    assert all(laco(i) == (not agenda.cabe(novos[i])) for i in range(candidatos))
+    print(f"\n=== Conflito de horário ({n_horarios} turmas no histórico) ===")
+    antigo = resumo("horarios_conflitam() par a par", cronometrar(laco, candidatos))
+    novo = resumo("AgendaAluno.cabe()", cronometrar(lambda i: agenda.cabe(novos[i]), candidatos))
+    print(f"  -> ganho: {antigo / novo:.1f}x")
+
+def bench_cache(repeticoes: int = 20000):
+    """Consultas repetidas de curso/turma/aluno com e sem o cache de leitura."""
+    banco_temporario()
+    popular_basico()
+
+    def consultas(i):
+        sa.curso_por_codigo(f"C{i % 50:04d}")
+        sa.turma_por_codigo(f"T{i % 200:05d}")
+        sa.aluno_por_matricula(f"A{i % 1000:07d}")
+
+    print("\n=== Cache de leitura (curso + turma + aluno por iteração) ===")
+    sa.definir_cache(False)
+    sem = resumo("sem cache", cronometrar(consultas, repeticoes))
+    sa.definir_cache(True)
+    com = resumo("com cache", cronometrar(consultas, repeticoes))
+    for nome, est in sa.estatisticas_cache().items():
+        total = est["acertos"] + est["falhas"]
+        print(f"  {nome:<8} acertos={est['acertos']} falhas={est['falhas']} taxa={est['acertos'] / total:.1%}")
+    print(f"  -> ganho: {sem / com:.1f}x")
+    sa.fechar_conexoes()
+
+def bench_cr(n_alunos: int = 5000, n_turmas: int = 200, por_aluno: int = 6, k: int = 20):
+    """Ranking de CR: recálculo aluno a aluno x agregado materializado."""
+    banco_temporario()
+    popular_basico(n_turmas=n_turmas, n_alunos=n_alunos)
+    sa.matricular_lote(_pedidos_semestre(n_alunos, n_turmas, por_aluno))
+    con = sa.obter_conexao()
+    linhas = con.execute("SELECT aluno_matricula, turma_codigo FROM matriculas").fetchall()
+    for i, (a, t) in enumerate(linhas):
+        sa.registrar_nota(a, t, (i * 37 % 101) / 10)
+    for i, (a, t) in enumerate(linhas[::3]):
+        sa.registrar_nota(a, t, (i * 53 % 101) / 10)   # trocas de nota também
+    assert sa.verificar_desempenho() == []
+
+    def cohort_antigo():
+        crs = []
+        for (m,) in con.execute("SELECT matricula FROM alunos"):
+            notas = [r[0] for r in con.execute(
+                "SELECT nota FROM matriculas WHERE aluno_matricula=? AND nota IS NOT NULL", (m,))]
+            if notas:
+                crs.append((m, sum(notas) / len(notas)))
+        crs.sort(key=lambda x: (x[1], x[0]), reverse=True)
+        return crs[:k]
+
+    print(f"\n=== Ranking de CR ({n_alunos} alunos, {len(linhas)} matrículas) ===")
+    antigo = resumo("recalcular CR de cada aluno", cronometrar(lambda i: cohort_antigo(), 5))
+    novo = resumo("ranking_cr() (agregado)", cronometrar(lambda i: sa.ranking_cr(k), 5))
+    assert [m for m, _ in cohort_antigo()] == [m for m, _ in sa.ranking_cr(k)]
+    print(f"  -> ganho: {antigo / novo:.0f}x | verificar_desempenho(): consistente")
+    sa.fechar_conexoes()
+
+def _escrever_csv_notas(caminho: str, linhas, n: int, sem_matricula_cada: int = 20):
+    with open(caminho, "w", encoding="utf-8") as arq:
+        arq.write("matricula;turma;nota;frequencia\n")
+        for i in range(n):
+            a, t = linhas[i % len(linhas)]
+            if i % sem_matricula_cada == 0:
+                t = "T99999"
+            arq.write(f"{a};{t};{(i * 37 % 101) / 10:.1f}".replace(".", ",") + f";{50 + i % 51}\n")
+
+def bench_importacao(n_alunos: int = 5000, n_turmas: int = 200, por_aluno: int = 6):
+    """Importação de CSV em blocos x registrar_nota/registrar_frequencia linha a linha."""
+    banco_temporario()
+    popular_basico(n_turmas=n_turmas, n_alunos=n_alunos)
+    sa.matricular_lote(_pedidos_semestre(n_alunos, n_turmas, por_aluno))
+    linhas = sa.obter_conexao().execute("SELECT aluno_matricula, turma_codigo FROM matriculas").fetchall()
+    pasta = os.path.dirname(sa.DB_NAME)
+
+    print(f"\n=== Importação de notas por CSV ({len(linhas)} matrículas) ===")
+    amostra = 5000
+    caminho = os.path.join(pasta, "amostra.csv")
+    _escrever_csv_notas(caminho, linhas, amostra)
+
+    def laco(_):
+        for i in range(amostra):
+            a, t = linhas[i % len(linhas)]
+            if i % 20 == 0:
+                t = "T99999"
+            sa.registrar_nota(a, t, (i * 37 % 101) / 10)
+            sa.registrar_frequencia(a, t, 50 + i % 51)
+
+    antigo = resumo(f"registrar_* linha a linha ({amostra})", cronometrar(laco, 1))
+    novo = resumo(f"importar_notas_csv ({amostra})", cronometrar(lambda _: sa.importar_notas_csv(caminho), 1))
+    print(f"  -> ganho: {antigo / novo:.1f}x")
+
+    # memória: o pico não deve crescer com o tamanho do arquivo (tracemalloc deixa tudo
+    # bem mais lento, então a vazão é medida numa segunda rodada sem ele)
+    for n in (20_000, 200_000):
+        caminho = os.path.join(pasta, f"notas_{n}.csv")
+        _escrever_csv_notas(caminho, linhas, n)
+        tracemalloc.start()
+        resultado = sa.importar_notas_csv(caminho)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        t0 = time.perf_counter()
+        sa.importar_notas_csv(caminho)
+        duracao = time.perf_counter() - t0
+        print(f"{n:>8} linhas: {duracao:6.2f} s | {n / duracao:8.0f} linhas/s | pico {pico / 2**20:5.1f} MiB "
+              f"| sem matrícula={resultado.sem_matricula}")
+    assert sa.verificar_desempenho() == []
+    print("  verificar_desempenho(): consistente")
+    sa.fechar_conexoes()
+
+def bench_listagem(n_alunos: int = 200_000):
+    """listar_alunos() (lista completa) x iterar_alunos() (páginas por chave)."""
+    banco_temporario()
+    popular_basico(n_turmas=2000, n_alunos=n_alunos)
+
+    def medir(rotulo, func):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        primeiro, total = func()
+        duracao = time.perf_counter() - t0
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{rotulo:<40} 1º item {primeiro * 1e3:8.2f} ms | total {duracao:6.2f} s | pico {pico / 2**20:7.1f} MiB")
+
+    def lista():
+        t0 = time.perf_counter()
+        alunos = sa.listar_alunos()
+        primeiro = time.perf_counter() - t0
+        return primeiro, len(alunos)
+
+    def streaming():
+        t0 = time.perf_counter()
+        primeiro, total = None, 0
+        for _ in sa.iterar_alunos():
+            if primeiro is None:
+                primeiro = time.perf_counter() - t0
+            total += 1
+        return primeiro, total
+
+    print(f"\n=== Listagem de alunos ({n_alunos}) ===")
+    medir("listar_alunos() (lista completa)", lista)
+    medir("iterar_alunos() (keyset, 500/página)", streaming)
+    assert [a.matricula for a in sa.iterar_alunos(tamanho_pagina=777)] == [a.matricula for a in sa.listar_alunos()]
+    assert all(t.curso_codigo == "C0003" for t in sa.iterar_turmas(curso_codigo="C0003"))
+    assert all(a.nome.startswith("Aluno 12") for a in sa.iterar_alunos("Aluno 12"))
+    sa.fechar_conexoes()
+
+@dataclass
+class MatriculaComDict(sa.EntidadeBase):
+    """Como os modelos eram antes (dataclass comum, com __dict__), só para comparação."""
+    aluno_matricula: str
+    turma_codigo: str
+    nota: Optional[float] = None
+    frequencia: Optional[float] = None
+
+def bench_modelos(n: int = 500_000, n_alunos: int = 200_000):
+    """Memória/tempo por objeto: dataclass com __dict__ x __slots__ x tuplas; listagens por formato."""
+    linhas = [(f"A{i % 100_000:07d}", f"T{i % 2000:05d}", (i % 101) / 10, float(i % 100)) for i in range(n)]
+
+    def medir(rotulo, construir):
+        # tempo sem tracemalloc (ele deixa as alocações bem mais lentas); memória numa 2ª rodada
+        t0 = time.perf_counter()
+        construir()
+        duracao = time.perf_counter() - t0
+        tracemalloc.start()
+        objetos = construir()
+        atual, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{rotulo:<40} {duracao:6.3f} s | {atual / len(objetos):6.1f} bytes/objeto")
+
+    print(f"\n=== Modelos ({n} matrículas sintéticas) ===")
+    medir("dataclass com __dict__ (antes)", lambda: [MatriculaComDict(*l) for l in linhas])
+    medir("dataclass(slots=True) (Matricula)", lambda: [sa.Matricula(*l) for l in linhas])
+    medir("tuplas (sem objeto)", lambda: [(a, t, nota, freq) for a, t, nota, freq in linhas])
+
+    banco_temporario()
+    popular_basico(n_alunos=n_alunos)
+    print(f"\n=== listar_alunos() por formato ({n_alunos} alunos) ===")
+    for formato in sa.FORMATOS:
+        t0 = time.perf_counter()
+        sa.listar_alunos(formato=formato)
+        duracao = time.perf_counter() - t0
+        tracemalloc.start()
+        resultado = sa.listar_alunos(formato=formato)
+        atual, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"formato={formato:<10} {duracao:6.3f} s | {atual / 2**20:6.1f} MiB retidos")
+        del resultado
+    sa.fechar_conexoes()
+
+# Consultas dos caminhos quentes (mesmo texto usado em sistema_academico.py).
+CONSULTAS_SEM_SCAN = {
+    "histórico p/ matrícula": ("""
+        SELECT m.turma_codigo, t.curso_codigo, t.horario, t.dia, t.hora_ini, t.hora_fim, m.nota
+        FROM matriculas m
+        JOIN turmas t ON t.codigo = m.turma_codigo
+        WHERE m.aluno_matricula=?
+    """, ("A",)),
+    "cursos_aprovados": ("SELECT curso_codigo FROM aprovacoes WHERE aluno_matricula=?", ("A",)),
+    "relatorio_historico": ("""
+        SELECT t.curso_codigo, m.nota, m.frequencia
+        FROM matriculas m
+        JOIN turmas t ON t.codigo = m.turma_codigo
+        WHERE aluno_matricula=?
+    """, ("A",)),
+    "calcular_cr": ("SELECT cr FROM desempenho_alunos WHERE aluno_matricula=?", ("A",)),
+    "ranking_cr": ("""
+        SELECT aluno_matricula, cr FROM desempenho_alunos
+        WHERE cr IS NOT NULL
+        ORDER BY cr DESC, aluno_matricula DESC
+        LIMIT ?
+    """, (10,)),
+    "alunos_por_faixa_cr": ("""
+        SELECT aluno_matricula, cr FROM desempenho_alunos
+        WHERE cr BETWEEN ? AND ?
+        ORDER BY cr, aluno_matricula
+    """, (7.0, 8.0)),
+    "pré-requisitos do curso": ("SELECT prerequisito_codigo FROM prerequisitos WHERE curso_codigo=? ORDER BY posicao", ("C",)),
+    "guarda excluir_curso": ("SELECT 1 FROM turmas WHERE curso_codigo=?", ("C",)),
+    "turmas por curso (keyset)": ("""
+        SELECT codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas FROM turmas
+        WHERE curso_codigo = ? AND codigo > ? ORDER BY codigo LIMIT ?
+    """, ("C", "T", 500)),
+    "turmas por professor (keyset)": ("""
+        SELECT codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas FROM turmas
+        WHERE professor = ? AND codigo > ? ORDER BY codigo LIMIT ?
+    """, ("P", "T", 500)),
+    "alunos (keyset)": ("SELECT matricula, nome FROM alunos WHERE matricula > ? ORDER BY matricula LIMIT ?", ("A", 500)),
+    "guarda excluir_turma": ("SELECT 1 FROM matriculas WHERE turma_codigo=?", ("T",)),
+    "guarda excluir_aluno": ("SELECT 1 FROM matriculas WHERE aluno_matricula=?", ("A",)),
+}
+
+def bench_prerequisitos(n_alunos: int = 20_000):
+    """Elegibilidade de todos os alunos: aluno a aluno x bitsets por curso; checagem de ciclo."""
+    banco_temporario()
+    dados = gerar_dados(n_alunos)
+    con = sa.obter_conexao()
+    alunos = [r[0] for r in con.execute("SELECT matricula FROM alunos ORDER BY matricula")]
+
+    def aluno_a_aluno():
+        return [(m, sa.cursos_elegiveis(m)) for m in alunos]
+
+    print(f"\n=== Pré-requisitos ({n_alunos} alunos, {dados['cursos']} cursos) ===")
+    antigo = resumo("cursos_elegiveis() por aluno", cronometrar(lambda i: aluno_a_aluno(), 1))
+    novo = resumo("elegibilidade_geral() (bitsets)", cronometrar(lambda i: sa.elegibilidade_geral(), 3))
+    resumo("  + por_aluno() (transpor)", cronometrar(lambda i: list(sa.elegibilidade_geral().por_aluno()), 1))
+    assert list(sa.elegibilidade_geral().por_aluno()) == aluno_a_aluno()
+    print(f"  -> ganho: {antigo / novo:.0f}x (mesmo resultado)")
+
+    # fechar um ciclo: a raiz da cadeia mais longa passa a exigir o fim dela
+    grafo = sa.grafo_prerequisitos()
+    fim = max(grafo.codigos, key=lambda c: len(grafo.prerequisitos_transitivos(c)))
+    raiz = grafo.prerequisitos_transitivos(fim)[0]
+    resumo("ciclo_ao_definir() (fecho em cache)",
+           cronometrar(lambda i: sa.grafo_prerequisitos().ciclo_ao_definir(raiz, [fim]), 1000))
+    print(f"  {sa.editar_curso(raiz, None, [fim])}")
+    sa.fechar_conexoes()
+
+def bench_alocacao(n_alunos: int = 50_000, opcoes: int = 6):
+    """Rodada de alocação com turmas concorridas: ordem de chegada x alocar_turmas() por CR."""
+    banco_temporario()
+    dados = gerar_dados(n_alunos, correntes_por_aluno=0)
+    rnd = random.Random(7)
+    con = sa.obter_conexao()
+    turmas = [r[0] for r in con.execute("SELECT codigo FROM turmas ORDER BY codigo")]
+    # popularidade enviesada: poucas turmas concentram a maior parte dos pedidos
+    pesos = [1 / (i + 1) for i in range(len(turmas))]
+    preferencias = {f"A{a:07d}": list(dict.fromkeys(rnd.choices(turmas, pesos, k=opcoes))) for a in range(n_alunos)}
+    crs = dict(con.execute("SELECT aluno_matricula, cr FROM desempenho_alunos"))
+    sa.fechar_conexoes()
+    base = sa.DB_NAME
+
+    def qualidade(atribuicoes):
+        primeira = sum(1 for m, t in atribuicoes if preferencias[m][0] == t)
+        cr_medio = statistics.mean(crs.get(m) or 0 for m, _ in atribuicoes) if atribuicoes else 0
+        return f"{len(atribuicoes)} vagas, {primeira} 1ª opção, CR médio dos atendidos {cr_medio:.2f}"
+
+    print(f"\n=== Alocação ({n_alunos} alunos x {dados['turmas']} turmas, {opcoes} opções) ===")
+    # ordem de chegada: cada aluno tenta suas opções na ordem, alunos em ordem aleatória
+    copia = base + ".fcfs"
+    sa.obter_conexao().execute("VACUUM INTO ?", (copia,))
+    sa.fechar_conexoes()
+    sa.DB_NAME = copia
+    chegada = list(preferencias)
+    rnd.shuffle(chegada)
+    t0 = time.perf_counter()
+    msgs = sa.matricular_lote([(m, t) for m in chegada for t in preferencias[m]])
+    fcfs = time.perf_counter() - t0
+    pares = [(m, t) for m in chegada for t in preferencias[m]]
+    aceitos = [p for p, msg in zip(pares, msgs) if msg.startswith("✅")]
+    print(f"{'ordem de chegada (matricular_lote)':<40} {fcfs:7.2f} s | {qualidade(aceitos)}")
+    sa.fechar_conexoes()
+
+    sa.DB_NAME = base
+    t0 = time.perf_counter()
+    simulado = sa.alocar_turmas(preferencias, efetivar=False)
+    solver = time.perf_counter() - t0
+    print(f"{'alocar_turmas() (só calcular)':<40} {solver:7.2f} s | {qualidade(simulado.atribuicoes)}")
+    t0 = time.perf_counter()
+    resultado = sa.alocar_turmas(preferencias)
+    print(f"{'alocar_turmas() + efetivar':<40} {time.perf_counter() - t0:7.2f} s | {resultado}")
+    assert resultado.efetivadas == len(resultado.atribuicoes) and not resultado.falhas
+    assert sa.verificar_desempenho() == []
+    sa.fechar_conexoes()
+
+async def _cliente_http(porta: int, pedidos, latencias):
+    """Uma conexão keep-alive enviando os pedidos (metodo, caminho, corpo) em sequência."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+    try:
+        for metodo, caminho, corpo in pedidos:
+            dados = json.dumps(corpo).encode() if corpo is not None else b""
+            t0 = time.perf_counter()
+            writer.write(f"{metodo} {caminho} HTTP/1.1\r\nHost: local\r\nContent-Length: {len(dados)}\r\n\r\n".encode() + dados)
+            await writer.drain()
+            cabecalho = await reader.readuntil(b"\r\n\r\n")
+            assert cabecalho.startswith(b"HTTP/1.1 200"), cabecalho
+            tamanho = int(cabecalho.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+            await reader.readexactly(tamanho)
+            latencias.append(time.perf_counter() - t0)
+    finally:
+        writer.close()
+
+def bench_http(n_alunos: int = 10_000, pedidos_por_cliente: int = 200, clientes=(1, 8, 32, 128)):
+    """Carga no servidor HTTP/JSON: vazão com clientes concorrentes (80% leitura, 20% matrícula)."""
+    banco_temporario()
+    gerar_dados(n_alunos, correntes_por_aluno=0)
+    con = sa.obter_conexao()
+    turmas = [r[0] for r in con.execute("SELECT codigo FROM turmas")]
+    rnd = random.Random(3)
+
+    def roteiro(n):
+        for _ in range(n):
+            m = f"A{rnd.randrange(n_alunos):07d}"
+            sorteio = rnd.random()
+            if sorteio < 0.4:
+                yield "GET", f"/alunos/{m}/historico", None
+            elif sorteio < 0.6:
+                yield "GET", f"/alunos/{m}/cr", None
+            elif sorteio < 0.8:
+                yield "GET", "/turmas?limite=20", None
+            else:
+                yield "POST", "/matriculas", {"aluno": m, "turma": rnd.choice(turmas)}
+
+    async def rodada(porta, n_clientes):
+        latencias = []
+        t0 = time.perf_counter()
+        await asyncio.gather(*(_cliente_http(porta, list(roteiro(pedidos_por_cliente)), latencias)
+                               for _ in range(n_clientes)))
+        return time.perf_counter() - t0, latencias
+
+    async def principal():
+        servico = sa.ServicoAssincrono()
+        servidor = await sa.iniciar_servidor_http(porta=0, servico=servico)
+        porta = servidor.sockets[0].getsockname()[1]
+        print(f"\n=== Servidor HTTP ({n_alunos} alunos, {pedidos_por_cliente} pedidos por cliente) ===")
+        try:
+            for n in clientes:
+                total, latencias = await rodada(porta, n)
+                p = percentis(latencias)
+                print(f"{n:4d} cliente(s): {len(latencias) / total:8.0f} req/s | p50 {p['p50_ms']:7.2f} ms "
+                      f"| p95 {p['p95_ms']:7.2f} ms | p99 {p['p99_ms']:7.2f} ms")
+        finally:
+            servidor.close()
+            await servidor.wait_closed()
+            servico.fechar()
+
+    asyncio.run(principal())
+    assert sa.verificar_desempenho() == []
+    sa.fechar_conexoes()
+
+def bench_instrumentacao(n_alunos: int = 5000, repeticoes: int = 3000):
+    """Custo da instrumentação: matricular() + relatorio_historico() desligada x ligada."""
+    banco_temporario()
+    gerar_dados(n_alunos, correntes_por_aluno=0)
+    con = sa.obter_conexao()
+    turmas = [r[0] for r in con.execute("SELECT codigo FROM turmas")]
+    rnd = random.Random(5)
+
+    def operacao(i):
+        m = f"A{rnd.randrange(n_alunos):07d}"
+        sa.matricular(m, rnd.choice(turmas))
+        sa.relatorio_historico(m)
+
+    print(f"\n=== Instrumentação ({repeticoes} x matricular + histórico) ===")
+    desligada = resumo("desligada", cronometrar(operacao, repeticoes))
+    sa.definir_instrumentacao(True)
+    ligada = resumo("ligada", cronometrar(operacao, repeticoes))
+    print(f"  -> custo ligada: {(ligada / desligada - 1) * 100:.0f}%")
+    print("\n".join(sa.relatorio_instrumentacao(limite=5).splitlines()))
+    sa.definir_instrumentacao(False)
+    sa.METRICAS.limpar()
+    assert type(sa.obter_conexao()) is sqlite3.Connection
+    sa.fechar_conexoes()
+
+def bench_analise(n_alunos: int = 50_000):
+    """Relatórios de coorte: laço sobre as funções por aluno x analise_coorte() (NumPy/SQLite/cache)."""
+    banco_temporario()
+    dados = gerar_dados(n_alunos)
+    con = sa.obter_conexao()
+    alunos = [r[0] for r in con.execute("SELECT matricula FROM alunos")]
+
+    def laco_por_aluno():
+        # o que dava para fazer antes: histórico e CR aluno a aluno, agregando em Python
+        por_curso, risco, crs = {}, 0, []
+        for m in alunos:
+            for curso, nota, freq in sa.relatorio_historico(m):
+                g = por_curso.setdefault(curso, [0, 0])
+                if nota is not None:
+                    g[0] += 1
+                    g[1] += nota >= 6
+                risco += freq is not None and freq < sa.FREQUENCIA_MINIMA
+            crs.append(sa.calcular_cr(m))
+        return por_curso, risco
+
+    print(f"\n=== Análise de coorte ({n_alunos} alunos, {dados['matriculas']} matrículas) ===")
+    antigo = resumo("laço por aluno (histórico + CR)", cronometrar(lambda i: laco_por_aluno(), 1))
+    motores = ["sqlite"] + (["numpy"] if sa.carregar_numpy() is not None else [])
+    for motor in motores:
+        resumo(f"analise_coorte(motor={motor!r})", cronometrar(lambda i: sa.analise_coorte(False, motor), 3))
+    if sa.carregar_numpy() is None:
+        print("  (NumPy não instalado: só o motor sqlite foi medido)")
+    resultados = [sa.analise_coorte(False, m) for m in motores]
+    for r in resultados:
+        r.pop("motor")
+    assert all(r == resultados[0] for r in resultados)
+    sa.analise_coorte()
+    cache = resumo("analise_coorte() com cache válido", cronometrar(lambda i: sa.analise_coorte(), 5))
+    print(f"  -> ganho do cache sobre o laço: {antigo / cache:.0f}x")
+    versao = sa.versao_dados()
+    sa.registrar_frequencia(alunos[0], con.execute(
+        "SELECT turma_codigo FROM matriculas WHERE aluno_matricula=?", (alunos[0],)).fetchone()[0], 10)
+    assert sa.versao_dados() != versao and sa.analise_coorte()["versao_dados"] == sa.versao_dados()
+    sa.fechar_conexoes()
+
+def bench_snapshot(n_alunos: int = 50_000, amostras: int = 5000):
+    """Snapshot colunar: export completo, refresh incremental e consultas pelo mmap x banco."""
+    banco_temporario()
+    dados = gerar_dados(n_alunos)
+    print(f"\n=== Snapshot colunar ({n_alunos} alunos, {dados['matriculas']} matrículas) ===")
+    resumo("exportar_snapshot() completo", cronometrar(lambda i: sa.exportar_snapshot(), 1))
+    pasta = sa.pasta_snapshot()
+    tamanho = sum(os.path.getsize(os.path.join(pasta, a)) for a in os.listdir(pasta))
+    print(f"  tamanho: {tamanho / 2**20:.1f} MiB (banco: {os.path.getsize(sa.DB_NAME) / 2**20:.1f} MiB)")
+    resumo("refresh sem mudanças", cronometrar(lambda i: sa.exportar_snapshot(), 3))
+
+    con = sa.obter_conexao()
+    linhas = con.execute("SELECT aluno_matricula, turma_codigo FROM matriculas LIMIT 100").fetchall()
+    for a, t in linhas:
+        sa.registrar_nota(a, t, 9.5)
+    msg = []
+    resumo("refresh após 100 notas", cronometrar(lambda i: msg.append(sa.exportar_snapshot()), 1))
+    print(f"  {msg[0]}")
+
+    rnd = random.Random(11)
+    alunos = [f"A{rnd.randrange(n_alunos):07d}" for _ in range(amostras)]
+    with sa.Snapshot() as snap:
+        for m in alunos[:500]:
+            assert sorted(snap.relatorio_historico(m), key=repr) == sorted(sa.relatorio_historico(m), key=repr)
+            esperado, obtido = sa.calcular_cr(m), snap.calcular_cr(m)
+            assert (esperado is None and obtido is None) or abs(esperado - obtido) < 1e-9
+        resumo("relatorio_historico() no banco", cronometrar(lambda i: sa.relatorio_historico(alunos[i]), amostras))
+        resumo("relatorio_historico() no snapshot", cronometrar(lambda i: snap.relatorio_historico(alunos[i]), amostras))
+        resumo("calcular_cr() no snapshot", cronometrar(lambda i: snap.calcular_cr(alunos[i]), amostras))
+    print("  mesmos resultados do banco em 500 alunos")
+    sa.fechar_conexoes()
+
+def bench_espera(n_alunos: int = 60_000, limite: int = 100, amostra: int = 1000):
+    """Lista de espera: entrada e promoção com dezenas de milhares na fila (custo não deve crescer com a fila)."""
+    banco_temporario()
+    gerar_dados(n_alunos, correntes_por_aluno=0)
+    sa.criar_curso("CESP", "Curso concorrido", [])
+    sa.criar_curso("CCONF", "Curso no mesmo horário", [])
+    sa.criar_turma("TESP", "CESP", "Prof E", "sab-7-8", limite)
+    sa.criar_turma("TCONF", "CCONF", "Prof C", "sab-7-8", n_alunos)
+    alunos = [f"A{a:07d}" for a in range(n_alunos)]
+    matriculados, fila = alunos[:limite], alunos[limite:]
+    for m in matriculados:
+        sa.matricular(m, "TESP")
+    print(f"\n=== Lista de espera (turma com {limite} vagas, {len(fila)} na fila) ===")
+    resumo("matricular() sem vaga (tentativa)", cronometrar(lambda i: sa.matricular(fila[i], "TESP"), amostra))
+
+    tempos = cronometrar(lambda i: sa.entrar_lista_espera(fila[i], "TESP"), len(fila))
+    resumo(f"entrar_lista_espera() primeiros {amostra}", tempos[:amostra])
+    resumo(f"entrar_lista_espera() últimos {amostra}", tempos[-amostra:])
+    # alguns dos primeiros da fila deixam de cumprir as regras (choque de horário) enquanto esperam
+    inelegiveis = set(fila[:2 * amostra:10])
+    for m in inelegiveis:
+        sa.matricular(m, "TCONF")
+
+    msgs = []
+    resumo("cancelar_matricula() + promoção", cronometrar(
+        lambda i: msgs.append(sa.cancelar_matricula(matriculados[i], "TESP")), limite))
+    t0 = time.perf_counter()
+    msg = sa.editar_turma("TESP", None, None, limite + amostra)
+    print(f"editar_turma() +{amostra} vagas: {(time.perf_counter() - t0) * 1000:.0f} ms | {msg}")
+    resumo("posicao_lista_espera() no fim da fila", cronometrar(lambda i: sa.posicao_lista_espera(fila[-1 - i], "TESP"), 100))
+
+    con = sa.obter_conexao()
+    na_turma = {r[0] for r in con.execute("SELECT aluno_matricula FROM matriculas WHERE turma_codigo = 'TESP'")}
+    esperados = [m for m in fila if m not in inelegiveis][:limite + amostra]
+    assert na_turma == set(esperados), "promoção fora da ordem da fila"
+    assert not na_turma & inelegiveis
+    ocupadas, vagas = con.execute("SELECT vagas_ocupadas, limite_vagas FROM turmas WHERE codigo = 'TESP'").fetchone()
+    assert ocupadas == vagas == limite + amostra
+    restantes = len(sa.lista_espera("TESP"))
+    print(f"  {len(na_turma)} promovidos em ordem, {len(inelegiveis & set(fila[:len(fila) - restantes]))} "
+          f"inelegíveis pulados, {restantes} ainda na fila")
+    sa.fechar_conexoes()
+
+def bench_busca(n_alunos: int = 1_000_000, repeticoes: int = 200):
+    """Busca FTS5 (ranqueada e autocompletar) x LIKE '%...%' sobre alunos."""
+    banco_temporario()
+    t0 = time.perf_counter()
+    gerar_dados(n_alunos, historico_por_aluno=1, correntes_por_aluno=0)
+    print(f"\n=== Busca ({n_alunos} alunos; geração com índice: {time.perf_counter() - t0:.0f} s) ===")
+    con = sa.obter_conexao()
+    resumo("LIKE '%souza lima%' (varredura)", cronometrar(lambda i: con.execute(
+        "SELECT matricula, nome FROM alunos WHERE nome LIKE '%souza lima%'").fetchall(), 3))
+    consultas = {
+        "nome completo": ("buscar", "Íris Souza Lima"),
+        "sem acento": ("buscar", "iris souza lima"),
+        "sobrenome comum": ("buscar", "Souza"),
+        "professor": ("buscar", "Prof 0012"),
+        "autocompletar 'ga'": ("autocompletar", "ga"),
+        "autocompletar 'gabriela so'": ("autocompletar", "gabriela so"),
+    }
+    for nome, (funcao, texto) in consultas.items():
+        funcao = getattr(sa, funcao)
+        resultados = funcao(texto)
+        tempos = cronometrar(lambda i: funcao(texto), repeticoes)
+        p = percentis(tempos)
+        print(f"{nome:<28} p50 {p['p50_ms']:6.2f} ms | p99 {p['p99_ms']:6.2f} ms | {len(resultados)} resultado(s)")
+    acentuado = {r.chave for r in sa.buscar("Íris Souza Lima", tipos=("aluno",))}
+    assert acentuado and acentuado == {r.chave for r in sa.buscar("IRIS SOUZA LIMA", tipos=("aluno",))}
+    sa.fechar_conexoes()
+
+def bench_boletins(n_alunos: int = 1_000_000, amostra: int = 20_000, processos=(1, 2, 4, 8)):
+    """Boletins de todos os alunos: laço por aluno (2 consultas cada) x gerar_boletins() com 1..N processos."""
+    banco_temporario()
+    t0 = time.perf_counter()
+    dados = gerar_dados(n_alunos)
+    print(f"\n=== Boletins ({n_alunos} alunos, {dados['matriculas']} matrículas; geração: "
+          f"{time.perf_counter() - t0:.0f} s; {os.cpu_count()} núcleo(s)) ===")
+    matriculas = [m for (m,) in sa.obter_conexao().execute(
+        "SELECT matricula FROM alunos ORDER BY matricula LIMIT ?", (amostra,))]
+    t0 = time.perf_counter()
+    for m in matriculas:
+        sa.relatorio_historico(m)
+        sa.calcular_cr(m)
+    por_aluno = (time.perf_counter() - t0) / len(matriculas)
+    print(f"laço relatorio_historico + calcular_cr: {por_aluno * 1e6:.1f} µs/aluno "
+          f"(estimado {por_aluno * n_alunos:.1f} s para todos, sem formatar nem gravar)")
+
+    pasta = sa.DB_NAME + ".boletins"
+    base = serial = None
+    for n in processos:
+        if n > (os.cpu_count() or 1) and n > 1:
+            # sem núcleos para medir: só o teto de Amdahl a partir da parte serial medida com 1 processo
+            teto = base / (serial + (base - serial) / n) if base else float("nan")
+            print(f"{n} processos: NÃO medido (mais que os núcleos disponíveis); teto de Amdahl {teto:.2f}x")
+            continue
+        resultado = sa.gerar_boletins(pasta, "json", processos=n)
+        if base is None:
+            base, serial = resultado.segundos, resultado.preparo
+        print(f"{n} processo(s): {resultado.segundos:6.1f} s (parte serial {resultado.preparo:.2f} s"
+              f"{', refeito da cópia' if resultado.copia else ''}) "
+              f"| {resultado.alunos / resultado.segundos:9.0f} alunos/s | aceleração {base / resultado.segundos:.2f}x")
+    assert resultado.alunos == n_alunos
+
+    rnd = random.Random(5)
+    conferir = set(rnd.sample(range(n_alunos), 500))
+    vistos = i = 0
+    for arquivo in resultado.arquivos:
+        with open(arquivo, encoding="utf-8") as arq:
+            for linha in arq:
+                if i in conferir:
+                    b = json.loads(linha)
+                    historico = sorted((h["curso"], h["nota"], h["frequencia"]) for h in b["historico"])
+                    assert historico == sorted(sa.relatorio_historico(b["matricula"], incluir_arquivo=True)), b["matricula"]
+                    assert b["cr"] == sa.calcular_cr(b["matricula"])
+                    vistos += 1
+                i += 1
+    print(f"  {vistos} boletins conferidos com relatorio_historico() e calcular_cr()")
+    shutil.rmtree(pasta)
+    sa.fechar_conexoes()
+
+def bench_arquivo(n_alunos: int = 200_000, amostras: int = 5000):
+    """Arquivamento de período: custo do histórico na matrícula e no relatório antes/depois de arquivar."""
+    banco_temporario()
+    dados = gerar_dados(n_alunos, historico_por_aluno=12, correntes_por_aluno=3)
+    # o histórico gerado vai para turmas "P..." do período anterior; as originais ficam no corrente
+    with sa.transacao() as con:
+        con.execute("""
+            INSERT INTO turmas (codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas, dia, hora_ini, hora_fim, periodo)
+            SELECT 'P' || codigo, curso_codigo, professor, horario, limite_vagas, 0, dia, hora_ini, hora_fim, '2024.2' FROM turmas
+        """)
+        con.execute("UPDATE turmas SET periodo = '2025.1' WHERE periodo IS NULL")
+        con.execute("UPDATE matriculas SET turma_codigo = 'P' || turma_codigo WHERE nota IS NOT NULL")
+    con = sa.obter_conexao()
+    passadas = con.execute("SELECT COUNT(*) FROM matriculas WHERE nota IS NOT NULL").fetchone()[0]
+    print(f"\n=== Arquivo de períodos ({n_alunos} alunos, {dados['matriculas']} matrículas, {passadas} de 2024.2) ===")
+
+    rnd = random.Random(3)
+    alunos = [f"A{rnd.randrange(n_alunos):07d}" for _ in range(amostras)]
+    cr_antes = [sa.calcular_cr(m) for m in alunos[:500]]
+    aprovados_antes = [sa._carregar_historico(con, m).aprovados for m in alunos[:500]]
+    medidas = {
+        "_carregar_historico() (matricular)": lambda i: sa._carregar_historico(con, alunos[i]),
+        "relatorio_historico()": lambda i: sa.relatorio_historico(alunos[i]),
+    }
+    antes = {nome: percentis(cronometrar(f, amostras)) for nome, f in medidas.items()}
+    t0 = time.perf_counter()
+    print(sa.arquivar_periodo("2024.2"))
+    print(f"  arquivamento: {time.perf_counter() - t0:.1f} s")
+    for nome, f in medidas.items():
+        depois = percentis(cronometrar(f, amostras))
+        print(f"{nome:<36} p50 {antes[nome]['p50_ms'] * 1e3:7.1f} µs -> {depois['p50_ms'] * 1e3:7.1f} µs")
+    resumo("relatorio_historico(incluir_arquivo=True)",
+           cronometrar(lambda i: sa.relatorio_historico(alunos[i], incluir_arquivo=True), amostras))
+    assert [sa.calcular_cr(m) for m in alunos[:500]] == cr_antes
+    assert [sa._carregar_historico(con, m).aprovados for m in alunos[:500]] == aprovados_antes
+    assert not sa.verificar_desempenho()
+    print("  CR e aprovações iguais aos de antes do arquivamento; verificar_desempenho() sem divergências")
+    sa.fechar_conexoes()
+
+_GATILHOS_INGENUOS = {
+    # um INSERT por linha alterada, com texto e JSON montados no gatilho: o jeito "óbvio" de auditar
+    "insert": "json_object('aluno', NEW.aluno_matricula, 'turma', NEW.turma_codigo)",
+    "update": "json_object('aluno', NEW.aluno_matricula, 'turma', NEW.turma_codigo, 'nota', json_array(OLD.nota, NEW.nota), "
+              "'frequencia', json_array(OLD.frequencia, NEW.frequencia))",
+    "delete": "json_object('aluno', OLD.aluno_matricula, 'turma', OLD.turma_codigo)",
+}
+
+def _auditoria_ingenua(con: sqlite3.Connection, ligar: bool):
+    with sa.transacao() as c:
+        if not ligar:
+            for operacao in _GATILHOS_INGENUOS:
+                c.execute(f"DROP TRIGGER tg_ingenua_{operacao}")
+            return
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS auditoria_ingenua (
+                id INTEGER PRIMARY KEY, momento TEXT, operacao TEXT, linha TEXT
+            )
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS ix_ingenua_linha ON auditoria_ingenua (linha)")
+        for operacao, linha in _GATILHOS_INGENUOS.items():
+            c.execute(f"""
+                CREATE TRIGGER tg_ingenua_{operacao} AFTER {operacao.upper()} ON matriculas
+                BEGIN
+                    INSERT INTO auditoria_ingenua (momento, operacao, linha)
+                    VALUES (strftime('%Y-%m-%dT%H:%M:%f', 'now'), '{operacao}', {linha});
+                END
+            """)
+
+def bench_auditoria(n_alunos: int = 50_000, escritas: int = 2000, linhas_csv: int = 10_000, rodadas: int = 12):
+    """Auditoria: custo nas escritas (nota, frequência, matrícula, importação) desligada x ligada x gatilho por linha."""
+    banco_temporario()
+    gerar_dados(n_alunos)
+    con = sa.obter_conexao()
+    rnd = random.Random(11)
+    com_nota = con.execute("SELECT aluno_matricula, turma_codigo FROM matriculas WHERE nota IS NOT NULL "
+                           "ORDER BY random() LIMIT ?", (max(escritas, linhas_csv),)).fetchall()
+    correntes = con.execute("SELECT aluno_matricula, turma_codigo FROM matriculas WHERE nota IS NULL "
+                            "ORDER BY random() LIMIT ?", (2 * escritas,)).fetchall()
+    # fica com as que voltam depois de canceladas (o gerador não evita choques entre matrículas correntes),
+    # de alunos cujas notas não mudam durante a medição (pré-requisitos continuam cumpridos)
+    sa.definir_auditoria(False)
+    mudam = {a for a, _ in com_nota}
+    correntes = [p for p in correntes if p[0] not in mudam
+                 and sa.cancelar_matricula(*p).startswith("✔") and sa.matricular(*p).startswith("✅")]
+    correntes = correntes[:escritas]
+    pasta = os.path.dirname(sa.DB_NAME)
+
+    def importar(rodada: int):
+        # valores diferentes a cada rodada: toda linha é uma alteração de verdade
+        caminho = os.path.join(pasta, f"notas_{rodada}.csv")
+        with open(caminho, "w", encoding="utf-8") as arq:
+            arq.write("matricula,turma,nota,frequencia\n")
+            for i, (a, t) in enumerate(com_nota[:linhas_csv]):
+                arq.write(f"{a},{t},{(i * 37 + rodada * 13) % 101 / 10},{50 + (i + rodada * 7) % 51}\n")
+        return lambda _: sa.importar_notas_csv(caminho)
+
+    def cancelar_e_matricular(i):
+        assert sa.cancelar_matricula(*correntes[i]).startswith("✔")
+        assert sa.matricular(*correntes[i]).startswith("✅")
+
+    cargas = {
+        "registrar_nota()": lambda r: (lambda i: sa.registrar_nota(*com_nota[i], rnd.randrange(101) / 10), escritas),
+        "registrar_frequencia()": lambda r: (lambda i: sa.registrar_frequencia(*com_nota[i], float(rnd.randrange(101))),
+                                             escritas),
+        "cancelar + matricular()": lambda r: (cancelar_e_matricular, len(correntes)),
+        f"importar_notas_csv ({linhas_csv} linhas)": lambda r: (importar(r), 1),
+    }
+    # transações de uma linha por operação (0 = escrita em lote): cada uma paga o piso do SQLite
+    transacoes = {"registrar_nota()": 1, "registrar_frequencia()": 1, "cancelar + matricular()": 2}
+    modos = ("desligada", "ligada", "gatilho por linha")
+    print(f"\n=== Auditoria ({n_alunos} alunos; mediana de {rodadas} rodadas alternadas, custo contra a desligada) ===")
+    medias = {(c, m): [] for c in cargas for m in modos}
+    for rodada in range(rodadas):
+        # os modos lado a lado em cada carga, em ordem invertida a cada rodada: nenhum herda sempre o
+        # WAL deixado pela carga anterior
+        for carga, preparar in cargas.items():
+            for modo in (modos if rodada % 2 == 0 else modos[::-1]):
+                sa.definir_auditoria(modo == "ligada")
+                if modo == "gatilho por linha":
+                    _auditoria_ingenua(con, True)
+                func, n = preparar(rodada * len(modos) + modos.index(modo))
+                medias[carga, modo].append(statistics.mean(cronometrar(func, n)))
+                if modo == "gatilho por linha":
+                    _auditoria_ingenua(con, False)
+    sa.definir_auditoria(True)
+    piso = _piso_acrescimo(com_nota, escritas)
+
+    def custo(carga: str, modo: str) -> float:
+        # mediana das diferenças rodada a rodada: a deriva da máquina entre rodadas se cancela
+        return statistics.median(c - d for c, d in zip(medias[carga, modo], medias[carga, "desligada"]))
+
+    for carga in cargas:
+        base = statistics.median(medias[carga, "desligada"])
+        custos = " | ".join(f"{m} {custo(carga, m) / base * 100:+5.1f}%" for m in modos[1:])
+        print(f"{carga:<36} desligada {base * 1e3:9.3f} ms | {custos}")
+    # o piso não muda a meta: só mostra quanto do custo vem de gravar o evento na transação da alteração
+    print(f"piso do SQLite (1 linha a mais por commit, mesma transação): {piso * 1e6:+.1f} µs")
+    for carga in cargas:
+        base = statistics.median(medias[carga, "desligada"])
+        ligada = custo(carga, "ligada")
+        minimo = piso * transacoes.get(carga, 0)
+        print(f"  -> {carga:<33} custo {ligada / base * 100:+5.1f}% ({ligada * 1e6:+9.1f} µs; "
+              f"piso {minimo / base * 100:4.1f}%): meta de 10% {'atingida' if ligada <= 0.10 * base else 'NÃO atingida'}")
+
+    eventos = sum(con.execute(f"SELECT COUNT(*) FROM auditoria_{m.replace('-', '')}").fetchone()[0]
+                  for m in sa.particoes_auditoria())
+    ingenua = con.execute("SELECT COUNT(*) FROM auditoria_ingenua").fetchone()[0]
+    tamanho = _tamanho_tabelas(con, "auditoria_2%")
+    print(f"{eventos} eventos gravados ({tamanho / eventos:.0f} bytes/evento); gatilho por linha: {ingenua} "
+          f"({_tamanho_tabelas(con, '%ingenua%') / ingenua:.0f} bytes/evento)")
+
+    a, t = com_nota[0]
+    t0 = time.perf_counter()
+    historico = sa.consultar_auditoria(aluno=a, turma=t, limite=None)
+    print(f"primeira consulta por aluno (indexa os {eventos} eventos gravados): {time.perf_counter() - t0:.3f} s")
+    assert historico and all(e.aluno == a and e.turma == t for e in historico)
+    por_consulta = len(historico)
+    resumo(f"consultar_auditoria(aluno, turma) ~{por_consulta} ev.", cronometrar(
+        lambda i: sa.consultar_auditoria(aluno=com_nota[i][0], turma=com_nota[i][1]), escritas))
+    resumo("consultar_auditoria(aluno)", cronometrar(lambda i: sa.consultar_auditoria(aluno=com_nota[i][0]), escritas))
+    sa.fechar_conexoes()
+
+def _piso_acrescimo(pares: List[Tuple[str, str]], n: int) -> float:
+    """
+    SQLite puro no próprio banco do benchmark, mesmos pragmas do sistema:
+    commit que troca a frequência de uma matrícula x o mesmo commit com mais
+    um evento (mesmas colunas de auditoria_AAAAMM) acrescentado no fim de
+    outra tabela. A diferença (s) é o mínimo que um evento gravado na
+    transação da alteração custa neste banco (inclusive nos checkpoints do
+    WAL), qualquer que seja o código em volta.
+    """
+    con = sqlite3.connect(sa.DB_NAME, isolation_level=None)
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("CREATE TABLE piso_eventos (seq INTEGER PRIMARY KEY, aluno TEXT NOT NULL, turma TEXT NOT NULL, "
+                "curso TEXT NOT NULL, momento INTEGER NOT NULL, evento INTEGER NOT NULL, usuario TEXT NOT NULL, "
+                "antes, depois, dados TEXT)")
+    rnd = random.Random(5)
+
+    def escrever(evento: bool):
+        def func(i):
+            a, t = pares[i]
+            freq = float(rnd.randrange(101))
+            con.execute("BEGIN IMMEDIATE")
+            con.execute("UPDATE matriculas SET frequencia=? WHERE aluno_matricula=? AND turma_codigo=?", (freq, a, t))
+            if evento:
+                con.execute("INSERT INTO piso_eventos (aluno, turma, curso, momento, evento, usuario, antes, depois) "
+                            "VALUES (?,?,'',?,3,?,?,?)", (a, t, time.time_ns(), "root", 0.0, freq))
+            con.execute("COMMIT")
+        return func
+    diferencas = [statistics.mean(cronometrar(escrever(True), n)) - statistics.mean(cronometrar(escrever(False), n))
+                  for _ in range(5)]
+    con.execute("DROP TABLE piso_eventos")
+    con.close()
+    return statistics.median(diferencas)
+
+def _tamanho_tabelas(con: sqlite3.Connection, padrao: str) -> int:
+    """Bytes ocupados pelas tabelas e índices cujo nome casa com o padrão LIKE (0 sem a extensão dbstat)."""
+    try:
+        return con.execute("SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name LIKE ?", (padrao,)).fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+
+def _partida_vazia() -> float:
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - t0
+
+def bench_cli(n_alunos: int = 5000, partidas: int = 20, comandos: int = 5000):
+    """Linha de comando: custo de partida por comando x modo lote (um processo para todos)."""
+    banco_temporario()
+    gerar_dados(n_alunos)
+    sa.fechar_conexoes()
+    script = os.path.abspath(sa.__file__)
+    ambiente = dict(os.environ, PYTHONPATH=os.path.dirname(script))
+    print(f"\n=== Linha de comando ({n_alunos} alunos) ===")
+
+    def rodar(args, entrada=None, modulo=True):
+        # -m usa o .pyc em __pycache__; "python sistema_academico.py" recompila o arquivo a cada partida
+        inicio = [sys.executable, "-m", "sistema_academico"] if modulo else [sys.executable, script]
+        t0 = time.perf_counter()
+        subprocess.run([*inicio, "--banco", sa.DB_NAME, *args], input=entrada, env=ambiente,
+                       capture_output=True, text=True, check=False)
+        return time.perf_counter() - t0
+
+    vazio = statistics.median(_partida_vazia() for _ in range(partidas))
+    como_script = statistics.median(rodar(["cr", f"A{i:07d}"], modulo=False) for i in range(partidas))
+    por_processo = statistics.median(rodar(["cr", f"A{i:07d}"]) for i in range(partidas))
+    print(f"python -c pass: {vazio * 1e3:.0f} ms | 'cr ALUNO': {como_script * 1e3:.0f} ms como script, "
+          f"{por_processo * 1e3:.0f} ms com -m (partida do sistema: {(por_processo - vazio) * 1e3:.0f} ms)")
+
+    rnd = random.Random(8)
+    turmas = [t for (t,) in sa.obter_conexao().execute("SELECT codigo FROM turmas")]
+    linhas = "".join(f"matricular A{rnd.randrange(n_alunos):07d} {rnd.choice(turmas)}\n" for _ in range(comandos))
+    sa.fechar_conexoes()
+    total = rodar(["lote"], linhas)
+    print(f"lote com {comandos} matrículas: {total:.1f} s ({(total - por_processo) / comandos * 1e3:.2f} ms/comando; "
+          f"um processo por comando levaria ~{comandos * por_processo:.0f} s)")
+
+def _choques_grade(con: sqlite3.Connection) -> Tuple[int, int]:
+    """(pares aluno/turmas correntes em choque, professores em dois horários que se cruzam), recontados do banco."""
+    turmas = {c: (p, sa.faixa_horario(h or "")) for c, p, h in con.execute("SELECT codigo, professor, horario FROM turmas")}
+    alunos = 0
+    for a, b, w in con.execute("""
+        SELECT x.turma_codigo, y.turma_codigo, COUNT(*) FROM matriculas x
+        JOIN matriculas y ON y.aluno_matricula = x.aluno_matricula AND y.turma_codigo > x.turma_codigo
+        WHERE x.nota IS NULL AND y.nota IS NULL GROUP BY 1, 2
+    """):
+        fa, fb = turmas[a][1], turmas[b][1]
+        if fa and fb and fa[0] == fb[0] and fa[1] & fb[1]:
+            alunos += w
+    por_prof = {}
+    for p, f in turmas.values():
+        if p and f:
+            por_prof.setdefault(p, []).append(f)
+    professores = sum(1 for fs in por_prof.values() for i, a in enumerate(fs) for b in fs[i + 1:]
+                      if a[0] == b[0] and a[1] & b[1])
+    return alunos, professores
+
+def bench_grade(n_alunos: int = 100_000, tempo_limite: float = 30.0):
+    """Grade de horários: choques de alunos e de professores antes/depois de gerar_grade()."""
+    banco_temporario()
+    dados = gerar_dados(n_alunos, historico_por_aluno=2, correntes_por_aluno=4)
+    con = sa.obter_conexao()
+    antes = _choques_grade(con)
+    print(f"\n=== Grade de horários ({dados['turmas']} turmas, {len(sa.HORARIOS_GRADE)} horários) ===")
+    print(f"grade gerada ao acaso: {antes[0]} choques de alunos, {antes[1]} pares de turmas do mesmo professor em choque")
+    # um terço dos professores só pode de manhã e no começo da tarde
+    profs = sorted({p for (p,) in con.execute("SELECT DISTINCT professor FROM turmas")})
+    manha = {p: [janela for d in DIAS for janela in (f"{d}-8-12", f"{d}-14-16")] for p in profs[::3]}
+    resultado = sa.gerar_grade(disponibilidade=manha, tempo_limite=tempo_limite, aplicar=True)
+    print(resultado)
+    depois = _choques_grade(con)
+    print(f"após aplicar via editar_turma ({resultado.aplicadas} turmas): {depois[0]} choques de alunos, "
+          f"{depois[1]} pares de turmas do mesmo professor em choque")
+    assert depois == (resultado.conflitos_depois, 0), "grade aplicada difere da calculada"
+    fora = [c for c, p, h in con.execute("SELECT codigo, professor, horario FROM turmas")
+            if p in manha and sa.colunas_horario(h)[1] not in (8, 10, 14)]
+    assert not fora, f"turmas fora da disponibilidade: {fora[:5]}"
+    sa.fechar_conexoes()
+
+def _conteudo_tabelas(con: sqlite3.Connection) -> dict:
+    """Resumo (hash) do conteúdo de cada tabela replicada, para comparar bancos."""
+    resultado = {}
+    for tabela, chave in sa.CHAVES_REPLICACAO.items():
+        linhas = con.execute(f"SELECT * FROM {tabela} ORDER BY {', '.join(chave)}").fetchall()
+        resultado[tabela] = (len(linhas), hash(tuple(linhas)))
+    return resultado
+
+def _indice_busca(con: sqlite3.Connection) -> set:
+    return {linha for tabela in ("alunos", "cursos", "turmas") for linha in con.execute(
+        f"SELECT i.tipo, i.chave, b.texto FROM busca_{tabela} b JOIN busca_ids i ON i.id = b.rowid")}
+
+def bench_replicacao(n_alunos: int = 20_000, escritas: int = 3000, amostras: int = 5000):
+    """Réplicas de leitura: custo do log nas escritas, aplicação do log e leituras roteadas."""
+    banco_temporario()
+    gerar_dados(n_alunos, correntes_por_aluno=0)
+    con = sa.obter_conexao()
+    pares = con.execute("SELECT aluno_matricula, turma_codigo FROM matriculas ORDER BY random() LIMIT ?",
+                        (2 * escritas,)).fetchall()
+    rnd = random.Random(3)
+    print(f"\n=== Replicação ({n_alunos} alunos, {escritas} notas por rodada) ===")
+
+    # custo do log: a mesma carga sem e com o log (desligado até a primeira réplica)
+    sem_log = resumo("registrar_nota() sem log", cronometrar(
+        lambda i: sa.registrar_nota(*pares[escritas + i], rnd.uniform(0, 10)), escritas))
+    sa.definir_log_alteracoes(True)
+    com_log = resumo("registrar_nota() com log", cronometrar(
+        lambda i: sa.registrar_nota(*pares[i], rnd.uniform(0, 10)), escritas))
+    print(f"  -> custo do log por escrita: {(com_log / sem_log - 1) * 100:.0f}%")
+
+    pasta = os.path.dirname(sa.DB_NAME)
+    replicas = [os.path.join(pasta, f"replica{i}.db") for i in (1, 2)]
+    for caminho in replicas:
+        resumo("criar_replica()", cronometrar(lambda i: sa.criar_replica(caminho), 1))
+
+    # escritas com o replicador acompanhando o log em segundo plano
+    replicador = sa.Replicador(replicas, intervalo=0.05).iniciar()
+    t0 = time.perf_counter()
+    for i in range(escritas):
+        sa.registrar_nota(*pares[i], rnd.uniform(0, 10))
+        if i % 100 == 0:
+            m = f"R{i:07d}"
+            sa.criar_aluno(m, f"Réplica {i}")
+            sa.editar_aluno(m, f"Réplica editado {i}")
+            if i % 200 == 0:
+                sa.excluir_aluno(m)
+    escrita = time.perf_counter() - t0
+    atraso = max(a.atraso() for a in replicador.aplicadores)
+    t0 = time.perf_counter()
+    replicador.parar()
+    print(f"{escritas} escritas com replicador ativo: {escrita:.2f} s | atraso ao final: {atraso} entradas, "
+          f"zerado em {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    principal = _conteudo_tabelas(con)
+    for caminho in replicas:
+        rep = sqlite3.connect(caminho)
+        assert _conteudo_tabelas(rep) == principal, f"réplica divergente: {caminho}"
+        assert _indice_busca(rep) == _indice_busca(con), f"índice de busca divergente: {caminho}"
+        rep.close()
+    print(f"  réplicas idênticas ao principal ({sum(n for n, _ in principal.values())} linhas)")
+
+    entradas = con.execute("SELECT COUNT(*) FROM log_alteracoes").fetchone()[0]
+    primeira = con.execute("SELECT MIN(seq) FROM log_alteracoes").fetchone()[0]
+    sa.criar_replica(replicas[0])
+    with sa.AplicadorReplica(replicas[0]) as aplicador:
+        # reaplica o log inteiro sobre uma cópia que já o contém (pior caso: tudo é regravado)
+        aplicador._con.execute("UPDATE replica_estado SET seq = ?", (primeira - 1,))
+        t0 = time.perf_counter()
+        aplicador.alcancar()
+        dt = time.perf_counter() - t0
+    print(f"aplicar {entradas} entradas do log: {dt:.2f} s ({entradas / dt:,.0f} entradas/s)")
+
+    # réplica "remota": só recebe o arquivo exportado, sem acesso ao banco principal
+    remota = os.path.join(pasta, "remota.db")
+    sa.criar_replica(remota)
+    with sa.AplicadorReplica(remota) as aplicador:
+        posicao = aplicador.posicao()
+    for i in range(200):
+        sa.registrar_nota(*pares[i], rnd.uniform(0, 10))
+    arquivo_log = os.path.join(pasta, "log.jsonl")
+    exportadas = sa.exportar_log(arquivo_log, posicao)
+    principal, db_principal = _conteudo_tabelas(con), sa.DB_NAME
+    sa.fechar_conexoes()
+    sa.DB_NAME = os.path.join(pasta, "nao-existe.db")
+    with sa.AplicadorReplica(remota) as aplicador:
+        t0 = time.perf_counter()
+        aplicadas = aplicador.aplicar_arquivo(arquivo_log)
+        dt = time.perf_counter() - t0
+    sa.fechar_conexoes()
+    assert not os.path.exists(sa.DB_NAME), "o aplicador abriu o banco principal"
+    sa.DB_NAME = db_principal
+    con = sa.obter_conexao()
+    rep = sqlite3.connect(remota)
+    assert aplicadas == exportadas and _conteudo_tabelas(rep) == principal, "réplica remota divergente"
+    rep.close()
+    print(f"réplica remota: {aplicadas} entradas de log.jsonl em {dt * 1000:.0f} ms, idêntica ao principal")
+
+    for caminho in replicas:
+        with sa.AplicadorReplica(caminho) as aplicador:
+            aplicador.alcancar()
+
+    alunos = [f"A{rnd.randrange(n_alunos):07d}" for _ in range(amostras)]
+    resumo("relatorio_historico() no principal", cronometrar(lambda i: sa.relatorio_historico(alunos[i]), amostras))
+    esperado = [sa.relatorio_historico(m) for m in alunos[:500]]
+    sa.definir_replicas(replicas)
+    assert [sa.relatorio_historico(m) for m in alunos[:500]] == esperado
+    resumo("relatorio_historico() nas réplicas", cronometrar(lambda i: sa.relatorio_historico(alunos[i]), amostras))
+    sa.definir_replicas([])
+    print(f"  podadas {sa.podar_log_alteracoes(entradas)} entradas do log")
+    sa.fechar_conexoes()
+
+def bench_planos():
+    """EXPLAIN QUERY PLAN: nenhuma consulta quente pode voltar a fazer SCAN de tabela."""
+    banco_temporario()
+    popular_basico()
+    con = sa.obter_conexao()
+    con.execute("ANALYZE")
+    print("\n=== Planos de consulta ===")
+    falhas = []
+    for nome, (sql, params) in CONSULTAS_SEM_SCAN.items():
+        plano = [r[3] for r in con.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        scans = [p for p in plano if p.startswith("SCAN")]
+        print(f"{'✔' if not scans else '✘'} {nome:<28} {' / '.join(plano)}")
+        if scans:
+            falhas.append(nome)
+    sa.fechar_conexoes()
+    assert not falhas, f"consultas com SCAN: {falhas}"
+
+
+CENARIOS = {
+    "conexoes": bench_conexoes,
+    "concorrencia": bench_concorrencia,
+    "planos": bench_planos,
+    "lote": bench_lote,
+    "conflitos": bench_conflitos,
+    "cache": bench_cache,
+    "cr": bench_cr,
+    "importacao": bench_importacao,
+    "listagem": bench_listagem,
+    "modelos": bench_modelos,
+    "prerequisitos": bench_prerequisitos,
+    "alocacao": bench_alocacao,
+    "http": bench_http,
+    "instrumentacao": bench_instrumentacao,
+    "analise": bench_analise,
+    "snapshot": bench_snapshot,
+    "replicacao": bench_replicacao,
+    "espera": bench_espera,
+    "busca": bench_busca,
+    "grade": bench_grade,
+    "boletins": bench_boletins,
+    "arquivo": bench_arquivo,
+    "cli": bench_cli,
+    "auditoria": bench_auditoria,
+}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks do Sistema Acadêmico")
+    parser.add_argument("cenarios", nargs="*",
+                        help=f"gerar, suite ou cenários: {', '.join(CENARIOS)} (padrão: todos os cenários)")
+    parser.add_argument("--alunos", type=int, default=10_000, help="escala do gerador (1000 a 1000000)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--banco", help="arquivo a popular com 'gerar' (não pode existir)")
+    parser.add_argument("--json", help="salvar resultados da suíte neste arquivo")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior da suíte")
+    args = parser.parse_args(argv)
+
+    if args.cenarios[:1] == ["gerar"]:
+        if not args.banco or os.path.exists(args.banco):
+            print("Informe em --banco um arquivo novo para popular.")
+            return 1
+        sa.DB_NAME = args.banco
+        sa.inicializar()
+        print(gerar_dados(args.alunos, args.semente))
+        sa.fechar_conexoes()
+        return 0
+    if args.cenarios[:1] == ["suite"]:
+        bench_suite(args.alunos, args.semente, saida_json=args.json, comparar=args.comparar)
+        return 0
+
+    for nome in args.cenarios or list(CENARIOS):
+        if nome not in CENARIOS:
+            print(f"Cenário desconhecido: {nome}. Disponíveis: gerar, suite, {', '.join(CENARIOS)}")
+            return 1
+        CENARIOS[nome]()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
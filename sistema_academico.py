@@ -9,25 +9,449 @@ Sistema Acadêmico (arquivo único, orientação a objetos)
 - Registro de notas e frequência
 - Relatórios e listagens
 """
+# anotações não avaliadas na definição: tipos de asyncio nas assinaturas não forçam o import
+from __future__ import annotations
 
+import bisect
+import csv
+import functools
+import hashlib
+import heapq
+import itertools
+import mmap
+import os
+import random
+import re
 import sqlite3
+import sys
 import json
-from dataclasses import dataclass, field
-from typing import List, Optional
+import math
+import threading
+import time
+import unicodedata
+import urllib.parse
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, astuple, dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Importações pesadas ficam para quem precisa delas, para a partida do menu e
+# dos comandos ser rápida: asyncio e concurrent.futures nas funções do servidor
+# HTTP e dos boletins; NumPy (opcional) em carregar_numpy(), na primeira análise.
+np = None
+_NUMPY_CARREGADO = False
+
+def carregar_numpy():
+    """O módulo numpy, ou None se não estiver instalado (analise_coorte() agrega no SQLite)."""
+    global np, _NUMPY_CARREGADO
+    if not _NUMPY_CARREGADO:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        _NUMPY_CARREGADO = True
+    return np
 
 DB_NAME = "gestor_academico.db"
 
 # ============================
 # DATABASE
 # ============================
-def conectar():
-    return sqlite3.connect(DB_NAME)
+# Configuração aplicada uma única vez, quando a conexão é aberta.
+BUSY_TIMEOUT_MS = 5000
+CACHED_STATEMENTS = 256
 
-def inicializar():
-    con = conectar()
-    cur = con.cursor()
+def conectar(caminho: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Abre uma conexão nova já configurada (WAL, synchronous=NORMAL, busy_timeout,
+    foreign_keys).
+    Em modo autocommit: as transações são abertas explicitamente por transacao().
+    """
+    con = sqlite3.connect(caminho or DB_NAME,
+                          timeout=BUSY_TIMEOUT_MS / 1000,
+                          isolation_level=None,
+                          cached_statements=CACHED_STATEMENTS,
+                          check_same_thread=False,
+                          factory=ConexaoInstrumentada if INSTRUMENTACAO_ATIVA else sqlite3.Connection)
+    if INSTRUMENTACAO_ATIVA:
+        con.set_trace_callback(_contar_sql)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    con.execute("PRAGMA foreign_keys=ON")
+    return con
+
+def conectar_leitura(caminho: str) -> sqlite3.Connection:
+    """Conexão que não pode escrever (mode=ro), usada para ler réplicas."""
+    con = sqlite3.connect(f"file:{urllib.parse.quote(os.path.abspath(caminho))}?mode=ro", uri=True,
+                          timeout=BUSY_TIMEOUT_MS / 1000,
+                          isolation_level=None,
+                          cached_statements=CACHED_STATEMENTS,
+                          check_same_thread=False)
+    con.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return con
+
+class GerenciadorConexoes:
+    """
+    Mantém uma conexão de longa duração por thread (e por processo),
+    evitando abrir/fechar o arquivo SQLite a cada chamada de serviço.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._abertas: List[sqlite3.Connection] = []
+        self._geracao = 0
+
+    def obter(self) -> sqlite3.Connection:
+        chave = (os.getpid(), DB_NAME, self._geracao)
+        anterior = getattr(self._local, "chave", None)
+        if anterior != chave:
+            con = getattr(self._local, "con", None)
+            if anterior is not None and anterior[:2] == chave[:2]:
+                # só a geração mudou (reabrir): a própria thread troca a sua conexão,
+                # mas não no meio de uma transação
+                if con.in_transaction:
+                    return con
+                self._descartar(con)
+            # primeira chamada nesta thread, DB_NAME trocado ou processo filho (fork)
+            con = conectar(DB_NAME)
+            with self._lock:
+                self._abertas.append(con)
+            self._local.con = con
+            self._local.chave = chave
+        return self._local.con
+
+    def reabrir(self):
+        """Cada thread troca a sua conexão por uma nova no próximo obter(); nenhuma é fechada por outra thread."""
+        with self._lock:
+            self._geracao += 1
+
+    def _descartar(self, con: sqlite3.Connection):
+        with self._lock:
+            self._abertas.remove(con)
+        con.close()
+
+    def obter_leitura(self, caminho: str) -> sqlite3.Connection:
+        """Conexão somente leitura a outro arquivo (réplica), também uma por thread."""
+        leituras = getattr(self._local, "leituras", None)
+        if leituras is None:
+            leituras = self._local.leituras = {}
+        chave = (os.getpid(), caminho)
+        con = leituras.get(chave)
+        if con is None:
+            con = leituras[chave] = conectar_leitura(caminho)
+            with self._lock:
+                self._abertas.append(con)
+        return con
+
+    def fechar_todas(self):
+        with self._lock:
+            for con in self._abertas:
+                try:
+                    con.close()
+                except sqlite3.Error:
+                    pass
+            self._abertas.clear()
+        self._local = threading.local()
+
+GERENCIADOR = GerenciadorConexoes()
+
+def obter_conexao() -> sqlite3.Connection:
+    return GERENCIADOR.obter()
+
+def fechar_conexoes():
+    GERENCIADOR.fechar_todas()
+
+# ----- leituras roteadas para réplicas (ver definir_replicas) -----
+REPLICAS_LEITURA: List[str] = []
+_PROXIMA_REPLICA = itertools.count()
+
+def obter_conexao_leitura() -> sqlite3.Connection:
+    """
+    Conexão para consultas que aceitam dados levemente atrasados: uma das
+    réplicas configuradas (rodízio) ou, sem réplicas, a conexão principal.
+    """
+    if not REPLICAS_LEITURA:
+        return obter_conexao()
+    replicas = REPLICAS_LEITURA
+    return GERENCIADOR.obter_leitura(replicas[next(_PROXIMA_REPLICA) % len(replicas)])
+
+_TRANSACAO = threading.local()    # .alteradas: tabelas versionadas alteradas; .invalidacoes: (cache, chaves) a refazer no fim
+
+@contextmanager
+def transacao(imediata: bool = False):
+    """
+    Abre uma transação na conexão da thread atual; commit ao sair, rollback em erro.
+    Chamadas aninhadas reaproveitam a transação externa.
+    """
+    con = obter_conexao()
+    if con.in_transaction:
+        yield con
+        return
+    con.execute("BEGIN IMMEDIATE" if imediata else "BEGIN")
+    # eventos de auditoria e versões das tabelas: gravados de uma vez, logo antes do commit
+    _AUDITORIA.pendentes = []
+    _TRANSACAO.alteradas = set()
+    _TRANSACAO.invalidacoes = []
+    try:
+        yield con
+        _gravar_auditoria_pendente(con)
+        if _TRANSACAO.alteradas:
+            _subir_versoes(con, _TRANSACAO.alteradas)
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+    finally:
+        _AUDITORIA.pendentes = None
+        _TRANSACAO.alteradas = None
+        # só depois do COMMIT/ROLLBACK: antes disso outra thread ainda lê a versão antiga e a põe de volta no cache
+        invalidacoes, _TRANSACAO.invalidacoes = _TRANSACAO.invalidacoes, None
+        for cache, chaves in invalidacoes:
+            cache.invalidar(*chaves)
+
+def _alterou(con: sqlite3.Connection, *tabelas: str):
+    """
+    Anota que a escrita corrente mudou `tabelas`: versao_tabelas sobe uma vez
+    por tabela e por transação, no commit de transacao(); fora dela, na hora.
+    Toda escrita em tabela de TABELAS_VERSIONADAS precisa passar por aqui.
+    """
+    alteradas = getattr(_TRANSACAO, "alteradas", None)
+    if alteradas is None:
+        _subir_versoes(con, tabelas)
+    else:
+        alteradas.update(tabelas)
+
+def _subir_versoes(con: sqlite3.Connection, tabelas: Iterable[str]):
+    con.executemany("UPDATE versao_tabelas SET versao = versao + 1 WHERE tabela = ?", [(t,) for t in tabelas])
+
+# ----- instrumentação opcional (tempo por função e por SQL) -----
+# Desligada, não custa nada: as funções originais ficam no lugar e as conexões
+# são sqlite3.Connection comuns. Ligada, as funções de FUNCOES_INSTRUMENTADAS
+# são trocadas por versões cronometradas e as conexões são reabertas com
+# cursores que medem cada comando SQL.
+INSTRUMENTACAO_ATIVA = False
+FUNCOES_INSTRUMENTADAS = (
+    "conectar", "curso_por_codigo", "turma_por_codigo", "aluno_por_matricula",
+    "_carregar_historico", "_validar_matricula", "matricular", "matricular_lote", "alocar_turmas",
+    "turmas_compativeis", "cursos_elegiveis", "elegibilidade_geral",
+    "registrar_nota", "registrar_frequencia", "importar_notas_csv", "reconstruir_desempenho",
+    "relatorio_historico", "calcular_cr", "ranking_cr", "arquivar_periodo", "consultar_auditoria",
+    "criar_curso", "editar_curso", "excluir_curso", "listar_cursos",
+    "criar_turma", "editar_turma", "excluir_turma", "listar_turmas",
+    "criar_aluno", "editar_aluno", "excluir_aluno", "listar_alunos",
+)
+LIMITES_SEGUNDOS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 1000, 10000)
+
+class Histograma:
+    """Contagens cumulativas por faixa, no formato de histograma do Prometheus."""
+    __slots__ = ("limites", "contagens", "soma", "total", "maximo")
+
+    def __init__(self, limites: Tuple[float, ...]):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)   # última posição = acima do maior limite
+        self.soma = 0.0
+        self.total = 0
+        self.maximo = 0.0
+
+    def observar(self, valor: float):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+        if valor > self.maximo:
+            self.maximo = valor
+
+    def percentil(self, q: float) -> float:
+        """Limite superior da faixa onde cai o percentil q (0..1)."""
+        alvo, acumulado = q * self.total, 0
+        for limite, qtd in zip(self.limites, self.contagens):
+            acumulado += qtd
+            if acumulado >= alvo:
+                return limite
+        return self.maximo
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.funcoes: Dict[str, Histograma] = {}
+        self.consultas: Dict[str, Histograma] = {}
+        self.sql: Dict[str, Histograma] = {}
+
+    def _observar(self, tabela: Dict[str, Histograma], chave: str, limites, valor: float):
+        with self._lock:
+            h = tabela.get(chave)
+            if h is None:
+                h = tabela[chave] = Histograma(limites)
+            h.observar(valor)
+
+    def funcao(self, nome: str, segundos: float, consultas: int):
+        self._observar(self.funcoes, nome, LIMITES_SEGUNDOS, segundos)
+        self._observar(self.consultas, nome, LIMITES_CONSULTAS, consultas)
+
+    def comando(self, sql: str, segundos: float):
+        self._observar(self.sql, " ".join(sql.split())[:200], LIMITES_SEGUNDOS, segundos)
+
+    def limpar(self):
+        with self._lock:
+            self.funcoes.clear()
+            self.consultas.clear()
+            self.sql.clear()
+
+METRICAS = Metricas()
+_RASTRO = threading.local()      # .comandos = quantos SQL esta thread já executou
+
+def _contar_sql(_sql: str):
+    # set_trace_callback: vê tudo o que o SQLite executa (inclusive COMMIT e gatilhos)
+    _RASTRO.comandos = getattr(_RASTRO, "comandos", 0) + 1
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """
+    Cursor que mede cada comando: tempo de execute() mais o das buscas de
+    linhas, registrado quando o comando termina (última linha lida, próximo
+    execute() ou cursor descartado).
+    """
+    _sql = None
+    _decorrido = 0.0
+
+    def _registrar(self):
+        if self._sql is not None:
+            METRICAS.comando(self._sql, self._decorrido)
+            self._sql = None
+
+    def _cronometrar(self, metodo, *args):
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args)
+        finally:
+            self._decorrido += time.perf_counter() - inicio
+
+    def execute(self, sql, parametros=()):
+        self._registrar()
+        self._sql, self._decorrido = sql, 0.0
+        return self._cronometrar(super().execute, sql, parametros)
+
+    def executemany(self, sql, parametros):
+        self._registrar()
+        self._sql, self._decorrido = sql, 0.0
+        return self._cronometrar(super().executemany, sql, parametros)
+
+    def fetchone(self):
+        linha = self._cronometrar(super().fetchone)
+        if linha is None:
+            self._registrar()
+        return linha
+
+    def fetchall(self):
+        linhas = self._cronometrar(super().fetchall)
+        self._registrar()
+        return linhas
+
+    def __next__(self):
+        try:
+            return self._cronometrar(super().__next__)
+        except StopIteration:
+            self._registrar()
+            raise
+
+    def __del__(self):
+        self._registrar()
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    # Connection.execute() em C não passa por Cursor.execute(): redireciona para o cursor medido
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+_ORIGINAIS: Dict[str, object] = {}
+
+def _instrumentar(nome: str, func):
+    @functools.wraps(func)
+    def medida(*args, **kwargs):
+        comandos = getattr(_RASTRO, "comandos", 0)
+        inicio = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            METRICAS.funcao(nome, time.perf_counter() - inicio, getattr(_RASTRO, "comandos", 0) - comandos)
+    return medida
+
+def definir_instrumentacao(ativa: bool):
+    """
+    Liga/desliga a instrumentação. Cada thread passa a usar uma conexão nova
+    (com ou sem cursores medidos) na próxima chamada, fora de transação.
+    """
+    global INSTRUMENTACAO_ATIVA
+    if ativa == INSTRUMENTACAO_ATIVA:
+        return
+    modulo = globals()
+    if ativa:
+        for nome in FUNCOES_INSTRUMENTADAS:
+            _ORIGINAIS[nome] = modulo[nome]
+            modulo[nome] = _instrumentar(nome, modulo[nome])
+    else:
+        modulo.update(_ORIGINAIS)
+        _ORIGINAIS.clear()
+    INSTRUMENTACAO_ATIVA = ativa
+    GERENCIADOR.reabrir()
+
+def relatorio_instrumentacao(limite: int = 15) -> str:
+    """Tabela de texto: funções e comandos SQL mais custosos (tempo total)."""
+    def linhas(tabela: Dict[str, Histograma], consultas: Optional[Dict[str, Histograma]] = None):
+        saida = []
+        for nome, h in sorted(tabela.items(), key=lambda i: -i[1].soma)[:limite]:
+            extra = ""
+            if consultas is not None:
+                c = consultas[nome]
+                extra = f" | SQL/chamada {c.soma / c.total:6.1f} (máx {c.maximo:.0f})"
+            saida.append(f"{h.total:8d}x | total {h.soma * 1e3:10.1f} ms | média {h.soma / h.total * 1e3:8.3f} ms "
+                         f"| p95 ≤ {h.percentil(0.95) * 1e3:8.2f} ms{extra} | {nome}")
+        return saida or ["(sem dados)"]
+
+    with METRICAS._lock:
+        return "\n".join(["=== FUNÇÕES ===", *linhas(METRICAS.funcoes, METRICAS.consultas),
+                          "=== SQL ===", *linhas(METRICAS.sql)])
+
+def _rotulo_prometheus(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+def exportar_prometheus(caminho: Optional[str] = None) -> str:
+    """Métricas no formato texto do Prometheus; grava em `caminho` se informado."""
+    saida = []
+    series = (
+        ("sis_academico_funcao_segundos", "Latência das funções de serviço", "funcao", METRICAS.funcoes),
+        ("sis_academico_consultas_por_chamada", "Comandos SQL por chamada de função", "funcao", METRICAS.consultas),
+        ("sis_academico_sql_segundos", "Tempo por comando SQL (execução e leitura das linhas)", "sql", METRICAS.sql),
+    )
+    with METRICAS._lock:
+        for metrica, ajuda, rotulo, tabela in series:
+            saida.append(f"# HELP {metrica} {ajuda}")
+            saida.append(f"# TYPE {metrica} histogram")
+            for nome, h in sorted(tabela.items()):
+                r = f'{rotulo}="{_rotulo_prometheus(nome)}"'
+                acumulado = 0
+                for limite, qtd in zip(h.limites, h.contagens):
+                    acumulado += qtd
+                    saida.append(f'{metrica}_bucket{{{r},le="{limite:g}"}} {acumulado}')
+                saida.append(f'{metrica}_bucket{{{r},le="+Inf"}} {h.total}')
+                saida.append(f"{metrica}_sum{{{r}}} {h.soma:.9g}")
+                saida.append(f"{metrica}_count{{{r}}} {h.total}")
+    texto = "\n".join(saida) + "\n"
+    if caminho:
+        with open(caminho, "w", encoding="utf-8") as arq:
+            arq.write(texto)
+    return texto
 
-    cur.execute("""
+# ----- migrações de schema (versionadas por PRAGMA user_version) -----
+def _migracao_1_schema_inicial(con: sqlite3.Connection):
+    """Tabelas originais (bancos antigos estão na versão 0 mas já as possuem)."""
+    con.execute("""
         CREATE TABLE IF NOT EXISTS cursos (
             codigo TEXT PRIMARY KEY,
             nome TEXT,
@@ -35,7 +459,7 @@ def inicializar():
         )
     """)
 
-    cur.execute("""
+    con.execute("""
         CREATE TABLE IF NOT EXISTS turmas (
             codigo TEXT PRIMARY KEY,
             curso_codigo TEXT,
@@ -46,14 +470,14 @@ def inicializar():
         )
     """)
 
-    cur.execute("""
+    con.execute("""
         CREATE TABLE IF NOT EXISTS alunos (
             matricula TEXT PRIMARY KEY,
             nome TEXT
         )
     """)
 
-    cur.execute("""
+    con.execute("""
         CREATE TABLE IF NOT EXISTS matriculas (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             aluno_matricula TEXT,
@@ -63,402 +487,3812 @@ def inicializar():
         )
     """)
 
-    con.commit()
-    con.close()
+    # bancos antigos podem ter matrículas repetidas: funde cada grupo na mais antiga,
+    # que fica com a nota/frequência lançada mais recentemente em qualquer uma delas
+    for coluna in ("nota", "frequencia"):
+        con.execute(f"""
+            UPDATE matriculas SET {coluna} = (
+                SELECT d.{coluna} FROM matriculas d
+                WHERE d.aluno_matricula IS matriculas.aluno_matricula
+                  AND d.turma_codigo IS matriculas.turma_codigo
+                  AND d.{coluna} IS NOT NULL
+                ORDER BY d.id DESC LIMIT 1
+            )
+            WHERE id IN (
+                SELECT MIN(id) FROM matriculas GROUP BY aluno_matricula, turma_codigo HAVING COUNT(*) > 1
+            )
+        """)
+    con.execute("""
+        DELETE FROM matriculas WHERE id NOT IN (
+            SELECT MIN(id) FROM matriculas GROUP BY aluno_matricula, turma_codigo
+        )
+    """)
+    # um aluno só pode ter uma matrícula por turma
+    con.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_matriculas_aluno_turma
+        ON matriculas (aluno_matricula, turma_codigo)
+    """)
+
+def _migracao_2_chaves_e_prerequisitos(con: sqlite3.Connection):
+    """
+    Recria as tabelas com chaves estrangeiras e troca a coluna JSON
+    cursos.prerequisitos pela tabela normalizada prerequisitos.
+    Roda com foreign_keys desligado (ver migrar()), como recomenda o SQLite.
+    """
+    con.execute("""
+        CREATE TABLE cursos_nova (
+            codigo TEXT PRIMARY KEY,
+            nome TEXT
+        )
+    """)
+    con.execute("INSERT INTO cursos_nova (codigo, nome) SELECT codigo, nome FROM cursos")
+
+    con.execute("""
+        CREATE TABLE prerequisitos (
+            curso_codigo TEXT NOT NULL REFERENCES cursos (codigo) ON DELETE CASCADE,
+            prerequisito_codigo TEXT NOT NULL,
+            posicao INTEGER NOT NULL,
+            PRIMARY KEY (curso_codigo, prerequisito_codigo)
+        ) WITHOUT ROWID
+    """)
+    linhas = []
+    for codigo, texto in con.execute("SELECT codigo, prerequisitos FROM cursos").fetchall():
+        try:
+            lista = json.loads(texto) if texto else []
+        except ValueError:
+            lista = [texto]
+        linhas.extend((codigo, str(pr), pos) for pos, pr in enumerate(lista))
+    con.executemany("INSERT OR IGNORE INTO prerequisitos VALUES (?,?,?)", linhas)
+
+    con.execute("""
+        CREATE TABLE turmas_nova (
+            codigo TEXT PRIMARY KEY,
+            curso_codigo TEXT REFERENCES cursos (codigo),
+            professor TEXT,
+            horario TEXT,
+            limite_vagas INTEGER,
+            vagas_ocupadas INTEGER
+        )
+    """)
+    con.execute("INSERT INTO turmas_nova SELECT codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas FROM turmas")
+
+    con.execute("""
+        CREATE TABLE matriculas_nova (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            aluno_matricula TEXT REFERENCES alunos (matricula),
+            turma_codigo TEXT REFERENCES turmas (codigo),
+            nota REAL,
+            frequencia REAL,
+            UNIQUE (aluno_matricula, turma_codigo)
+        )
+    """)
+    con.execute("INSERT INTO matriculas_nova SELECT id, aluno_matricula, turma_codigo, nota, frequencia FROM matriculas")
+
+    for tabela in ("cursos", "turmas", "matriculas"):
+        con.execute(f"DROP TABLE {tabela}")
+        con.execute(f"ALTER TABLE {tabela}_nova RENAME TO {tabela}")
+
+def _migracao_3_indices(con: sqlite3.Connection):
+    """Índices dos caminhos quentes (histórico, pré-requisitos, conflitos e exclusões)."""
+    # histórico / aprovados / horários do aluno: cobre a consulta sem ir à tabela
+    con.execute("""
+        CREATE INDEX IF NOT EXISTS ix_matriculas_aluno
+        ON matriculas (aluno_matricula, turma_codigo, nota, frequencia)
+    """)
+    # guarda de excluir_turma e listas de chamada
+    con.execute("CREATE INDEX IF NOT EXISTS ix_matriculas_turma ON matriculas (turma_codigo)")
+    # guarda de excluir_curso e turmas de um curso
+    con.execute("CREATE INDEX IF NOT EXISTS ix_turmas_curso ON turmas (curso_codigo)")
+
+def _migracao_4_horario_tipado(con: sqlite3.Connection):
+    """horario passa a ser interpretado uma vez só, na gravação, em colunas tipadas."""
+    con.execute("ALTER TABLE turmas ADD COLUMN dia TEXT")
+    con.execute("ALTER TABLE turmas ADD COLUMN hora_ini INTEGER")
+    con.execute("ALTER TABLE turmas ADD COLUMN hora_fim INTEGER")
+    linhas = con.execute("SELECT codigo, horario FROM turmas").fetchall()
+    con.executemany("UPDATE turmas SET dia=?, hora_ini=?, hora_fim=? WHERE codigo=?",
+                    [(*colunas_horario(h), codigo) for codigo, h in linhas])
+
+def _migracao_5_desempenho(con: sqlite3.Connection):
+    """Agregados por aluno (soma/quantidade de notas, CR e cursos aprovados), mantidos por registrar_nota()."""
+    con.execute("""
+        CREATE TABLE desempenho_alunos (
+            aluno_matricula TEXT PRIMARY KEY,
+            soma_notas REAL NOT NULL DEFAULT 0,
+            qtd_notas INTEGER NOT NULL DEFAULT 0,
+            cr REAL
+        ) WITHOUT ROWID
+    """)
+    con.execute("CREATE INDEX ix_desempenho_cr ON desempenho_alunos (cr, aluno_matricula)")
+    # qtd = quantas matrículas do aluno naquele curso têm nota >= 6
+    con.execute("""
+        CREATE TABLE aprovacoes (
+            aluno_matricula TEXT NOT NULL,
+            curso_codigo TEXT NOT NULL,
+            qtd INTEGER NOT NULL,
+            PRIMARY KEY (aluno_matricula, curso_codigo)
+        ) WITHOUT ROWID
+    """)
+    _reconstruir_desempenho(con)
+
+def _migracao_6_indices_listagem(con: sqlite3.Connection):
+    """Índices para paginação por chave (keyset) com filtro por curso ou professor."""
+    con.execute("DROP INDEX IF EXISTS ix_turmas_curso")
+    con.execute("CREATE INDEX ix_turmas_curso ON turmas (curso_codigo, codigo)")
+    con.execute("CREATE INDEX ix_turmas_professor ON turmas (professor, codigo)")
+
+def _migracao_7_versao_dados(con: sqlite3.Connection):
+    """Contador de alterações (uma linha), usado para invalidar caches em disco."""
+    con.execute("""
+        CREATE TABLE versao_dados (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            versao INTEGER NOT NULL
+        )
+    """)
+    con.execute("INSERT INTO versao_dados VALUES (1, 0)")
+    eventos = {
+        "matriculas": ("INSERT", "DELETE", "UPDATE OF aluno_matricula, turma_codigo, nota, frequencia"),
+        "turmas": ("INSERT", "DELETE", "UPDATE OF codigo, curso_codigo"),
+        "desempenho_alunos": ("INSERT", "DELETE", "UPDATE OF cr"),
+    }
+    for tabela, lista in eventos.items():
+        for evento in lista:
+            nome = f"tg_versao_{tabela}_{evento.split()[0].lower()}"
+            con.execute(f"""
+                CREATE TRIGGER {nome} AFTER {evento} ON {tabela}
+                BEGIN UPDATE versao_dados SET versao = versao + 1 WHERE id = 1; END
+            """)
+
+# tabela -> eventos que contam como alteração (UPDATE só das colunas listadas)
+EVENTOS_VERSAO = {
+    "alunos": ("INSERT", "DELETE", "UPDATE OF matricula, nome"),
+    "cursos": ("INSERT", "DELETE", "UPDATE OF codigo, nome"),
+    "prerequisitos": ("INSERT", "DELETE", "UPDATE"),
+    "turmas": ("INSERT", "DELETE", "UPDATE"),
+    "matriculas": ("INSERT", "DELETE", "UPDATE OF aluno_matricula, turma_codigo, nota, frequencia"),
+    "desempenho_alunos": ("INSERT", "DELETE", "UPDATE OF cr"),
+}
+
+def _migracao_8_versao_por_tabela(con: sqlite3.Connection):
+    """
+    Troca o contador único por um contador por tabela, para que quem guarda
+    cópias (cache da análise, snapshot colunar) saiba exatamente o que mudou.
+    """
+    inicial = con.execute("SELECT versao FROM versao_dados WHERE id = 1").fetchone()[0]
+    for (nome,) in con.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'tg_versao_%'").fetchall():
+        con.execute(f"DROP TRIGGER {nome}")
+    con.execute("DROP TABLE versao_dados")
+    con.execute("""
+        CREATE TABLE versao_tabelas (
+            tabela TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    # parte do contador antigo: a soma nunca repete um valor já visto
+    con.executemany("INSERT INTO versao_tabelas VALUES (?, ?)", [(t, inicial) for t in EVENTOS_VERSAO])
+    for tabela, eventos in EVENTOS_VERSAO.items():
+        for evento in eventos:
+            con.execute(f"""
+                CREATE TRIGGER tg_versao_{tabela}_{evento.split()[0].lower()} AFTER {evento} ON {tabela}
+                BEGIN UPDATE versao_tabelas SET versao = versao + 1 WHERE tabela = '{tabela}'; END
+            """)
+
+TABELAS_VERSIONADAS = tuple(EVENTOS_VERSAO)
+
+# tabela -> colunas da chave primária, registradas em log_alteracoes a cada alteração
+CHAVES_REPLICACAO = {
+    "alunos": ("matricula",),
+    "cursos": ("codigo",),
+    "prerequisitos": ("curso_codigo", "prerequisito_codigo"),
+    "turmas": ("codigo",),
+    "matriculas": ("id",),
+    "desempenho_alunos": ("aluno_matricula",),
+    "aprovacoes": ("aluno_matricula", "curso_codigo"),
+    "matriculas_arquivo": ("id",),
+}
+
+def _criar_gatilhos_log(con: sqlite3.Connection, tabela: str, com_linha: bool = False):
+    """
+    Gatilhos tg_log_* da tabela. com_linha=True (a partir da migração 15) grava
+    também a linha nova inteira (json_object das colunas atuais da tabela) nas
+    inserções e alterações; uma migração que mude as colunas precisa recriá-los.
+    """
+    colunas = CHAVES_REPLICACAO[tabela]
+    novo = "json_array(" + ", ".join(f"NEW.{c}" for c in colunas) + ")"
+    antigo = "json_array(" + ", ".join(f"OLD.{c}" for c in colunas) + ")"
+    mudou = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in colunas)
+    if com_linha:
+        # json_object escreve REAL com 15 dígitos; %!.17g volta ao mesmo double na réplica
+        pares = [
+            f"'{c}', CASE typeof(NEW.{c}) WHEN 'real' THEN json(printf('%!.17g', NEW.{c})) ELSE NEW.{c} END"
+            if tipo.upper() == "REAL" else f"'{c}', NEW.{c}"
+            for _, c, tipo, *_ in con.execute(f"PRAGMA table_info({tabela})")
+        ]
+        linha = ", json_object(" + ", ".join(pares) + ")"
+        registro = "INSERT INTO log_alteracoes (tabela, operacao, chave, linha)"
+        sem_linha = ", NULL"
+    else:
+        linha = sem_linha = ""
+        registro = "INSERT INTO log_alteracoes (tabela, operacao, chave)"
+    con.execute(f"""
+        CREATE TRIGGER tg_log_{tabela}_insert AFTER INSERT ON {tabela}
+        BEGIN {registro} VALUES ('{tabela}', 'I', {novo}{linha}); END
+    """)
+    con.execute(f"""
+        CREATE TRIGGER tg_log_{tabela}_delete AFTER DELETE ON {tabela}
+        BEGIN {registro} VALUES ('{tabela}', 'D', {antigo}{sem_linha}); END
+    """)
+    # chave alterada: a linha some da chave antiga e aparece na nova
+    con.execute(f"""
+        CREATE TRIGGER tg_log_{tabela}_update AFTER UPDATE ON {tabela}
+        BEGIN
+            {registro} SELECT '{tabela}', 'D', {antigo}{sem_linha} WHERE {mudou};
+            {registro} VALUES ('{tabela}', 'U', {novo}{linha});
+        END
+    """)
+
+def _remover_gatilhos_log(con: sqlite3.Connection):
+    for (nome,) in con.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'tg_log_%'").fetchall():
+        con.execute(f"DROP TRIGGER {nome}")
+
+def _migracao_9_log_alteracoes(con: sqlite3.Connection):
+    """
+    Log de alterações para as réplicas de leitura: toda linha inserida, alterada
+    ou removida registra (tabela, operação, chave) na mesma transação que a
+    mudou, seja qual for a função de serviço. Só a chave vai para o log; quem
+    aplica lê o valor atual da linha no banco principal (ver AplicadorReplica).
+    AUTOINCREMENT garante que seq nunca é reaproveitado depois de uma poda.
+    """
+    con.execute("""
+        CREATE TABLE log_alteracoes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabela TEXT NOT NULL,
+            operacao TEXT NOT NULL,
+            chave TEXT NOT NULL
+        )
+    """)
+    # matriculas_arquivo ganha os seus na migração 12, que a cria
+    for tabela in ("alunos", "cursos", "prerequisitos", "turmas", "matriculas", "desempenho_alunos", "aprovacoes"):
+        _criar_gatilhos_log(con, tabela)
+
+def _migracao_10_lista_espera(con: sqlite3.Connection):
+    """
+    Fila de espera por turma, em ordem de chegada. A chave (turma, posicao)
+    deixa o primeiro da fila e o fim dela a uma busca no índice.
+    """
+    con.execute("""
+        CREATE TABLE lista_espera (
+            turma_codigo TEXT NOT NULL REFERENCES turmas (codigo) ON DELETE CASCADE,
+            posicao INTEGER NOT NULL,
+            aluno_matricula TEXT NOT NULL REFERENCES alunos (matricula) ON DELETE CASCADE,
+            criado_em TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%S', 'now')),
+            PRIMARY KEY (turma_codigo, posicao)
+        ) WITHOUT ROWID
+    """)
+    con.execute("CREATE UNIQUE INDEX ux_espera_aluno_turma ON lista_espera (aluno_matricula, turma_codigo)")
+
+# índice de busca: tipo -> (tabela, coluna da chave, coluna do texto)
+FONTES_BUSCA = {
+    "aluno": ("alunos", "matricula", "nome"),
+    "curso": ("cursos", "codigo", "nome"),
+    "professor": ("turmas", "codigo", "professor"),
+}
+
+def _migracao_11_busca(con: sqlite3.Connection):
+    """
+    Índices FTS5 (um por tipo) sobre nome do aluno, nome do curso e professor
+    da turma, sem acentos e sem caixa, com índice de prefixos para o
+    autocompletar. busca_ids dá a cada linha de origem um id estável (o rowid
+    de alunos/cursos/turmas pode mudar num VACUUM); os gatilhos mantêm tudo
+    em dia em qualquer caminho de escrita (CRUD, importações, réplicas).
+    """
+    con.execute("""
+        CREATE TABLE busca_ids (
+            id INTEGER PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            UNIQUE (tipo, chave)
+        )
+    """)
+    for tipo, (tabela, chave, texto) in FONTES_BUSCA.items():
+        fts = f"busca_{tabela}"
+        con.execute(f"""
+            CREATE VIRTUAL TABLE {fts} USING fts5 (
+                texto, tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3'
+            )
+        """)
+        id_de = f"(SELECT id FROM busca_ids WHERE tipo = '{tipo}' AND chave = {{}}.{chave})"
+        con.execute(f"""
+            CREATE TRIGGER tg_busca_{tabela}_insert AFTER INSERT ON {tabela}
+            BEGIN
+                INSERT INTO busca_ids (tipo, chave) VALUES ('{tipo}', NEW.{chave});
+                INSERT INTO {fts} (rowid, texto) VALUES (last_insert_rowid(), NEW.{texto});
+            END
+        """)
+        con.execute(f"""
+            CREATE TRIGGER tg_busca_{tabela}_delete AFTER DELETE ON {tabela}
+            BEGIN
+                DELETE FROM {fts} WHERE rowid = {id_de.format("OLD")};
+                DELETE FROM busca_ids WHERE tipo = '{tipo}' AND chave = OLD.{chave};
+            END
+        """)
+        con.execute(f"""
+            CREATE TRIGGER tg_busca_{tabela}_update AFTER UPDATE OF {chave}, {texto} ON {tabela}
+            BEGIN
+                UPDATE busca_ids SET chave = NEW.{chave} WHERE tipo = '{tipo}' AND chave = OLD.{chave};
+                UPDATE {fts} SET texto = NEW.{texto} WHERE rowid = {id_de.format("NEW")};
+            END
+        """)
+    _reconstruir_busca(con)
+
+def _migracao_12_periodos(con: sqlite3.Connection):
+    """
+    Período letivo da turma (ex.: "2025.1") e o arquivo para onde
+    arquivar_periodo() move as matrículas de períodos encerrados. Turmas
+    antigas ficam sem período e nunca são arquivadas.
+    """
+    con.execute("ALTER TABLE turmas ADD COLUMN periodo TEXT")
+    con.execute("CREATE INDEX ix_turmas_periodo ON turmas (periodo, codigo)")
+    # id é o mesmo que a linha tinha em matriculas (AUTOINCREMENT nunca o reaproveita);
+    # turma_codigo sem chave estrangeira: a turma de um período arquivado pode ser excluída
+    con.execute("""
+        CREATE TABLE matriculas_arquivo (
+            id INTEGER PRIMARY KEY,
+            aluno_matricula TEXT NOT NULL REFERENCES alunos (matricula),
+            turma_codigo TEXT NOT NULL,
+            curso_codigo TEXT,
+            periodo TEXT NOT NULL,
+            nota REAL,
+            frequencia REAL
+        )
+    """)
+    con.execute("CREATE INDEX ix_arquivo_aluno ON matriculas_arquivo (aluno_matricula, periodo)")
+    _criar_gatilhos_log(con, "matriculas_arquivo")
+
+def _migracao_13_auditoria(con: sqlite3.Connection):
+    """
+    Catálogo da auditoria de alterações. Os eventos ficam em uma tabela por
+    mês (auditoria_AAAAMM, ver _criar_particao_auditoria), criada na primeira
+    gravação do mês e listada aqui com o último seq já copiado para o índice
+    da partição.
+    """
+    con.execute("""
+        CREATE TABLE auditoria_particoes (
+            mes INTEGER PRIMARY KEY,
+            indexado_ate INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+def _migracao_14_versoes_por_transacao(con: sqlite3.Connection):
+    """
+    Remove os gatilhos por linha de versao_tabelas: um lote de milhares de
+    linhas fazia milhares de UPDATEs no contador. As versões passam a subir
+    uma vez por tabela e por transação, pelos caminhos de escrita (_alterou).
+    """
+    for (nome,) in con.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'tg_versao_%'").fetchall():
+        con.execute(f"DROP TRIGGER {nome}")
+
+def _migracao_15_log_com_linhas(con: sqlite3.Connection):
+    """
+    O log passa a levar a linha inteira (coluna linha, JSON) em cada inserção
+    e alteração: quem aplica não precisa mais ler o banco principal, e o log
+    pode ser levado para outra máquina (exportar_log). O log também deixa de
+    ser gravado enquanto ninguém o usa: os gatilhos só existem depois de
+    definir_log_alteracoes(True), que criar_replica() chama. Réplicas antigas
+    precisam ser recriadas (o schema mudou).
+    """
+    _remover_gatilhos_log(con)
+    con.execute("DELETE FROM log_alteracoes")
+    con.execute("ALTER TABLE log_alteracoes ADD COLUMN linha TEXT")
+
+def _migracao_16_horas_no_dia(con: sqlite3.Connection):
+    """
+    Horas fora de 0..HORAS_DIA passam a ser formato inválido (parse_horario):
+    seg-0-10000000000 virava uma máscara de bilhões de bits. Turmas já
+    gravadas assim perdem as colunas tipadas e conflitam com tudo, como
+    qualquer horário inválido.
+    """
+    con.execute("""
+        UPDATE turmas SET dia = NULL, hora_ini = NULL, hora_fim = NULL
+        WHERE hora_ini NOT BETWEEN 0 AND ? OR hora_fim NOT BETWEEN 0 AND ?
+    """, (HORAS_DIA, HORAS_DIA))
+
+MIGRACOES = [
+    _migracao_1_schema_inicial,
+    _migracao_2_chaves_e_prerequisitos,
+    _migracao_3_indices,
+    _migracao_4_horario_tipado,
+    _migracao_5_desempenho,
+    _migracao_6_indices_listagem,
+    _migracao_7_versao_dados,
+    _migracao_8_versao_por_tabela,
+    _migracao_9_log_alteracoes,
+    _migracao_10_lista_espera,
+    _migracao_11_busca,
+    _migracao_12_periodos,
+    _migracao_13_auditoria,
+    _migracao_14_versoes_por_transacao,
+    _migracao_15_log_com_linhas,
+    _migracao_16_horas_no_dia,
+]
+SCHEMA_VERSAO = len(MIGRACOES)
+
+def versao_schema(con: sqlite3.Connection) -> int:
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+def migrar(con: sqlite3.Connection) -> int:
+    """
+    Aplica, em ordem, as migrações pendentes. Cada uma roda na sua própria
+    transação junto com a atualização de user_version, então um banco
+    nunca fica em um estado intermediário. Retorna a versão final.
+    """
+    versao = versao_schema(con)
+    if versao >= SCHEMA_VERSAO:
+        return versao
+    # não pode ser alterado dentro de uma transação
+    con.execute("PRAGMA foreign_keys=OFF")
+    try:
+        for numero, migracao in enumerate(MIGRACOES[versao:], start=versao + 1):
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                if versao_schema(con) >= numero:
+                    # outro processo migrou enquanto esperávamos o lock
+                    con.rollback()
+                    continue
+                migracao(con)
+                con.execute(f"PRAGMA user_version={numero}")
+            except BaseException:
+                con.rollback()
+                raise
+            con.commit()
+    finally:
+        con.execute("PRAGMA foreign_keys=ON")
+    return versao_schema(con)
+
+def inicializar():
+    migrar(obter_conexao())
 
 
 # ============================
 # MODELOS
 # ============================
+# Modelos com __slots__ (sem __dict__ por instância): relatórios grandes
+# criam milhões deles. Para nem criar objetos, use formato="tuplas"/"colunas"
+# nas listagens.
 class EntidadeBase:
+    __slots__ = ()
+
     def __repr__(self):
-        return f"<{self.__class__.__name__} {self.__dict__}>"
+        return f"<{self.__class__.__name__} {asdict(self)}>"
 
-@dataclass
+@dataclass(slots=True)
 class Curso(EntidadeBase):
     codigo: str
     nome: str
     prerequisitos: List[str] = field(default_factory=list)
 
-@dataclass
-class Turma(EntidadeBase):
-    codigo: str
-    curso_codigo: str
-    professor: str
-    horario: str       # formato esperado: dia-ini-fim, ex: seg-8-10
-    limite_vagas: int
-    vagas_ocupadas: int = 0
+@dataclass(slots=True)
+class Turma(EntidadeBase):
+    codigo: str
+    curso_codigo: str
+    professor: str
+    horario: str       # formato esperado: dia-ini-fim, ex: seg-8-10
+    limite_vagas: int
+    vagas_ocupadas: int = 0
+
+@dataclass(slots=True)
+class Aluno(EntidadeBase):
+    matricula: str
+    nome: str
+
+@dataclass(slots=True)
+class Matricula(EntidadeBase):
+    aluno_matricula: str
+    turma_codigo: str
+    nota: Optional[float] = None
+    frequencia: Optional[float] = None
+
+
+# ============================
+# SERVIÇOS / LÓGICA
+# ============================
+# ----- cache de leitura (cursos / turmas / alunos) -----
+CACHE_ATIVO = True           # desligue (False) para testes que mexem no banco por fora
+CACHE_TAMANHO = 10_000
+CACHE_TTL_S = 300.0
+
+class CacheLRU:
+    """
+    Cache em memória com expulsão LRU e validade (TTL), seguro entre threads.
+    As chaves incluem DB_NAME para que trocar de banco não devolva dados de outro arquivo.
+    """
+    def __init__(self, nome: str, tamanho: int = CACHE_TAMANHO, ttl_s: float = CACHE_TTL_S):
+        self.nome = nome
+        self.tamanho = tamanho
+        self.ttl_s = ttl_s
+        self.acertos = 0
+        self.falhas = 0
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, carregar):
+        """Devolve o valor em cache ou chama carregar(); valores None não são guardados."""
+        if not CACHE_ATIVO:
+            return carregar()
+        chave = (DB_NAME, chave)
+        agora = time.monotonic()
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is not None and item[0] > agora:
+                self._dados.move_to_end(chave)
+                self.acertos += 1
+                return item[1]
+            self.falhas += 1
+        valor = carregar()
+        if valor is not None:
+            with self._lock:
+                self._dados[chave] = (agora + self.ttl_s, valor)
+                self._dados.move_to_end(chave)
+                while len(self._dados) > self.tamanho:
+                    self._dados.popitem(last=False)
+        return valor
+
+    def invalidar(self, *chaves):
+        """
+        Descarta as chaves. Dentro de transacao() (mesmo aninhada) descarta de
+        novo quando a transação externa termina, com commit ou rollback.
+        """
+        with self._lock:
+            for chave in chaves:
+                self._dados.pop((DB_NAME, chave), None)
+        invalidacoes = getattr(_TRANSACAO, "invalidacoes", None)
+        if invalidacoes is not None:
+            invalidacoes.append((self, chaves))
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {"acertos": self.acertos, "falhas": self.falhas, "itens": len(self._dados)}
+
+CACHE_CURSOS = CacheLRU("cursos")
+CACHE_TURMAS = CacheLRU("turmas")
+CACHE_ALUNOS = CacheLRU("alunos")
+
+def definir_cache(ativo: bool):
+    """Liga/desliga o cache de leitura; ao mudar, descarta o que estava guardado."""
+    global CACHE_ATIVO
+    CACHE_ATIVO = ativo
+    limpar_caches()
+
+def limpar_caches():
+    for cache in (CACHE_CURSOS, CACHE_TURMAS, CACHE_ALUNOS):
+        cache.limpar()
+    with _GRAFOS_LOCK:
+        _GRAFOS.clear()
+
+def estatisticas_cache() -> Dict[str, Dict[str, int]]:
+    return {c.nome: c.estatisticas() for c in (CACHE_CURSOS, CACHE_TURMAS, CACHE_ALUNOS)}
+
+# ----- consultas básicas -----
+# Os objetos devolvidos podem vir do cache: trate-os como somente leitura.
+def curso_por_codigo(codigo: str) -> Optional[Curso]:
+    return CACHE_CURSOS.obter(codigo, lambda: _curso_do_banco(codigo))
+
+def turma_por_codigo(codigo: str) -> Optional[Turma]:
+    return CACHE_TURMAS.obter(codigo, lambda: _turma_do_banco(codigo))
+
+def aluno_por_matricula(m: str) -> Optional[Aluno]:
+    return CACHE_ALUNOS.obter(m, lambda: _aluno_do_banco(m))
+
+def _curso_do_banco(codigo: str) -> Optional[Curso]:
+    con = obter_conexao()
+    row = con.execute("SELECT codigo, nome FROM cursos WHERE codigo=?", (codigo,)).fetchone()
+    if not row:
+        return None
+    cur = con.execute("""
+        SELECT prerequisito_codigo FROM prerequisitos
+        WHERE curso_codigo=? ORDER BY posicao
+    """, (codigo,))
+    return Curso(row[0], row[1], [r[0] for r in cur.fetchall()])
+
+def _turma_do_banco(codigo: str) -> Optional[Turma]:
+    con = obter_conexao()
+    row = con.execute("""
+        SELECT codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas
+        FROM turmas WHERE codigo=?
+    """, (codigo,)).fetchone()
+    if not row:
+        return None
+    return Turma(row[0], row[1], row[2], row[3], row[4], row[5] or 0)
+
+def _aluno_do_banco(m: str) -> Optional[Aluno]:
+    con = obter_conexao()
+    row = con.execute("SELECT matricula, nome FROM alunos WHERE matricula=?", (m,)).fetchone()
+    if not row:
+        return None
+    return Aluno(row[0], row[1])
+
+# ----- util: parse horário e checar conflito -----
+HORAS_DIA = 24    # ini e fim vão de 0 a 24: a máscara de horas de um dia cabe em 24 bits
+
+def parse_horario(h: str):
+    """
+    Espera formato: dia-ini-fim  (ex: seg-8-10), horas de 0 a HORAS_DIA
+    Retorna (dia, ini:int, fim:int)
+    """
+    try:
+        dia, ini, fim = h.split("-")
+        ini, fim = int(ini), int(fim)
+    except Exception:
+        raise ValueError("Formato de horário inválido. Use dia-ini-fim, ex: seg-8-10")
+    if not (0 <= ini <= HORAS_DIA and 0 <= fim <= HORAS_DIA):
+        raise ValueError(f"Formato de horário inválido: horas vão de 0 a {HORAS_DIA}, ex: seg-8-10")
+    return dia.strip().lower(), ini, fim
+
+def horarios_conflitam(h1: str, h2: str) -> bool:
+    """
+    Retorna True se horários conflitam.
+    Considera mesmo 'dia' e intervalos numéricos [ini, fim)
+    """
+    try:
+        dia1, ini1, fim1 = parse_horario(h1)
+        dia2, ini2, fim2 = parse_horario(h2)
+    except ValueError:
+        # se formato inválido, assume conservadoramente que conflitam
+        return True
+
+    if dia1 != dia2:
+        return False
+    return max(ini1, ini2) < min(fim1, fim2)
+
+def colunas_horario(h: Optional[str]) -> Tuple[Optional[str], Optional[int], Optional[int]]:
+    """(dia, ini, fim) para as colunas tipadas de turmas; tudo None se o formato for inválido."""
+    try:
+        return parse_horario(h)
+    except (ValueError, AttributeError):
+        return None, None, None
+
+def mascara_horas(ini: int, fim: int) -> int:
+    """Bits [ini, fim) ligados: dois intervalos de horas inteiras conflitam se as máscaras se cruzam."""
+    if fim <= ini:
+        return 0
+    return ((1 << (fim - ini)) - 1) << ini
+
+@functools.lru_cache(maxsize=4096)
+def faixa_horario(h: str) -> Optional[Tuple[str, int]]:
+    """(dia, máscara) de um horário em texto, ou None se o formato for inválido."""
+    dia, ini, fim = colunas_horario(h)
+    if dia is None:
+        return None
+    return dia, mascara_horas(ini, fim)
+
+@dataclass(slots=True)
+class AgendaAluno:
+    """
+    Horários ocupados de um aluno, como uma máscara de horas por dia.
+    Detectar conflito custa O(1) (um AND por consulta), em vez de comparar
+    o novo horário com cada turma do aluno via horarios_conflitam().
+    Horários em formato inválido conflitam com qualquer outro, como antes.
+    """
+    mascaras: Dict[str, int] = field(default_factory=dict)
+    horarios: List[str] = field(default_factory=list)
+    invalidos: int = 0
+
+    def adicionar(self, horario: str, dia: Optional[str] = None,
+                  ini: Optional[int] = None, fim: Optional[int] = None):
+        """Recebe as colunas tipadas quando disponíveis; senão interpreta o texto."""
+        faixa = faixa_horario(horario) if dia is None else (dia, mascara_horas(ini, fim))
+        self.horarios.append(horario)
+        if faixa is None:
+            self.invalidos += 1
+        else:
+            self.mascaras[faixa[0]] = self.mascaras.get(faixa[0], 0) | faixa[1]
+
+    def cabe_faixa(self, faixa: Optional[Tuple[str, int]]) -> bool:
+        if not self.horarios:
+            return True
+        if faixa is None or self.invalidos:
+            return False
+        return not (self.mascaras.get(faixa[0], 0) & faixa[1])
+
+    def cabe(self, horario: str) -> bool:
+        return self.cabe_faixa(faixa_horario(horario))
+
+    def conflito(self, horario: str) -> Optional[str]:
+        """Horário já ocupado que conflita com `horario` (o primeiro, na ordem de inclusão)."""
+        if self.cabe(horario):
+            return None
+        for h in self.horarios:
+            if horarios_conflitam(h, horario):
+                return h
+        return None
+
+# ----- pré-requisitos -----
+class GrafoPrerequisitos:
+    """
+    DAG de pré-requisitos em memória. Cada curso recebe um índice inteiro e
+    conjuntos de cursos viram bitsets (int): bit i ligado = curso codigos[i].
+    O fecho transitivo é calculado uma vez (em ordem topológica) e reaproveitado.
+    """
+    __slots__ = ("codigos", "n_cursos", "indice", "diretos", "mascaras", "_fecho")
+
+    def __init__(self, cursos: Iterable[str], arestas: Iterable[Tuple[str, str]]):
+        self.codigos: List[str] = list(cursos)
+        self.n_cursos = len(self.codigos)
+        self.indice: Dict[str, int] = {c: i for i, c in enumerate(self.codigos)}
+        self.diretos: List[List[int]] = [[] for _ in self.codigos]
+        for curso, prereq in arestas:
+            # pré-requisito que não é curso cadastrado vira nó sem arestas, com índice >= n_cursos
+            i, p = self._indice_ou_novo(curso), self._indice_ou_novo(prereq)
+            self.diretos[i].append(p)
+        self.mascaras: List[int] = [self.mascara_indices(ps) for ps in self.diretos]
+        self._fecho: Optional[List[int]] = None
+
+    @classmethod
+    def carregar(cls, con: sqlite3.Connection) -> "GrafoPrerequisitos":
+        cursos = [r[0] for r in con.execute("SELECT codigo FROM cursos ORDER BY codigo")]
+        arestas = con.execute("""
+            SELECT curso_codigo, prerequisito_codigo FROM prerequisitos
+            ORDER BY curso_codigo, posicao
+        """).fetchall()
+        return cls(cursos, arestas)
+
+    def _indice_ou_novo(self, codigo: str) -> int:
+        i = self.indice.get(codigo)
+        if i is None:
+            i = self.indice[codigo] = len(self.codigos)
+            self.codigos.append(codigo)
+            self.diretos.append([])
+        return i
+
+    @staticmethod
+    def mascara_indices(indices: Iterable[int]) -> int:
+        m = 0
+        for i in indices:
+            m |= 1 << i
+        return m
+
+    def mascara(self, codigos: Iterable[str]) -> int:
+        """Bitset dos cursos conhecidos em `codigos` (desconhecidos são ignorados)."""
+        return self.mascara_indices(self.indice[c] for c in codigos if c in self.indice)
+
+    def codigos_da_mascara(self, m: int) -> List[str]:
+        return [self.codigos[i] for i in _indices_bits(m)]
+
+    @property
+    def fecho(self) -> List[int]:
+        """fecho[i] = bitset de todos os pré-requisitos (diretos e indiretos) do curso i."""
+        if self._fecho is None:
+            self._fecho = self._calcular_fecho()
+        return self._fecho
+
+    def _calcular_fecho(self) -> List[int]:
+        n = len(self.codigos)
+        fecho = [0] * n
+        dependentes = [[] for _ in range(n)]
+        faltam = [len(set(ps)) for ps in self.diretos]
+        for i, ps in enumerate(self.diretos):
+            for p in set(ps):
+                dependentes[p].append(i)
+        # Kahn: um curso é resolvido depois de todos os seus pré-requisitos
+        prontos = [i for i in range(n) if not faltam[i]]
+        while prontos:
+            p = prontos.pop()
+            for i in dependentes[p]:
+                fecho[i] |= (1 << p) | fecho[p]
+                faltam[i] -= 1
+                if not faltam[i]:
+                    prontos.append(i)
+        # sobram só cursos em ciclo (dados antigos): ponto fixo
+        restantes = [i for i in range(n) if faltam[i]]
+        mudou = True
+        while mudou:
+            mudou = False
+            for i in restantes:
+                novo = fecho[i]
+                for p in self.diretos[i]:
+                    novo |= (1 << p) | fecho[p]
+                if novo != fecho[i]:
+                    fecho[i] = novo
+                    mudou = True
+        return fecho
+
+    def prerequisitos_transitivos(self, codigo: str) -> List[str]:
+        i = self.indice.get(codigo)
+        return [] if i is None else self.codigos_da_mascara(self.fecho[i])
+
+    def cursos_em_ciclo(self) -> List[str]:
+        return [c for i, c in enumerate(self.codigos) if self.fecho[i] >> i & 1]
+
+    def ciclo_ao_definir(self, codigo: str, prerequisitos: Iterable[str]) -> Optional[List[str]]:
+        """
+        Ciclo que surgiria se `codigo` passasse a exigir `prerequisitos`, como
+        caminho [codigo, ..., codigo]; None se o grafo continua acíclico.
+        """
+        alvo = self.indice.get(codigo)
+        for pr in prerequisitos:
+            if pr == codigo:
+                return [codigo, codigo]
+            p = self.indice.get(pr)
+            if alvo is None or p is None or not (self.fecho[p] >> alvo & 1):
+                continue
+            # desce só por cursos que ainda alcançam o alvo
+            caminho = [codigo, pr]
+            while p != alvo:
+                p = next(q for q in self.diretos[p] if q == alvo or self.fecho[q] >> alvo & 1)
+                caminho.append(self.codigos[p])
+            return caminho
+        return None
+
+    def elegiveis(self, aprovados: int) -> int:
+        """Bitset dos cursos ainda não aprovados cujos pré-requisitos diretos estão todos em `aprovados`."""
+        m = 0
+        for i in range(self.n_cursos):
+            if not (self.mascaras[i] & ~aprovados) and not (aprovados >> i & 1):
+                m |= 1 << i
+        return m
+
+def _indices_bits(m: int) -> List[int]:
+    """Posições dos bits ligados; o custo acompanha a quantidade de bits ligados."""
+    bits = format(m, "b")[::-1] if m else ""
+    indices = []
+    i = bits.find("1")
+    while i != -1:
+        indices.append(i)
+        i = bits.find("1", i + 1)
+    return indices
+
+_GRAFOS: Dict[str, Tuple[Tuple[int, ...], GrafoPrerequisitos]] = {}   # banco -> (versões de cursos e prerequisitos, grafo)
+_GRAFOS_LOCK = threading.Lock()
+
+def grafo_prerequisitos() -> GrafoPrerequisitos:
+    """
+    Grafo do banco atual, remontado quando versao_tabelas de cursos ou de
+    prerequisitos muda (inclusive por outro processo). Dentro de uma
+    transação que já alterou essas tabelas, o grafo é montado sem ir para o
+    cache: as versões só sobem no commit.
+    """
+    con = obter_conexao()
+    alteradas = getattr(_TRANSACAO, "alteradas", None)
+    if not CACHE_ATIVO or (alteradas and not alteradas.isdisjoint(("cursos", "prerequisitos"))):
+        return GrafoPrerequisitos.carregar(con)
+    versao = tuple(v for (v,) in con.execute(
+        "SELECT versao FROM versao_tabelas WHERE tabela IN ('cursos', 'prerequisitos') ORDER BY tabela"))
+    with _GRAFOS_LOCK:
+        item = _GRAFOS.get(DB_NAME)
+    if item is not None and item[0] == versao:
+        return item[1]
+    grafo = GrafoPrerequisitos.carregar(con)
+    with _GRAFOS_LOCK:
+        _GRAFOS[DB_NAME] = (versao, grafo)
+    return grafo
+
+def cursos_elegiveis(aluno_matricula: str) -> List[str]:
+    """Cursos que o aluno pode cursar a seguir: não aprovados e com os pré-requisitos cumpridos."""
+    grafo = grafo_prerequisitos()
+    aprovados = grafo.mascara(cursos_aprovados(aluno_matricula))
+    return grafo.codigos_da_mascara(grafo.elegiveis(aprovados))
+
+@dataclass(slots=True)
+class Elegibilidade:
+    """
+    Resultado de elegibilidade_geral(): para cada curso (índice do grafo), o
+    bitset dos alunos (índice em `alunos`, ordenado por matrícula) que podem cursá-lo.
+    Nós que não são cursos cadastrados ficam com bitset vazio.
+    """
+    grafo: GrafoPrerequisitos
+    alunos: List[str]
+    por_curso: List[int]
+
+    def alunos_do_curso(self, codigo: str) -> List[str]:
+        i = self.grafo.indice.get(codigo)
+        return [] if i is None else [self.alunos[a] for a in _indices_bits(self.por_curso[i])]
+
+    def contagem_por_curso(self) -> Dict[str, int]:
+        return {self.grafo.codigos[i]: self.por_curso[i].bit_count() for i in range(self.grafo.n_cursos)}
+
+    def cursos_do_aluno(self, matricula: str) -> List[str]:
+        a = bisect.bisect_left(self.alunos, matricula)
+        if a == len(self.alunos) or self.alunos[a] != matricula:
+            return []
+        return [self.grafo.codigos[i] for i, m in enumerate(self.por_curso) if m >> a & 1]
+
+    def por_aluno(self) -> Iterator[Tuple[str, List[str]]]:
+        """(matrícula, cursos elegíveis) para todos os alunos, transpondo os bitsets uma vez."""
+        listas = [[] for _ in self.alunos]
+        for i, m in enumerate(self.por_curso):
+            codigo = self.grafo.codigos[i]
+            for a in _indices_bits(m):
+                listas[a].append(codigo)
+        return zip(self.alunos, listas)
+
+def elegibilidade_geral() -> Elegibilidade:
+    """
+    Cursos elegíveis de todos os alunos de uma vez. Em vez de avaliar aluno a
+    aluno, monta por curso o bitset dos alunos aprovados nele e combina esses
+    bitsets com AND ao longo dos pré-requisitos: O(cursos x pré-requisitos)
+    operações sobre inteiros de (nº de alunos) bits.
+    """
+    grafo = grafo_prerequisitos()
+    con = obter_conexao()
+    alunos = [r[0] for r in con.execute("SELECT matricula FROM alunos ORDER BY matricula")]
+    posicao = {m: a for a, m in enumerate(alunos)}
+    tamanho = (len(alunos) + 7) // 8
+    bytes_aprovados: Dict[int, bytearray] = {}
+    for m, c in con.execute("SELECT aluno_matricula, curso_codigo FROM aprovacoes WHERE qtd > 0"):
+        a, i = posicao.get(m), grafo.indice.get(c)
+        if a is None or i is None:
+            continue
+        b = bytes_aprovados.get(i)
+        if b is None:
+            b = bytes_aprovados[i] = bytearray(tamanho)
+        b[a >> 3] |= 1 << (a & 7)
+    aprovados = [int.from_bytes(bytes_aprovados[i], "little") if i in bytes_aprovados else 0
+                 for i in range(len(grafo.codigos))]
+
+    todos = (1 << len(alunos)) - 1
+    por_curso = [0] * len(grafo.codigos)
+    for i in range(grafo.n_cursos):
+        m = todos & ~aprovados[i]
+        for p in grafo.diretos[i]:
+            m &= aprovados[p]
+        por_curso[i] = m
+    return Elegibilidade(grafo, alunos, por_curso)
+
+# ----- matrícula -----
+# Estado do aluno usado pela validação: turmas em que já está, cursos
+# aprovados (nota >= 6) e agenda das turmas em que está matriculado.
+@dataclass(slots=True)
+class HistoricoAluno:
+    turmas: set = field(default_factory=set)
+    aprovados: set = field(default_factory=set)
+    agenda: AgendaAluno = field(default_factory=AgendaAluno)
+
+    def adicionar(self, turma_codigo: str, curso_codigo: str, horario: str,
+                  dia: Optional[str], ini: Optional[int], fim: Optional[int], nota: Optional[float]):
+        self.turmas.add(turma_codigo)
+        self.agenda.adicionar(horario, dia, ini, fim)
+        if nota is not None and nota >= 6:
+            self.aprovados.add(curso_codigo)
+
+def _validar_matricula(aluno: Optional[Aluno], turma: Optional[Turma], curso: Optional[Curso],
+                       historico: HistoricoAluno, checar_vagas: bool = True) -> Optional[str]:
+    """
+    Regras de matrícula, em memória. Retorna a mensagem de erro ou None se
+    a matrícula pode ser efetivada. Usada por matricular() e matricular_lote();
+    entrar_lista_espera() valida sem olhar as vagas.
+    """
+    if not aluno:
+        return "❌ Erro: Aluno não encontrado."
+    if not turma:
+        return "❌ Erro: Turma não encontrada."
+    if not curso:
+        return "❌ Erro: Curso da turma não encontrado."
+
+    # 1. Matricula duplicada?
+    if turma.codigo in historico.turmas:
+        return "⚠ Aluno já está matriculado nesta turma."
+
+    # 2. Já aprovado no curso?
+    if curso.codigo in historico.aprovados:
+        return "⚠ Aluno já foi aprovado neste curso."
+
+    # 3. Pré-requisitos
+    if not all(pr in historico.aprovados for pr in curso.prerequisitos):
+        return "❌ Aluno não possui os pré-requisitos."
+
+    # 4. Vagas
+    if checar_vagas and turma.vagas_ocupadas >= turma.limite_vagas:
+        return f"❌ Turma sem vagas. (Limite: {turma.limite_vagas})"
+
+    # 5. Conflito de horários
+    h = historico.agenda.conflito(turma.horario)
+    if h is not None:
+        return f"❌ Conflito de horário com turma no horário: {h}"
+    return None
+
+def _carregar_historico(con: sqlite3.Connection, aluno_matricula: str) -> HistoricoAluno:
+    historico = HistoricoAluno()
+    cur = con.execute("""
+        SELECT m.turma_codigo, t.curso_codigo, t.horario, t.dia, t.hora_ini, t.hora_fim, m.nota
+        FROM matriculas m
+        JOIN turmas t ON t.codigo = m.turma_codigo
+        WHERE m.aluno_matricula=?
+    """, (aluno_matricula,))
+    for row in cur:
+        historico.adicionar(*row)
+    # aprovações de períodos arquivados já não estão em matriculas
+    historico.aprovados.update(c for (c,) in con.execute(
+        "SELECT curso_codigo FROM aprovacoes WHERE aluno_matricula=?", (aluno_matricula,)))
+    return historico
+
+def _violou_unicidade(erro: sqlite3.IntegrityError, tabela: str) -> bool:
+    """True só para a violação do índice único (aluno, turma) de `tabela`; FK, NOT NULL etc. não contam."""
+    return str(erro).startswith(f"UNIQUE constraint failed: {tabela}.aluno_matricula, {tabela}.turma_codigo")
+
+def matricular(aluno_matricula: str, turma_codigo: str) -> str:
+    """
+    Todas as leituras e escritas ocorrem em uma única transação BEGIN IMMEDIATE:
+    a vaga é reservada com UPDATE condicional e a unicidade (aluno, turma)
+    é garantida pelo índice único, mesmo com vários processos concorrentes.
+    """
+    try:
+        with transacao(imediata=True) as con:
+            resultado = _matricular_na_transacao(con, aluno_matricula, turma_codigo)
+    except sqlite3.IntegrityError as e:
+        if not _violou_unicidade(e, "matriculas"):
+            raise
+        return "⚠ Aluno já está matriculado nesta turma."
+    CACHE_TURMAS.invalidar(turma_codigo)
+    return resultado
+
+def _matricular_na_transacao(con: sqlite3.Connection, aluno_matricula: str, turma_codigo: str) -> str:
+    aluno = aluno_por_matricula(aluno_matricula)
+    # vagas_ocupadas muda a cada matrícula: lida do banco, dentro da transação
+    turma = _turma_do_banco(turma_codigo)
+    curso = curso_por_codigo(turma.curso_codigo) if turma else None
+
+    historico = _carregar_historico(con, aluno_matricula) if aluno and curso else HistoricoAluno()
+    erro = _validar_matricula(aluno, turma, curso, historico)
+    if erro:
+        return erro
+
+    # Reservar vaga (só ocupa se ainda houver) e efetivar matrícula
+    cur = con.execute("""
+        UPDATE turmas SET vagas_ocupadas = COALESCE(vagas_ocupadas, 0) + 1
+        WHERE codigo=? AND COALESCE(vagas_ocupadas, 0) < limite_vagas
+    """, (turma_codigo,))
+    if cur.rowcount == 0:
+        return f"❌ Turma sem vagas. (Limite: {turma.limite_vagas})"
+    con.execute("INSERT INTO matriculas (aluno_matricula, turma_codigo) VALUES (?,?)",
+                (aluno_matricula, turma_codigo))
+    _alterou(con, "matriculas", "turmas")
+    _auditar("matricula", aluno_matricula, turma_codigo)
+    return "✅ Matrícula realizada com sucesso!"
+
+def turmas_compativeis(aluno_matricula: str) -> List[Turma]:
+    """Turmas com vaga, em que o aluno ainda não está, cujo horário cabe na agenda dele."""
+    con = obter_conexao()
+    historico = _carregar_historico(con, aluno_matricula)
+    cur = con.execute("""
+        SELECT codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas, dia, hora_ini, hora_fim
+        FROM turmas
+        WHERE dia IS NOT NULL AND COALESCE(vagas_ocupadas, 0) < limite_vagas
+        ORDER BY codigo
+    """)
+    resultados = []
+    for cod, curso, prof, hor, lim, ocup, dia, ini, fim in cur:
+        if cod not in historico.turmas and historico.agenda.cabe_faixa((dia, mascara_horas(ini, fim))):
+            resultados.append(Turma(cod, curso, prof, hor, lim, ocup or 0))
+    return resultados
+
+# ----- lista de espera -----
+def entrar_lista_espera(aluno_matricula: str, turma_codigo: str) -> str:
+    """
+    Coloca o aluno no fim da fila da turma, para não precisar tentar de novo
+    a cada vaga. As regras de matrícula (menos vagas) valem já na entrada e
+    são conferidas outra vez na promoção. Se ainda houver vaga, matricula direto.
+    """
+    try:
+        with transacao(imediata=True) as con:
+            aluno = aluno_por_matricula(aluno_matricula)
+            turma = _turma_do_banco(turma_codigo)
+            curso = curso_por_codigo(turma.curso_codigo) if turma else None
+            historico = _carregar_historico(con, aluno_matricula) if aluno and curso else HistoricoAluno()
+            erro = _validar_matricula(aluno, turma, curso, historico, checar_vagas=False)
+            if erro:
+                return erro
+            if turma.vagas_ocupadas < turma.limite_vagas:
+                resultado = _matricular_na_transacao(con, aluno_matricula, turma_codigo)
+            else:
+                con.execute("""
+                    INSERT INTO lista_espera (turma_codigo, posicao, aluno_matricula)
+                    SELECT ?, COALESCE(MAX(posicao), 0) + 1, ? FROM lista_espera WHERE turma_codigo=?
+                """, (turma_codigo, aluno_matricula, turma_codigo))
+                return "✔ Turma sem vagas: aluno entrou na lista de espera."
+    except sqlite3.IntegrityError as e:
+        if _violou_unicidade(e, "matriculas"):
+            return "⚠ Aluno já está matriculado nesta turma."
+        if not _violou_unicidade(e, "lista_espera"):
+            raise
+        return "⚠ Aluno já está na lista de espera desta turma."
+    CACHE_TURMAS.invalidar(turma_codigo)
+    return resultado
+
+def sair_lista_espera(aluno_matricula: str, turma_codigo: str) -> str:
+    with transacao() as con:
+        cur = con.execute("DELETE FROM lista_espera WHERE aluno_matricula=? AND turma_codigo=?",
+                          (aluno_matricula, turma_codigo))
+    return "✔ Aluno saiu da lista de espera." if cur.rowcount else "❌ Aluno não está na lista de espera desta turma."
+
+def lista_espera(turma_codigo: str) -> List[Tuple[str, str]]:
+    """(matrícula, data de entrada) da fila da turma, do primeiro ao último."""
+    con = obter_conexao()
+    return con.execute("""
+        SELECT aluno_matricula, criado_em FROM lista_espera WHERE turma_codigo=? ORDER BY posicao
+    """, (turma_codigo,)).fetchall()
+
+def posicao_lista_espera(aluno_matricula: str, turma_codigo: str) -> Optional[int]:
+    """Lugar do aluno na fila (1 = próximo a ser promovido), ou None se não está nela."""
+    con = obter_conexao()
+    row = con.execute("SELECT posicao FROM lista_espera WHERE aluno_matricula=? AND turma_codigo=?",
+                      (aluno_matricula, turma_codigo)).fetchone()
+    if not row:
+        return None
+    # conta quem está à frente: percorre só esse trecho do índice (consulta de exibição)
+    return con.execute("SELECT COUNT(*) + 1 FROM lista_espera WHERE turma_codigo=? AND posicao < ?",
+                       (turma_codigo, row[0])).fetchone()[0]
+
+def _promover_lista_espera(con: sqlite3.Connection, turma_codigo: str) -> List[str]:
+    """
+    Enquanto a turma tiver vaga, tira o primeiro da fila e tenta matriculá-lo
+    com todas as regras (pré-requisitos, horário etc. podem ter mudado desde
+    a entrada). Quem não passa sai da fila e a vaga vai para o seguinte.
+    Roda dentro da transação de quem liberou a vaga; cada passo é uma busca
+    no índice (turma, posicao). Retorna "matrícula: resultado" por aluno tirado da fila.
+    """
+    mensagens = []
+    while True:
+        turma = _turma_do_banco(turma_codigo)
+        if not turma or turma.vagas_ocupadas >= turma.limite_vagas:
+            return mensagens
+        proximo = con.execute("""
+            SELECT posicao, aluno_matricula FROM lista_espera WHERE turma_codigo=? ORDER BY posicao LIMIT 1
+        """, (turma_codigo,)).fetchone()
+        if not proximo:
+            return mensagens
+        posicao, aluno_matricula = proximo
+        con.execute("DELETE FROM lista_espera WHERE turma_codigo=? AND posicao=?", (turma_codigo, posicao))
+        mensagens.append(f"{aluno_matricula}: {_matricular_na_transacao(con, aluno_matricula, turma_codigo)}")
+
+def _resumo_promocao(mensagens: List[str]) -> str:
+    if not mensagens:
+        return ""
+    promovidos = sum(1 for m in mensagens if "✅" in m)
+    texto = f" {promovidos} aluno(s) promovido(s) da lista de espera"
+    if promovidos < len(mensagens):
+        texto += f"; {len(mensagens) - promovidos} removido(s) por não cumprirem mais as regras"
+    return texto + "."
+
+def cancelar_matricula(aluno_matricula: str, turma_codigo: str) -> str:
+    """Desfaz uma matrícula ainda sem nota e passa a vaga para a lista de espera."""
+    with transacao(imediata=True) as con:
+        row = con.execute("SELECT id, nota FROM matriculas WHERE aluno_matricula=? AND turma_codigo=?",
+                          (aluno_matricula, turma_codigo)).fetchone()
+        if not row:
+            return "❌ Matrícula não encontrada."
+        if row[1] is not None:
+            return "❌ Não é possível cancelar: a matrícula já tem nota."
+        con.execute("DELETE FROM matriculas WHERE id=?", (row[0],))
+        con.execute("""
+            UPDATE turmas SET vagas_ocupadas = MAX(COALESCE(vagas_ocupadas, 0) - 1, 0) WHERE codigo=?
+        """, (turma_codigo,))
+        _alterou(con, "matriculas", "turmas")
+        _auditar("cancelamento", aluno_matricula, turma_codigo)
+        promovidos = _promover_lista_espera(con, turma_codigo)
+    CACHE_TURMAS.invalidar(turma_codigo)
+    return "✔ Matrícula cancelada." + _resumo_promocao(promovidos)
+
+# ----- matrícula em lote -----
+TAMANHO_LOTE = 5000
+
+def matricular_lote(pedidos: Iterable[Tuple[str, str]], tamanho_lote: int = TAMANHO_LOTE) -> List[str]:
+    """
+    Processa muitos pedidos (aluno_matricula, turma_codigo) de uma vez.
+    Para cada bloco de `tamanho_lote` pedidos: abre uma transação IMMEDIATE,
+    carrega alunos, turmas, cursos e históricos com poucas consultas em
+    conjunto e valida tudo em memória com as mesmas regras de matricular().
+    Retorna uma mensagem por pedido, na mesma ordem.
+    """
+    pedidos = list(pedidos)
+    resultados: List[str] = []
+    for inicio in range(0, len(pedidos), tamanho_lote):
+        bloco = pedidos[inicio:inicio + tamanho_lote]
+        with transacao(imediata=True) as con:
+            resultados.extend(_matricular_bloco(con, bloco))
+        CACHE_TURMAS.invalidar(*{t for _, t in bloco})
+    return resultados
+
+def _carregar_lote(con: sqlite3.Connection, pedidos: List[Tuple[str, str]]):
+    """
+    Alunos, turmas, cursos (com pré-requisitos) e históricos envolvidos nos
+    pedidos (aluno_matricula, turma_codigo), com poucas consultas em conjunto.
+    """
+    con.execute("CREATE TEMP TABLE IF NOT EXISTS lote_alunos (matricula TEXT PRIMARY KEY) WITHOUT ROWID")
+    con.execute("CREATE TEMP TABLE IF NOT EXISTS lote_turmas (codigo TEXT PRIMARY KEY) WITHOUT ROWID")
+    con.execute("DELETE FROM lote_alunos")
+    con.execute("DELETE FROM lote_turmas")
+    con.executemany("INSERT INTO lote_alunos VALUES (?)", [(a,) for a in {a for a, _ in pedidos}])
+    con.executemany("INSERT INTO lote_turmas VALUES (?)", [(t,) for t in {t for _, t in pedidos}])
+
+    alunos = {m: Aluno(m, n) for m, n in con.execute("""
+        SELECT a.matricula, a.nome FROM lote_alunos l JOIN alunos a ON a.matricula = l.matricula
+    """)}
+    turmas = {row[0]: Turma(row[0], row[1], row[2], row[3], row[4], row[5] or 0) for row in con.execute("""
+        SELECT t.codigo, t.curso_codigo, t.professor, t.horario, t.limite_vagas, t.vagas_ocupadas
+        FROM lote_turmas l JOIN turmas t ON t.codigo = l.codigo
+    """)}
+    cursos = {c: Curso(c, n) for c, n in con.execute("""
+        SELECT c.codigo, c.nome FROM cursos c
+        WHERE c.codigo IN (SELECT t.curso_codigo FROM lote_turmas l JOIN turmas t ON t.codigo = l.codigo)
+    """)}
+    for c, pr in con.execute("""
+        SELECT p.curso_codigo, p.prerequisito_codigo FROM prerequisitos p
+        WHERE p.curso_codigo IN (SELECT t.curso_codigo FROM lote_turmas l JOIN turmas t ON t.codigo = l.codigo)
+        ORDER BY p.curso_codigo, p.posicao
+    """):
+        cursos[c].prerequisitos.append(pr)
+    historicos = {m: HistoricoAluno() for m in alunos}
+    for m, *resto in con.execute("""
+        SELECT m.aluno_matricula, m.turma_codigo, t.curso_codigo, t.horario, t.dia, t.hora_ini, t.hora_fim, m.nota
+        FROM lote_alunos l
+        JOIN matriculas m ON m.aluno_matricula = l.matricula
+        JOIN turmas t ON t.codigo = m.turma_codigo
+    """):
+        historicos[m].adicionar(*resto)
+    for m, c in con.execute("""
+        SELECT a.aluno_matricula, a.curso_codigo FROM lote_alunos l JOIN aprovacoes a ON a.aluno_matricula = l.matricula
+    """):
+        historicos[m].aprovados.add(c)
+    return alunos, turmas, cursos, historicos
+
+def _matricular_bloco(con: sqlite3.Connection, bloco: List[Tuple[str, str]]) -> List[str]:
+    alunos, turmas, cursos, historicos = _carregar_lote(con, bloco)
+    vazio = HistoricoAluno()
+    # (turma, curso, colunas do horário) uma vez por turma, não por pedido
+    alvos = {t: (turma, cursos.get(turma.curso_codigo), colunas_horario(turma.horario))
+             for t, turma in turmas.items()}
+    sem_turma = (None, None, None)
+    sucesso = "✅ Matrícula realizada com sucesso!"
+    resultados = []
+    novas = []
+    for aluno_matricula, turma_codigo in bloco:
+        turma, curso, colunas = alvos.get(turma_codigo, sem_turma)
+        historico = historicos.get(aluno_matricula, vazio)
+        erro = _validar_matricula(alunos.get(aluno_matricula), turma, curso, historico)
+        if erro:
+            resultados.append(erro)
+            continue
+        # pedidos seguintes do mesmo bloco já enxergam esta matrícula
+        historico.adicionar(turma_codigo, curso.codigo, turma.horario, *colunas, None)
+        turma.vagas_ocupadas += 1
+        novas.append((aluno_matricula, turma_codigo))
+        resultados.append(sucesso)
+
+    con.execute("CREATE TEMP TABLE IF NOT EXISTS lote_novas (ordem INTEGER PRIMARY KEY, aluno TEXT, turma TEXT)")
+    con.execute("DELETE FROM lote_novas")
+    con.executemany("INSERT INTO lote_novas VALUES (?,?,?)", [(i, a, t) for i, (a, t) in enumerate(novas)])
+    # em ordem de (aluno, turma): inserções sequenciais nos índices
+    con.execute("INSERT INTO matriculas (aluno_matricula, turma_codigo) SELECT aluno, turma FROM lote_novas ORDER BY aluno, turma")
+    _auditar_lote(con, "matricula", "lote_novas")
+    ocupadas = {t for _, t in novas}
+    con.executemany("UPDATE turmas SET vagas_ocupadas=? WHERE codigo=?",
+                    [(turmas[t].vagas_ocupadas, t) for t in ocupadas])
+    if novas:
+        _alterou(con, "matriculas", "turmas")
+    return resultados
+
+# ----- alocação de turmas concorridas -----
+@dataclass(slots=True)
+class ResultadoAlocacao:
+    atribuicoes: List[Tuple[str, str]] = field(default_factory=list)
+    por_opcao: Dict[int, int] = field(default_factory=dict)    # 1 = primeira opção do aluno
+    sem_vaga: int = 0             # opções possíveis pelas regras, mas com a turma já cheia
+    recusadas: int = 0            # opções barradas por pré-requisito, horário, aprovação etc. (cheias ou não)
+    efetivadas: int = 0
+    falhas: List[str] = field(default_factory=list)
+
+    def __str__(self):
+        opcoes = ", ".join(f"{p}ª: {q}" for p, q in sorted(self.por_opcao.items())) or "nenhuma"
+        return (f"✔ Alocação: {len(self.atribuicoes)} vaga(s) atribuída(s) ({opcoes}), "
+                f"{self.efetivadas} efetivada(s); opções sem vaga: {self.sem_vaga}, "
+                f"barradas por outras regras: {self.recusadas}.")
+
+def alocar_turmas(preferencias, max_por_aluno: Optional[int] = None, efetivar: bool = True) -> ResultadoAlocacao:
+    """
+    Rodada de matrícula para turmas concorridas, em vez de ordem de chegada.
+    `preferencias`: {aluno_matricula: [turma_codigo, ...]} em ordem de preferência;
+    turmas do mesmo curso funcionam como alternativas (o aluno fica com no máximo uma).
+
+    Escolha em rodadas por prioridade de CR (maior primeiro; sem CR por último):
+    a cada rodada cada aluno recebe a melhor opção ainda possível pelas regras
+    de _validar_matricula() (vagas, pré-requisitos, horários). Opções descartadas
+    nunca voltam a ser possíveis, então cada opção é examinada uma vez só.
+    Com efetivar=True as vagas são gravadas por matricular_lote(), que valida de novo.
+
+    É a escolha serial por prioridade, não um emparelhamento máximo nem de
+    custo mínimo: um aluno de CR maior nunca perde a vaga para um de CR menor,
+    mesmo quando ceder a sua 1ª opção (e ficar com a 2ª) deixaria mais alunos
+    atendidos. Horários e "no máximo uma turma por curso" dependem das outras
+    turmas que o aluno recebe, o que não cabe numa rede de fluxo.
+    """
+    preferencias = {m: list(ts) for m, ts in dict(preferencias).items()}
+    pedidos = [(m, t) for m, ts in preferencias.items() for t in ts]
+    with transacao() as con:
+        alunos, turmas, cursos, historicos = _carregar_lote(con, pedidos)
+        crs = dict(con.execute("""
+            SELECT d.aluno_matricula, d.cr FROM lote_alunos l
+            JOIN desempenho_alunos d ON d.aluno_matricula = l.matricula
+        """).fetchall())
+
+    resultado = ResultadoAlocacao()
+    ativos = sorted(alunos, key=lambda m: (crs.get(m) is None, -(crs.get(m) or 0), m))
+    proxima = dict.fromkeys(ativos, 0)
+    cursos_do_aluno = {m: set() for m in ativos}
+    while ativos:
+        seguintes = []
+        for m in ativos:
+            opcoes, historico = preferencias[m], historicos[m]
+            i = proxima[m]
+            while i < len(opcoes):
+                turma = turmas.get(opcoes[i])
+                i += 1
+                curso = cursos.get(turma.curso_codigo) if turma else None
+                if curso and curso.codigo in cursos_do_aluno[m]:
+                    continue
+                # vagas à parte: só conta como sem vaga a opção que as outras regras permitiam
+                if _validar_matricula(alunos[m], turma, curso, historico, checar_vagas=False) is not None:
+                    resultado.recusadas += 1
+                elif turma.vagas_ocupadas >= turma.limite_vagas:
+                    resultado.sem_vaga += 1
+                else:
+                    historico.adicionar(turma.codigo, curso.codigo, turma.horario, *colunas_horario(turma.horario), None)
+                    turma.vagas_ocupadas += 1
+                    cursos_do_aluno[m].add(curso.codigo)
+                    resultado.atribuicoes.append((m, turma.codigo))
+                    resultado.por_opcao[i] = resultado.por_opcao.get(i, 0) + 1
+                    if max_por_aluno is None or len(cursos_do_aluno[m]) < max_por_aluno:
+                        seguintes.append(m)
+                    break
+            proxima[m] = i
+        ativos = seguintes
+
+    if efetivar:
+        for (m, t), msg in zip(resultado.atribuicoes, matricular_lote(resultado.atribuicoes)):
+            if msg.startswith("✅"):
+                resultado.efetivadas += 1
+            else:
+                resultado.falhas.append(f"{m} → {t}: {msg}")
+    return resultado
+
+COLUNAS_CSV_PREFERENCIAS = ("matricula", "turma")
+
+def ler_csv_preferencias(caminho: str) -> Dict[str, List[str]]:
+    """
+    Preferências para alocar_turmas(): uma linha por (matricula, turma); a ordem
+    das linhas de cada aluno é a ordem de preferência. Mesmo formato de ler_csv_notas().
+    """
+    preferencias: Dict[str, List[str]] = {}
+    with open(caminho, newline="", encoding="utf-8-sig") as arq:
+        for linha in _leitor_csv(arq, COLUNAS_CSV_PREFERENCIAS):
+            m, t = (linha["matricula"] or "").strip(), (linha["turma"] or "").strip()
+            if m and t:
+                preferencias.setdefault(m, []).append(t)
+    return preferencias
+
+# ----- grade de horários (busca local) -----
+# blocos de 2h em que a grade encaixa as turmas (horários no formato de parse_horario)
+HORARIOS_GRADE = tuple(f"{dia}-{ini}-{ini + 2}" for dia in ("seg", "ter", "qua", "qui", "sex")
+                       for ini in (8, 10, 14, 16, 19, 21))
+TEMPO_GRADE = 30.0            # limite (s) da busca local
+TEMPERATURA_GRADE = (2.0, 0.05)   # do recozimento simulado: início e fim (em alunos em choque)
+
+@dataclass(slots=True)
+class ResultadoGrade:
+    horarios: Dict[str, str] = field(default_factory=dict)    # turma -> novo horário (só as que mudam)
+    conflitos_antes: int = 0      # pares (aluno, duas turmas dele) em horários que se cruzam
+    conflitos_depois: int = 0
+    sem_horario: List[str] = field(default_factory=list)      # professor sem horário livre disponível
+    iteracoes: int = 0
+    segundos: float = 0.0
+    aplicadas: int = 0
+
+    def __str__(self):
+        texto = (f"✔ Grade: conflitos de alunos {self.conflitos_antes} → {self.conflitos_depois}, "
+                 f"{len(self.horarios)} turma(s) com horário novo ({self.iteracoes} iterações, {self.segundos:.1f} s)")
+        if self.sem_horario:
+            texto += f"; {len(self.sem_horario)} turma(s) sem horário possível para o professor (mantidas no horário atual)"
+        return texto + "."
+
+def _faixas_disponiveis(janelas: Iterable[str]) -> Dict[str, int]:
+    """dia -> máscara das horas em que o professor pode dar aula."""
+    por_dia: Dict[str, int] = {}
+    for janela in janelas:
+        faixa = faixa_horario(janela)
+        if faixa is None:
+            raise ValueError(f"Horário de disponibilidade inválido: {janela}")
+        por_dia[faixa[0]] = por_dia.get(faixa[0], 0) | faixa[1]
+    return por_dia
+
+def gerar_grade(turmas: Optional[Iterable[str]] = None,
+                disponibilidade: Optional[Dict[str, Iterable[str]]] = None,
+                horarios: Iterable[str] = HORARIOS_GRADE, tempo_limite: float = TEMPO_GRADE,
+                semente: int = 0, aplicar: bool = False) -> ResultadoGrade:
+    """
+    Escolhe um horário de `horarios` para cada turma (padrão: todas) de modo
+    a minimizar choques entre turmas que têm alunos em comum nas matrículas
+    correntes (sem nota), sem nunca pôr um professor em dois horários que se
+    cruzam. `disponibilidade`: professor -> janelas em que pode dar aula
+    ("seg-8-12", ...); professor ausente pode em qualquer horário.
+
+    Guloso (professores com menos horários permitidos e turmas com mais alunos
+    em comum primeiro) seguido de recozimento simulado até `tempo_limite`.
+    O custo de cada (turma, horário) é mantido incrementalmente: avaliar um
+    passo é O(1) e aplicá-lo custa O(vizinhos da turma), nunca a grade inteira.
+    Com aplicar=True os horários novos são gravados por editar_turma(), numa transação.
+    """
+    inicio = time.perf_counter()
+    rnd = random.Random(semente)
+    grade = list(dict.fromkeys(horarios))
+    faixas = [faixa_horario(h) for h in grade]
+    if not grade or None in faixas:
+        raise ValueError("Horários da grade inválidos (use dia-ini-fim, ex: seg-8-10)")
+    n_h = len(grade)
+    # horários que se cruzam com cada horário (inclusive ele mesmo)
+    cruzam = [[j for j, (d2, m2) in enumerate(faixas) if d1 == d2 and m1 & m2] for d1, m1 in faixas]
+
+    con = obter_conexao()
+    todas = {c: (p, h) for c, p, h in con.execute("SELECT codigo, professor, horario FROM turmas ORDER BY codigo")}
+    codigos = list(todas) if turmas is None else [c for c in dict.fromkeys(turmas) if c in todas]
+    indice = {c: i for i, c in enumerate(codigos)}
+    n = len(codigos)
+    pesos: Dict[Tuple[int, int], int] = {}
+    for a, b, w in con.execute("""
+        SELECT x.turma_codigo, y.turma_codigo, COUNT(*) FROM matriculas x
+        JOIN matriculas y ON y.aluno_matricula = x.aluno_matricula AND y.turma_codigo > x.turma_codigo
+        WHERE x.nota IS NULL AND y.nota IS NULL
+        GROUP BY x.turma_codigo, y.turma_codigo
+    """):
+        if a in indice and b in indice:
+            pesos[min(indice[a], indice[b]), max(indice[a], indice[b])] = w
+    vizinhos: List[List[Tuple[int, int]]] = [[] for _ in range(n)]
+    for (a, b), w in pesos.items():
+        vizinhos[a].append((b, w))
+        vizinhos[b].append((a, w))
+
+    def choques(faixa_de) -> int:
+        """Alunos em choque com a turma t na faixa faixa_de[t] (None não conta)."""
+        return sum(w for (a, b), w in pesos.items() if faixa_de[a] and faixa_de[b]
+                   and faixa_de[a][0] == faixa_de[b][0] and faixa_de[a][1] & faixa_de[b][1])
+
+    resultado = ResultadoGrade()
+    # conflitos da grade atual, para comparação (horários inválidos não contam)
+    atuais = [faixa_horario(todas[c][1] or "") for c in codigos]
+    resultado.conflitos_antes = choques(atuais)
+
+    # turma sem professor informado não ocupa ninguém
+    professores = {}
+    prof = [professores.setdefault(todas[c][0] or f"#{c}", len(professores)) for c in codigos]
+    janelas = {p: _faixas_disponiveis(js) for p, js in (disponibilidade or {}).items()}
+    permitidos_prof = []
+    for nome in professores:
+        if nome in janelas:
+            permitidos_prof.append([j for j, (d, m) in enumerate(faixas) if (m & janelas[nome].get(d, 0)) == m])
+        else:
+            permitidos_prof.append(list(range(n_h)))
+    def cruzam_faixa(faixa):
+        """Horários da grade que se cruzam com uma faixa qualquer (turma mantida no horário atual)."""
+        return [] if faixa is None else [j for j, (d, m) in enumerate(faixas) if d == faixa[0] and m & faixa[1]]
+
+    # turmas fora da seleção continuam ocupando o professor no horário atual
+    ocupado_fora = [[0] * n_h for _ in professores]
+    for c, (p, h) in todas.items():
+        if c not in indice and p in professores:
+            for j in cruzam_faixa(faixa_horario(h or "")):
+                ocupado_fora[professores[p]][j] += 1
+
+    def mover(t, novo):
+        antigo = horario[t]
+        horario[t] = novo
+        ocup = ocupado[prof[t]]
+        if antigo >= 0:
+            for j in cruzam[antigo]:
+                ocup[j] -= 1
+        if novo >= 0:
+            for j in cruzam[novo]:
+                ocup[j] += 1
+        for u, w in vizinhos[t]:
+            cu = custo[u]
+            if antigo >= 0:
+                for j in cruzam[antigo]:
+                    cu[j] -= w
+            if novo >= 0:
+                for j in cruzam[novo]:
+                    cu[j] += w
+
+    def livre(t, j):
+        """O professor de t está livre em j (descontando a própria t)?"""
+        atual = horario[t]
+        return ocupado[prof[t]][j] - (1 if atual >= 0 and j in cruzam[atual] else 0) == 0
+
+    # Guloso. Turma sem horário livre fica no horário atual, que passa a ocupar
+    # o professor e a contar nos custos dos vizinhos como as de fora da seleção;
+    # como isso pode tirar a opção de turmas já colocadas, o guloso recomeça
+    # até nenhuma turma nova ficar sem horário.
+    fixas: Dict[int, Optional[Tuple[str, int]]] = {}
+    ordem = sorted(range(n), key=lambda t: (len(permitidos_prof[prof[t]]), -sum(w for _, w in vizinhos[t])))
+    while True:
+        ocupado = [linha[:] for linha in ocupado_fora]
+        horario = [-1] * n
+        custo = [[0] * n_h for _ in range(n)]       # custo[t][h]: alunos em choque se t estivesse em h
+        for t, faixa in fixas.items():
+            js = cruzam_faixa(faixa)
+            for j in js:
+                ocupado[prof[t]][j] += 1
+            for u, w in vizinhos[t]:
+                for j in js:
+                    custo[u][j] += w
+        novas = []
+        for t in ordem:
+            if t in fixas:
+                continue
+            opcoes = [j for j in permitidos_prof[prof[t]] if livre(t, j)]
+            if not opcoes:
+                novas.append(t)
+                continue
+            menor = min(custo[t][j] for j in opcoes)
+            mover(t, rnd.choice([j for j in opcoes if custo[t][j] == menor]))
+        if not novas:
+            break
+        for t in novas:
+            fixas[t] = atuais[t]
+    resultado.sem_horario = [codigos[t] for t in fixas]
+
+    # as turmas mantidas contam (os custos as incluem, então os deltas do recozimento também)
+    total = choques([faixas[horario[t]] if horario[t] >= 0 else fixas.get(t) for t in range(n)])
+    melhor_total, melhor = total, horario[:]
+    turmas_do_prof: Dict[int, List[int]] = {}
+    for t in range(n):
+        if horario[t] >= 0:
+            turmas_do_prof.setdefault(prof[t], []).append(t)
+    # recozimento simulado: move uma turma em choque para um horário sorteado
+    # (ou troca com a turma do mesmo professor que está lá); piora só é aceita
+    # com probabilidade exp(-piora / temperatura), e a temperatura cai com o tempo
+    quente, frio = TEMPERATURA_GRADE
+    temperatura = quente
+    comeco = time.perf_counter()
+    duracao = max(0.0, tempo_limite - (comeco - inicio))
+    iteracao = 0
+    while total > 0 and n:
+        iteracao += 1
+        if iteracao % 1024 == 0:
+            decorrido = time.perf_counter() - comeco
+            if decorrido >= duracao:
+                break
+            temperatura = quente * (frio / quente) ** (decorrido / duracao)
+        t = rnd.randrange(n)
+        atual = horario[t]
+        if atual < 0 or custo[t][atual] == 0:
+            continue
+        permitidos = permitidos_prof[prof[t]]
+        j = permitidos[rnd.randrange(len(permitidos))]
+        if j == atual:
+            continue
+        ct = custo[t]
+        u = None
+        if livre(t, j):
+            delta = ct[j] - ct[atual]
+        else:
+            # troca só quando é a única turma do professor nos dois horários
+            ocup = ocupado[prof[t]]
+            if ocup[j] != 1 or ocup[atual] != 1 or j in cruzam[atual]:
+                continue
+            u = next((x for x in turmas_do_prof[prof[t]] if horario[x] == j), None)
+            if u is None:
+                continue
+            # t e u nunca se cruzam (mesmo professor): tira o choque entre elas que ct/custo[u] contam
+            w = pesos.get((min(t, u), max(t, u)), 0)
+            delta = ct[j] - ct[atual] + custo[u][atual] - custo[u][j] - 2 * w
+        if delta > 0 and rnd.random() >= math.exp(-delta / temperatura):
+            continue
+        if u is None:
+            mover(t, j)
+        else:
+            mover(u, -1)
+            mover(t, j)
+            mover(u, atual)
+        total += delta
+        if total < melhor_total:
+            melhor_total, melhor = total, horario[:]
+
+    resultado.conflitos_depois = melhor_total
+    resultado.iteracoes = iteracao
+    for t, j in enumerate(melhor):
+        if j >= 0 and grade[j] != todas[codigos[t]][1]:
+            resultado.horarios[codigos[t]] = grade[j]
+    resultado.segundos = time.perf_counter() - inicio
+    if aplicar:
+        aplicar_grade(resultado)
+    return resultado
+
+def aplicar_grade(resultado: ResultadoGrade) -> ResultadoGrade:
+    """
+    Grava os horários de uma simulação de gerar_grade() numa única transação:
+    se alguma turma não puder ser alterada (excluída nesse meio tempo, por
+    exemplo), nada é gravado e a mensagem dela sobe em ValueError.
+    """
+    with transacao(imediata=True):
+        for codigo, novo in resultado.horarios.items():
+            mensagem = editar_turma(codigo, None, novo, None)
+            if not mensagem.startswith("✔"):
+                raise ValueError(f"{codigo}: {mensagem}")
+        resultado.aplicadas = len(resultado.horarios)
+    return resultado
+
+COLUNAS_CSV_DISPONIBILIDADE = ("professor", "horario")
+
+def ler_csv_disponibilidade(caminho: str) -> Dict[str, List[str]]:
+    """Disponibilidade para gerar_grade(): uma linha por (professor, janela "dia-ini-fim")."""
+    disponibilidade: Dict[str, List[str]] = {}
+    with open(caminho, newline="", encoding="utf-8-sig") as arq:
+        for linha in _leitor_csv(arq, COLUNAS_CSV_DISPONIBILIDADE):
+            p, h = (linha["professor"] or "").strip(), (linha["horario"] or "").strip()
+            if p and h:
+                disponibilidade.setdefault(p, []).append(h)
+    return disponibilidade
+
+# ----- registrar nota / frequência -----
+def registrar_nota(matricula: str, turma: str, nota: float) -> str:
+    with transacao(imediata=True) as con:
+        row = con.execute("""
+            SELECT m.nota, t.curso_codigo FROM matriculas m
+            LEFT JOIN turmas t ON t.codigo = m.turma_codigo
+            WHERE m.aluno_matricula=? AND m.turma_codigo=?
+        """, (matricula, turma)).fetchone()
+        con.execute("UPDATE matriculas SET nota=? WHERE aluno_matricula=? AND turma_codigo=?",
+                    (nota, matricula, turma))
+        _alterou(con, "matriculas")
+        if row:
+            delta = DeltaDesempenho()
+            delta.registrar(matricula, row[1], row[0], nota)
+            delta.aplicar(con)
+            if row[0] != nota:
+                _auditar("nota", matricula, turma, antes=row[0], depois=nota)
+    return "✔ Nota registrada."
+
+def registrar_frequencia(matricula: str, turma: str, freq: float) -> str:
+    # imediata: lê o valor de antes e grava na mesma transação, sem promover leitura a escrita
+    with transacao(imediata=True) as con:
+        row = con.execute("SELECT id, frequencia FROM matriculas WHERE aluno_matricula=? AND turma_codigo=?",
+                          (matricula, turma)).fetchone()
+        if row:
+            con.execute("UPDATE matriculas SET frequencia=? WHERE id=?", (freq, row[0]))
+            _alterou(con, "matriculas")
+            if row[1] != freq:
+                _auditar("frequencia", matricula, turma, antes=row[1], depois=freq)
+    return "✔ Frequência registrada."
+
+# ----- desempenho materializado (CR e cursos aprovados) -----
+@dataclass
+class DeltaDesempenho:
+    """
+    Acumula as diferenças causadas por trocas de nota e as grava de uma vez
+    em desempenho_alunos / aprovacoes (na mesma transação da troca).
+    """
+    notas: Dict[str, List[float]] = field(default_factory=dict)             # aluno -> [Δsoma, Δqtd]
+    aprovacoes: Dict[Tuple[str, str], int] = field(default_factory=dict)    # (aluno, curso) -> Δqtd
+
+    def registrar(self, aluno: str, curso_codigo: Optional[str],
+                  nota_antiga: Optional[float], nota_nova: Optional[float]):
+        delta_soma = (nota_nova or 0) - (nota_antiga or 0)
+        delta_qtd = (nota_nova is not None) - (nota_antiga is not None)
+        if delta_soma or delta_qtd:
+            acumulado = self.notas.setdefault(aluno, [0.0, 0])
+            acumulado[0] += delta_soma
+            acumulado[1] += delta_qtd
+
+        aprovado_antes = nota_antiga is not None and nota_antiga >= 6
+        aprovado_depois = nota_nova is not None and nota_nova >= 6
+        if curso_codigo is not None and aprovado_antes != aprovado_depois:
+            chave = (aluno, curso_codigo)
+            self.aprovacoes[chave] = self.aprovacoes.get(chave, 0) + (1 if aprovado_depois else -1)
+
+    def aplicar(self, con: sqlite3.Connection):
+        if self.notas:
+            con.executemany("""
+                INSERT INTO desempenho_alunos (aluno_matricula, soma_notas, qtd_notas) VALUES (?,?,?)
+                ON CONFLICT (aluno_matricula) DO UPDATE SET
+                    soma_notas = soma_notas + excluded.soma_notas,
+                    qtd_notas = qtd_notas + excluded.qtd_notas
+            """, [(a, ds, dq) for a, (ds, dq) in self.notas.items()])
+            con.executemany("""
+                UPDATE desempenho_alunos
+                SET cr = CASE WHEN qtd_notas > 0 THEN soma_notas / qtd_notas END
+                WHERE aluno_matricula=?
+            """, [(a,) for a in self.notas])
+            _alterou(con, "desempenho_alunos")
+        mudancas = [(a, c, d) for (a, c), d in self.aprovacoes.items() if d]
+        if mudancas:
+            con.executemany("""
+                INSERT INTO aprovacoes (aluno_matricula, curso_codigo, qtd) VALUES (?,?,?)
+                ON CONFLICT (aluno_matricula, curso_codigo) DO UPDATE SET qtd = qtd + excluded.qtd
+            """, mudancas)
+            con.executemany("DELETE FROM aprovacoes WHERE aluno_matricula=? AND curso_codigo=? AND qtd <= 0",
+                            [(a, c) for a, c, _ in mudancas])
+        self.notas.clear()
+        self.aprovacoes.clear()
+
+# Agregados calculados do zero a partir de matriculas e do arquivo (rebuild e verificação).
+_SQL_DESEMPENHO = """
+    SELECT aluno_matricula, SUM(nota), COUNT(nota), AVG(nota)
+    FROM ({fonte}) WHERE nota IS NOT NULL
+    GROUP BY aluno_matricula
+"""
+_SQL_APROVACOES = """
+    SELECT aluno_matricula, curso_codigo, COUNT(*)
+    FROM ({fonte}) WHERE nota >= 6 AND curso_codigo IS NOT NULL
+    GROUP BY aluno_matricula, curso_codigo
+"""
+
+def _fonte_notas(con: sqlite3.Connection) -> Dict[str, str]:
+    """(aluno_matricula, curso_codigo, nota) de todas as matrículas, inclusive as arquivadas."""
+    fonte = ("SELECT m.aluno_matricula, t.curso_codigo, m.nota "
+             "FROM matriculas m LEFT JOIN turmas t ON t.codigo = m.turma_codigo")
+    # a migração 5 reconstrói os agregados antes de o arquivo existir
+    if con.execute("SELECT 1 FROM sqlite_master WHERE name = 'matriculas_arquivo'").fetchone():
+        fonte += " UNION ALL SELECT aluno_matricula, curso_codigo, nota FROM matriculas_arquivo"
+    return {"fonte": fonte}
+
+def _reconstruir_desempenho(con: sqlite3.Connection):
+    fonte = _fonte_notas(con)
+    con.execute("DELETE FROM desempenho_alunos")
+    con.execute("DELETE FROM aprovacoes")
+    con.execute("INSERT INTO desempenho_alunos (aluno_matricula, soma_notas, qtd_notas, cr) " + _SQL_DESEMPENHO.format(**fonte))
+    con.execute("INSERT INTO aprovacoes (aluno_matricula, curso_codigo, qtd) " + _SQL_APROVACOES.format(**fonte))
+    # a migração 5 reconstrói os agregados antes de versao_tabelas existir
+    if con.execute("SELECT 1 FROM sqlite_master WHERE name = 'versao_tabelas'").fetchone():
+        _alterou(con, "desempenho_alunos")
+
+def reconstruir_desempenho() -> str:
+    """Recalcula todos os agregados a partir de matriculas e do arquivo."""
+    with transacao(imediata=True) as con:
+        _reconstruir_desempenho(con)
+    return "✔ Desempenho recalculado."
+
+def verificar_desempenho() -> List[str]:
+    """
+    Compara os agregados com o recálculo a partir de matriculas e do arquivo.
+    Retorna a lista de divergências (vazia se estiver consistente).
+    """
+    con = obter_conexao()
+    fonte = _fonte_notas(con)
+    problemas = []
+    esperado = {a: (s, q) for a, s, q, _ in con.execute(_SQL_DESEMPENHO.format(**fonte))}
+    atual = {a: (s, q) for a, s, q in con.execute(
+        "SELECT aluno_matricula, soma_notas, qtd_notas FROM desempenho_alunos WHERE qtd_notas > 0")}
+    for aluno in sorted(esperado.keys() | atual.keys()):
+        s_esp, q_esp = esperado.get(aluno, (0, 0))
+        s_atu, q_atu = atual.get(aluno, (0, 0))
+        if q_esp != q_atu or abs(s_esp - s_atu) > 1e-6:
+            problemas.append(f"{aluno}: notas esperado soma={s_esp} qtd={q_esp}, gravado soma={s_atu} qtd={q_atu}")
+    esperado = {(a, c): q for a, c, q in con.execute(_SQL_APROVACOES.format(**fonte))}
+    atual = {(a, c): q for a, c, q in con.execute("SELECT aluno_matricula, curso_codigo, qtd FROM aprovacoes")}
+    for chave in sorted(esperado.keys() | atual.keys()):
+        if esperado.get(chave) != atual.get(chave):
+            problemas.append(f"{chave[0]}: aprovação em {chave[1]} esperado={esperado.get(chave)} gravado={atual.get(chave)}")
+    return problemas
+
+def cursos_aprovados(matricula: str) -> set:
+    con = obter_conexao()
+    return {r[0] for r in con.execute(
+        "SELECT curso_codigo FROM aprovacoes WHERE aluno_matricula=?", (matricula,))}
+
+def ranking_cr(k: int = 10) -> List[Tuple[str, float]]:
+    """Os k alunos de maior CR, direto do índice de desempenho_alunos."""
+    con = obter_conexao_leitura()
+    return con.execute("""
+        SELECT aluno_matricula, cr FROM desempenho_alunos
+        WHERE cr IS NOT NULL
+        ORDER BY cr DESC, aluno_matricula DESC
+        LIMIT ?
+    """, (k,)).fetchall()
+
+def alunos_por_faixa_cr(minimo: float, maximo: float) -> List[Tuple[str, float]]:
+    """Alunos com minimo <= CR <= maximo, em ordem crescente de CR."""
+    con = obter_conexao_leitura()
+    return con.execute("""
+        SELECT aluno_matricula, cr FROM desempenho_alunos
+        WHERE cr BETWEEN ? AND ?
+        ORDER BY cr, aluno_matricula
+    """, (minimo, maximo)).fetchall()
+
+# ----- importação de notas / frequência (CSV) -----
+TAMANHO_LOTE_IMPORTACAO = 5000
+AMOSTRA_REJEITADAS = 20
+COLUNAS_CSV_NOTAS = ("matricula", "turma", "nota", "frequencia")
+
+@dataclass
+class ResultadoImportacao:
+    lidas: int = 0
+    atualizadas: int = 0
+    sem_matricula: int = 0
+    invalidas: int = 0
+    em_branco: int = 0            # nota e frequência vazias: nada a gravar
+    amostra_rejeitadas: List[str] = field(default_factory=list)
+
+    def rejeitar(self, descricao: str, arquivo=None):
+        if len(self.amostra_rejeitadas) < AMOSTRA_REJEITADAS:
+            self.amostra_rejeitadas.append(descricao)
+        if arquivo is not None:
+            arquivo.write(descricao + "\n")
+
+    def __str__(self):
+        return (f"✔ Importação concluída: {self.lidas} linha(s) lida(s), {self.atualizadas} atualizada(s), "
+                f"{self.sem_matricula} sem matrícula correspondente, {self.invalidas} inválida(s), "
+                f"{self.em_branco} em branco.")
+
+def _numero_csv(texto: str) -> Optional[float]:
+    """Célula vazia = manter o valor atual; aceita vírgula decimal (planilhas pt-BR)."""
+    texto = (texto or "").strip()
+    if not texto:
+        return None
+    return float(texto.replace(",", "."))
+
+def _leitor_csv(arq, colunas: Tuple[str, ...]) -> csv.DictReader:
+    """DictReader com separador detectado (, ; ou TAB) e checagem do cabeçalho."""
+    amostra = arq.read(4096)
+    arq.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(arq, dialect=dialeto)
+    faltando = [c for c in colunas if c not in (leitor.fieldnames or [])]
+    if faltando:
+        raise ValueError(f"CSV sem as colunas: {', '.join(faltando)}")
+    return leitor
+
+def ler_csv_notas(caminho: str):
+    """
+    Gerador: lê o CSV linha a linha (memória constante) e produz
+    (numero_linha, matricula, turma, nota, frequencia, erro).
+    Cabeçalho obrigatório: matricula, turma, nota, frequencia. Separador , ; ou TAB.
+    """
+    with open(caminho, newline="", encoding="utf-8-sig") as arq:
+        leitor = _leitor_csv(arq, COLUNAS_CSV_NOTAS)
+        for linha in leitor:
+            numero = leitor.line_num
+            matricula = (linha["matricula"] or "").strip()
+            turma = (linha["turma"] or "").strip()
+            try:
+                nota = _numero_csv(linha["nota"])
+                freq = _numero_csv(linha["frequencia"])
+            except ValueError:
+                yield numero, matricula, turma, None, None, "valor numérico inválido"
+                continue
+            if not matricula or not turma:
+                yield numero, matricula, turma, nota, freq, "matrícula/turma em branco"
+            else:
+                yield numero, matricula, turma, nota, freq, None
+
+def importar_notas_csv(caminho: str, caminho_rejeitadas: Optional[str] = None,
+                       tamanho_lote: int = TAMANHO_LOTE_IMPORTACAO) -> ResultadoImportacao:
+    """
+    Importa notas/frequências em blocos de `tamanho_lote` linhas, cada bloco em
+    uma transação (executemany), mantendo CR e aprovações em dia.
+    Linhas sem matrícula correspondente ou inválidas são contadas e, se
+    `caminho_rejeitadas` for informado, gravadas nele. Linhas com nota e
+    frequência vazias são puladas (em_branco).
+    """
+    resultado = ResultadoImportacao()
+    rejeitadas = open(caminho_rejeitadas, "w", encoding="utf-8") if caminho_rejeitadas else None
+    try:
+        linhas = ler_csv_notas(caminho)
+        while True:
+            bloco = list(itertools.islice(linhas, tamanho_lote))
+            if not bloco:
+                break
+            validas = []
+            for numero, matricula, turma, nota, freq, erro in bloco:
+                resultado.lidas += 1
+                if erro:
+                    resultado.invalidas += 1
+                    resultado.rejeitar(f"linha {numero}: {matricula};{turma} - {erro}", rejeitadas)
+                elif nota is None and freq is None:
+                    resultado.em_branco += 1
+                else:
+                    validas.append((numero, matricula, turma, nota, freq))
+            with transacao(imediata=True) as con:
+                _importar_bloco(con, validas, resultado, rejeitadas)
+    finally:
+        if rejeitadas:
+            rejeitadas.close()
+    return resultado
+
+def _importar_bloco(con: sqlite3.Connection, bloco, resultado: ResultadoImportacao, rejeitadas):
+    con.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS lote_notas (
+            aluno_matricula TEXT, turma_codigo TEXT, PRIMARY KEY (aluno_matricula, turma_codigo)
+        ) WITHOUT ROWID
+    """)
+    con.execute("DELETE FROM lote_notas")
+    con.executemany("INSERT OR IGNORE INTO lote_notas VALUES (?,?)", [(m, t) for _, m, t, _, _ in bloco])
+    # nota atual, curso e frequência atual de cada matrícula citada no bloco
+    atuais = {(m, t): [nota, curso, freq] for m, t, nota, curso, freq in con.execute("""
+        SELECT m.aluno_matricula, m.turma_codigo, m.nota, t.curso_codigo, m.frequencia
+        FROM lote_notas l
+        JOIN matriculas m ON m.aluno_matricula = l.aluno_matricula AND m.turma_codigo = l.turma_codigo
+        LEFT JOIN turmas t ON t.codigo = m.turma_codigo
+    """)}
+
+    delta = DeltaDesempenho()
+    atualizacoes, alteracoes = [], []
+    for numero, matricula, turma, nota, freq in bloco:
+        atual = atuais.get((matricula, turma))
+        if atual is None:
+            resultado.sem_matricula += 1
+            resultado.rejeitar(f"linha {numero}: {matricula};{turma} - matrícula não encontrada", rejeitadas)
+            continue
+        if nota is not None:
+            delta.registrar(matricula, atual[1], atual[0], nota)
+            if atual[0] != nota:
+                alteracoes.append(("nota", matricula, turma, atual[0], nota))
+            atual[0] = nota   # linhas repetidas no mesmo bloco partem do valor novo
+        if freq is not None and atual[2] != freq:
+            alteracoes.append(("frequencia", matricula, turma, atual[2], freq))
+            atual[2] = freq
+        atualizacoes.append((nota, freq, matricula, turma))
+        resultado.atualizadas += 1
+
+    con.executemany("""
+        UPDATE matriculas SET nota = COALESCE(?, nota), frequencia = COALESCE(?, frequencia)
+        WHERE aluno_matricula=? AND turma_codigo=?
+    """, atualizacoes)
+    if atualizacoes:
+        _alterou(con, "matriculas")
+    delta.aplicar(con)
+    _auditar_campos(con, alteracoes)
+
+# ----- relatórios -----
+def relatorio_historico(matricula: str, incluir_arquivo: bool = False):
+    """(curso, nota, frequência) das matrículas do aluno; com incluir_arquivo, também as de períodos arquivados."""
+    con = obter_conexao_leitura()
+    sql = """
+        SELECT t.curso_codigo, m.nota, m.frequencia
+        FROM matriculas m
+        JOIN turmas t ON t.codigo = m.turma_codigo
+        WHERE aluno_matricula=?
+    """
+    if not incluir_arquivo:
+        return con.execute(sql, (matricula,)).fetchall()
+    return con.execute(sql + """
+        UNION ALL
+        SELECT curso_codigo, nota, frequencia FROM matriculas_arquivo WHERE aluno_matricula=?
+    """, (matricula, matricula)).fetchall()
+
+def calcular_cr(matricula: str) -> Optional[float]:
+    """Lido de desempenho_alunos (mantido por registrar_nota), sem varrer matriculas."""
+    con = obter_conexao_leitura()
+    row = con.execute("SELECT cr FROM desempenho_alunos WHERE aluno_matricula=?", (matricula,)).fetchone()
+    return row[0] if row else None
+
+# ----- períodos letivos: arquivo das matrículas de períodos encerrados -----
+# linhas por transação: cada lote segura o lock de escrita por uma fração de segundo
+LINHAS_POR_LOTE_ARQUIVO = 10_000
+
+def arquivar_periodo(periodo: str, linhas_por_lote: int = LINHAS_POR_LOTE_ARQUIVO) -> str:
+    """
+    Move as matrículas das turmas do período para matriculas_arquivo, em
+    lotes por ordem de id (cada lote numa transação: nenhuma matrícula fica
+    nas duas tabelas nem em nenhuma; em ordem de id o arquivo só cresce no
+    fim). CR e aprovações (desempenho_alunos, aprovacoes) não mudam, então
+    pré-requisitos continuam valendo; matricular e o histórico padrão deixam
+    de ler essas linhas. A fila de espera das turmas é descartada.
+    Recusa o período se alguma matrícula dele ainda está sem nota.
+    """
+    con = obter_conexao()
+    turmas, sem_nota = con.execute("""
+        SELECT COUNT(DISTINCT t.codigo), TOTAL(m.id IS NOT NULL AND m.nota IS NULL)
+        FROM turmas t LEFT JOIN matriculas m ON m.turma_codigo = t.codigo
+        WHERE t.periodo=?
+    """, (periodo,)).fetchone()
+    if not turmas:
+        return f"❌ Nenhuma turma no período {periodo}."
+    if sem_nota:
+        return f"❌ {int(sem_nota)} matrícula(s) do período {periodo} sem nota; registre as notas antes de arquivar."
+    movidas, ultimo = 0, 0
+    while True:
+        with transacao(imediata=True) as con:
+            # nota IS NOT NULL: uma matrícula feita depois da checagem acima fica onde está
+            ate = con.execute("""
+                SELECT MAX(id) FROM (
+                    SELECT m.id FROM matriculas m JOIN turmas t ON t.codigo = m.turma_codigo
+                    WHERE t.periodo=? AND m.id > ? AND m.nota IS NOT NULL ORDER BY m.id LIMIT ?)
+            """, (periodo, ultimo, linhas_por_lote)).fetchone()[0]
+            if ate is None:
+                con.execute("DELETE FROM lista_espera WHERE turma_codigo IN (SELECT codigo FROM turmas WHERE periodo=?)",
+                            (periodo,))
+                break
+            con.execute("""
+                INSERT INTO matriculas_arquivo (id, aluno_matricula, turma_codigo, curso_codigo, periodo, nota, frequencia)
+                SELECT m.id, m.aluno_matricula, m.turma_codigo, t.curso_codigo, t.periodo, m.nota, m.frequencia
+                FROM matriculas m JOIN turmas t ON t.codigo = m.turma_codigo
+                WHERE t.periodo=? AND m.id > ? AND m.id <= ? AND m.nota IS NOT NULL
+                ORDER BY m.id
+            """, (periodo, ultimo, ate))
+            movidas += con.execute("""
+                DELETE FROM matriculas WHERE id > ? AND id <= ? AND nota IS NOT NULL
+                AND turma_codigo IN (SELECT codigo FROM turmas WHERE periodo=?)
+            """, (ultimo, ate, periodo)).rowcount
+            _alterou(con, "matriculas")
+            ultimo = ate
+    return f"✔ Período {periodo} arquivado: {movidas} matrícula(s) de {turmas} turma(s)."
+
+# ----- boletins em lote (um processo por faixa de matrículas) -----
+FORMATOS_BOLETIM = {"texto": "txt", "csv": "csv", "json": "jsonl"}
+# faixas por processo: faixas menores equilibram a carga quando alguns trechos
+# da numeração têm mais matrículas (históricos mais longos) que outros
+FAIXAS_POR_PROCESSO = 4
+COLUNAS_CSV_BOLETIM = ("matricula", "nome", "cr", "curso", "turma", "nota", "frequencia")
+
+@dataclass(slots=True)
+class ResultadoBoletins:
+    pasta: str = ""
+    arquivos: List[str] = field(default_factory=list)
+    alunos: int = 0
+    linhas: int = 0        # matrículas (linhas de histórico) escritas
+    processos: int = 1
+    segundos: float = 0.0
+    preparo: float = 0.0   # parte serial: versões, divisão em faixas e, se houve escrita no meio, a cópia
+    copia: bool = False    # houve escrita durante a leitura direta: refeito a partir de uma cópia
+
+    def __str__(self):
+        return (f"✔ {self.alunos} boletim(ns) ({self.linhas} linha(s) de histórico) em {len(self.arquivos)} "
+                f"arquivo(s) em {self.pasta} ({self.processos} processo(s), {self.segundos:.1f} s).")
+
+def _faixas_matricula(con: sqlite3.Connection, faixas: int) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Divide os alunos em até `faixas` intervalos [inicio, fim) de matrícula com o mesmo número de alunos."""
+    total = con.execute("SELECT COUNT(*) FROM alunos").fetchone()[0]
+    passo = max(1, -(-total // max(1, faixas)))
+    limites = [m for (m,) in con.execute("""
+        SELECT matricula FROM (SELECT matricula, row_number() OVER (ORDER BY matricula) - 1 AS n FROM alunos)
+        WHERE n % ? = 0 AND n > 0
+    """, (passo,))]
+    return list(zip([None] + limites, limites + [None]))
+
+# tabelas lidas pelos boletins cujo contador de versao_tabelas sobe a cada transação que as altera
+# (arquivar_periodo, que move matrículas para matriculas_arquivo, sobe o de matriculas)
+VERSOES_BOLETINS = ("alunos", "desempenho_alunos", "matriculas", "turmas")
+# o que _escrever_boletins lê, com a chave primária na ordem das consultas dele
+TABELAS_BASE_BOLETINS = {
+    "versao_tabelas": ("tabela, versao", "tabela"),
+    "alunos": ("matricula, nome", "matricula"),
+    "desempenho_alunos": ("aluno_matricula, cr", "aluno_matricula"),
+    "turmas": ("codigo, curso_codigo", "codigo"),
+    "matriculas": ("aluno_matricula, turma_codigo, nota, frequencia", "aluno_matricula, turma_codigo"),
+    "matriculas_arquivo": ("aluno_matricula, periodo, id, curso_codigo, turma_codigo, nota, frequencia",
+                           "aluno_matricula, periodo, id"),
+}
+
+def _copiar_base_boletins(destino: str):
+    """
+    Fotografia mínima para os boletins: só as colunas lidas pelos processos
+    (TABELAS_BASE_BOLETINS), copiadas do banco numa única transação de
+    leitura para tabelas WITHOUT ROWID já na ordem das consultas. Auditoria,
+    busca, log de alterações e índices que os boletins não usam ficam de
+    fora, ao contrário de um VACUUM INTO do banco inteiro.
+    """
+    con = sqlite3.connect(destino, isolation_level=None)
+    try:
+        con.execute("PRAGMA journal_mode=OFF")
+        con.execute("PRAGMA synchronous=OFF")
+        con.execute("ATTACH DATABASE ? AS origem",
+                    (f"file:{urllib.parse.quote(os.path.abspath(DB_NAME))}?mode=ro",))
+        con.execute("BEGIN")
+        for tabela, (colunas, chave) in TABELAS_BASE_BOLETINS.items():
+            con.execute(f"CREATE TABLE main.{tabela} ({colunas}, PRIMARY KEY ({chave})) WITHOUT ROWID")
+            con.execute(f"INSERT INTO main.{tabela} SELECT {colunas} FROM origem.{tabela} ORDER BY {chave}")
+        con.execute("COMMIT")
+    finally:
+        con.close()
+
+def _versoes_boletins(con: sqlite3.Connection) -> Tuple[int, ...]:
+    return tuple(v for (v,) in con.execute(
+        f"SELECT versao FROM versao_tabelas WHERE tabela IN ({', '.join('?' * len(VERSOES_BOLETINS))}) ORDER BY tabela",
+        VERSOES_BOLETINS))
+
+def _escrever_boletins(caminho_banco: str, inicio: Optional[str], fim: Optional[str],
+                       formato: str, destino: str, incluir_arquivo: bool = True) -> Tuple[int, int, Tuple[int, ...]]:
+    """
+    Trabalho de um processo: lê a faixa numa conexão somente leitura própria
+    (uma consulta para as matrículas correntes e, com incluir_arquivo, outra
+    para as arquivadas, intercaladas por aluno) e grava os boletins em
+    `destino` à medida que lê. Tudo numa transação de leitura, com as versões
+    das tabelas lidas (VERSOES_BOLETINS). Retorna (alunos, linhas de
+    histórico, versões).
+    """
+    # limites só entram no SQL quando existem, para a busca por faixa usar a chave primária
+    def filtro(coluna):
+        condicoes = [f"{coluna} {op} ?" for op, v in ((">=", inicio), ("<", fim)) if v is not None]
+        return "WHERE " + " AND ".join(condicoes) if condicoes else ""
+    limites = [v for v in (inicio, fim) if v is not None]
+    con = conectar_leitura(caminho_banco)
+    alunos = linhas = 0
+    try:
+        con.execute("BEGIN")
+        versoes = _versoes_boletins(con)
+        cur = con.execute(f"""
+            SELECT a.matricula, a.nome, d.cr, t.curso_codigo, m.turma_codigo, m.nota, m.frequencia
+            FROM alunos a
+            LEFT JOIN desempenho_alunos d ON d.aluno_matricula = a.matricula
+            LEFT JOIN matriculas m ON m.aluno_matricula = a.matricula
+            LEFT JOIN turmas t ON t.codigo = m.turma_codigo
+            {filtro("a.matricula")}
+            ORDER BY a.matricula, m.turma_codigo
+        """, limites)
+        # períodos arquivados vêm antes dos correntes, em ordem de período (ix_arquivo_aluno)
+        arquivadas = itertools.groupby(con.execute(f"""
+            SELECT aluno_matricula, curso_codigo, turma_codigo, nota, frequencia FROM matriculas_arquivo
+            {filtro("aluno_matricula")}
+            ORDER BY aluno_matricula, periodo, id
+        """, limites) if incluir_arquivo else (), key=lambda r: r[0])
+        proximo = next(arquivadas, None)
+        with open(destino + ".tmp", "w", newline="", encoding="utf-8") as arq:
+            escritor = csv.writer(arq) if formato == "csv" else None
+            if escritor:
+                escritor.writerow(COLUNAS_CSV_BOLETIM)
+            for (matricula, nome, cr), grupo in itertools.groupby(cur, key=lambda r: r[:3]):
+                historico = []
+                while proximo is not None and proximo[0] <= matricula:
+                    if proximo[0] == matricula:
+                        historico = [r[1:] for r in proximo[1]]
+                    proximo = next(arquivadas, None)
+                historico += [r[3:] for r in grupo if r[4] is not None]
+                alunos += 1
+                linhas += len(historico)
+                if escritor:
+                    for curso, turma, nota, freq in historico or [(None, None, None, None)]:
+                        escritor.writerow((matricula, nome, cr, curso, turma, nota, freq))
+                elif formato == "json":
+                    # dumps + write: json.dump() cai no codificador em Python puro, bem mais lento
+                    arq.write(json.dumps({"matricula": matricula, "nome": nome, "cr": cr,
+                                          "historico": [{"curso": c, "turma": t, "nota": n, "frequencia": f}
+                                                        for c, t, n, f in historico]}, ensure_ascii=False) + "\n")
+                else:
+                    arq.write(f"=== BOLETIM: {matricula} - {nome} ===\n")
+                    arq.write(f"CR: {cr:.2f}\n" if cr is not None else "CR: -\n")
+                    if not historico:
+                        arq.write("Nenhuma matrícula encontrada.\n")
+                    for curso, turma, nota, freq in historico:
+                        arq.write(f"Curso: {curso} | Turma: {turma} | Nota: {'-' if nota is None else nota} | "
+                                  f"Frequência: {'-' if freq is None else freq}\n")
+                    arq.write("\n")
+        os.replace(destino + ".tmp", destino)
+    finally:
+        con.close()
+    return alunos, linhas, versoes
+
+def _boletins_em_paralelo(caminho_banco: str, faixas: List[Tuple[Optional[str], Optional[str]]], formato: str,
+                          pasta: str, incluir_arquivo: bool, processos: int):
+    """Uma tarefa de _escrever_boletins por faixa, no pool; devolve (tarefas, resultados na ordem das faixas)."""
+    extensao = FORMATOS_BOLETIM[formato]
+    tarefas = [(caminho_banco, ini, fim, formato, os.path.join(pasta, f"boletins-{i:04d}.{extensao}"), incluir_arquivo)
+               for i, (ini, fim) in enumerate(faixas)]
+    if processos == 1:
+        return tarefas, [_escrever_boletins(*t) for t in tarefas]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        return tarefas, list(pool.map(_escrever_boletins, *zip(*tarefas)))
+
+def gerar_boletins(pasta: str, formato: str = "texto", processos: Optional[int] = None,
+                   faixas: Optional[int] = None, incluir_arquivo: bool = True) -> ResultadoBoletins:
+    """
+    Boletins (histórico + CR) de todos os alunos, um arquivo por faixa de
+    matrícula (boletins-0000.txt, ...), gerados em paralelo por um pool de
+    processos. Equivale a relatorio_historico(incluir_arquivo=True) +
+    calcular_cr() por aluno, mas com uma consulta por faixa em vez de duas por
+    aluno; incluir_arquivo=False deixa de fora os períodos arquivados.
+
+    Todas as faixas mostram o mesmo estado do banco. Os processos leem o
+    banco direto, cada um numa transação de leitura (WAL), e devolvem as
+    versões das tabelas que leram (versao_tabelas sobe na mesma transação de
+    cada escrita). Iguais às lidas antes de dividir o trabalho, nenhuma
+    escrita caiu no meio e a parte serial é só a divisão em faixas. Se
+    alguma escrita caiu no meio, tudo é refeito a partir de uma cópia das
+    colunas usadas, tirada numa única transação de leitura para um arquivo
+    temporário em `pasta` e apagada no fim (_copiar_base_boletins);
+    ResultadoBoletins.copia indica quando isso aconteceu.
+    """
+    if formato not in FORMATOS_BOLETIM:
+        raise ValueError(f"formato inválido: {formato} (use {', '.join(FORMATOS_BOLETIM)})")
+    inicio = time.perf_counter()
+    processos = max(1, processos or os.cpu_count() or 1)
+    faixas = faixas or processos * FAIXAS_POR_PROCESSO
+    os.makedirs(pasta, exist_ok=True)
+    extensao = FORMATOS_BOLETIM[formato]
+    copia = os.path.join(os.path.abspath(pasta), ".boletins-base.db")
+    if os.path.exists(copia):   # sobra de uma geração interrompida
+        os.remove(copia)
+
+    resultado = ResultadoBoletins(pasta=pasta, processos=processos)
+    con = conectar_leitura(DB_NAME)
+    try:
+        con.execute("BEGIN")
+        versoes = _versoes_boletins(con)
+        faixas_lidas = _faixas_matricula(con, faixas)
+    finally:
+        con.close()
+    resultado.preparo = time.perf_counter() - inicio
+    tarefas, parciais = _boletins_em_paralelo(DB_NAME, faixas_lidas, formato, pasta, incluir_arquivo, processos)
+    if any(v != versoes for _, _, v in parciais):
+        # escrita entre as faixas: refaz tudo de uma fotografia só
+        inicio_copia = time.perf_counter()
+        resultado.copia = True
+        try:
+            _copiar_base_boletins(copia)
+            con = conectar_leitura(copia)
+            try:
+                faixas_lidas = _faixas_matricula(con, faixas)
+            finally:
+                con.close()
+            resultado.preparo += time.perf_counter() - inicio_copia
+            tarefas, parciais = _boletins_em_paralelo(copia, faixas_lidas, formato, pasta, incluir_arquivo, processos)
+        finally:
+            os.remove(copia)
+    for tarefa, (alunos, linhas, _) in zip(tarefas, parciais):
+        resultado.arquivos.append(tarefa[4])
+        resultado.alunos += alunos
+        resultado.linhas += linhas
+    # faixas de uma geração anterior com mais arquivos
+    gerados = set(resultado.arquivos)
+    for arquivo in os.listdir(pasta):
+        caminho = os.path.join(pasta, arquivo)
+        if arquivo.startswith("boletins-") and arquivo.endswith("." + extensao) and caminho not in gerados:
+            os.remove(caminho)
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+# ----- busca por nome (FTS5) -----
+TIPOS_BUSCA = tuple(FONTES_BUSCA)
+LIMITE_BUSCA = 10
+# quantas ocorrências (na ordem do índice) são ranqueadas por consulta: termos
+# muito comuns ("Silva") não obrigam a pontuar o índice inteiro. O bm25 do
+# FTS5 não serve aqui: ele pontua todas as ocorrências antes do LIMIT (centenas
+# de ms para um sobrenome comum em 1 milhão de alunos). Em compensação, antes
+# das ocorrências quaisquer vêm as dos nomes que começam pela primeira palavra
+# digitada, que _relevancia() sempre põe na frente das demais.
+CANDIDATOS_BUSCA = 200
+
+@dataclass(slots=True)
+class ResultadoBusca:
+    tipo: str          # "aluno", "curso" ou "professor"
+    chave: str         # matrícula, código do curso ou nome do professor
+    texto: str
+    relevancia: float  # quanto maior, mais relevante
+
+def _reconstruir_busca(con: sqlite3.Connection):
+    con.execute("DELETE FROM busca_ids")
+    for tipo, (tabela, chave, texto) in FONTES_BUSCA.items():
+        con.execute(f"DELETE FROM busca_{tabela}")
+        con.execute(f"INSERT INTO busca_ids (tipo, chave) SELECT '{tipo}', {chave} FROM {tabela}")
+        con.execute(f"""
+            INSERT INTO busca_{tabela} (rowid, texto)
+            SELECT i.id, t.{texto} FROM {tabela} t JOIN busca_ids i ON i.tipo = '{tipo}' AND i.chave = t.{chave}
+        """)
+        con.execute(f"INSERT INTO busca_{tabela} (busca_{tabela}) VALUES ('optimize')")
+
+def reconstruir_busca() -> str:
+    """Refaz os índices de busca a partir das tabelas (manutenção; os gatilhos já os mantêm)."""
+    with transacao(imediata=True) as con:
+        _reconstruir_busca(con)
+    return "✔ Índice de busca reconstruído."
+
+# letra acentuada -> letra base (Latin-1 e Latin Extended-A cobrem os nomes em português)
+_SEM_ACENTO = {i: unicodedata.normalize("NFKD", chr(i))[0] for i in range(0xC0, 0x180)
+               if unicodedata.normalize("NFKD", chr(i))[0] != chr(i)}
+_PALAVRA = re.compile(r"[^\W_]+")
+
+def _palavras(texto: str) -> List[str]:
+    """Palavras sem acento e sem caixa, como o tokenizador unicode61 do índice as vê."""
+    return _PALAVRA.findall(texto.lower().translate(_SEM_ACENTO))
+
+def _consulta_fts(palavras: List[str], prefixo: bool) -> str:
+    """
+    Consulta FTS5 segura: cada palavra vira um termo entre aspas (sem
+    operadores do FTS5), todas obrigatórias. No modo prefixo a última
+    palavra vale como início de palavra.
+    """
+    termos = [f'"{p}"' for p in palavras]
+    if prefixo:
+        termos[-1] += "*"
+    return " ".join(termos)
+
+def _relevancia(consulta: List[str], texto: str, prefixo: bool) -> float:
+    """
+    Palavras digitadas que aparecem no nome (no modo prefixo a última basta
+    começar uma palavra), mais meio ponto se o nome começa pela primeira
+    delas, mais um desempate a favor de nomes curtos: "João Silva" vem antes
+    de "João Pedro Silva Santos".
+    """
+    palavras = _palavras(texto)
+    if not palavras:
+        return 0.0
+    def bate(p, ultima):
+        return p in palavras or (ultima and any(w.startswith(p) for w in palavras))
+    n = len(consulta)
+    pontos = sum(1 for k, p in enumerate(consulta) if bate(p, prefixo and k == n - 1))
+    primeira = palavras[0] == consulta[0] or (prefixo and n == 1 and palavras[0].startswith(consulta[0]))
+    return pontos + (0.5 if primeira else 0.0) + 1 / (1 + len(palavras))
+
+def buscar(texto: str, tipos: Iterable[str] = TIPOS_BUSCA, limite: int = LIMITE_BUSCA,
+           prefixo: bool = False) -> List[ResultadoBusca]:
+    """
+    Busca por palavras (sem diferenciar acentos ou maiúsculas) em nomes de
+    alunos, nomes de cursos e professores; até `limite` resultados por tipo,
+    do mais para o menos relevante. prefixo=True é o modo autocompletar.
+    """
+    consulta = _palavras(texto)
+    if not consulta:
+        return []
+    fts = _consulta_fts(consulta, prefixo)
+    con = obter_conexao()
+    resultados = []
+    for tipo in tipos:
+        if tipo not in FONTES_BUSCA:
+            raise ValueError(f"Tipo de busca inválido: {tipo} (use {', '.join(TIPOS_BUSCA)})")
+        tabela = f"busca_{FONTES_BUSCA[tipo][0]}"
+        sql = f"SELECT rowid, texto FROM {tabela} WHERE {tabela} MATCH ? LIMIT ?"
+        candidatos = dict(con.execute(sql, ("^" + fts, CANDIDATOS_BUSCA)))
+        candidatos.update(con.execute(sql, (fts, CANDIDATOS_BUSCA)))
+        candidatos = list(candidatos.items())
+        if tipo == "professor":
+            # um documento por turma: o professor aparece uma vez só
+            candidatos = list({t: (None, t) for _, t in candidatos}.values())
+        pontuados = sorted(((_relevancia(consulta, t, prefixo), t, i) for i, t in candidatos),
+                           key=lambda r: (-r[0], r[1]))[:limite]
+        for pontos, t, i in pontuados:
+            chave = t if i is None else con.execute("SELECT chave FROM busca_ids WHERE id=?", (i,)).fetchone()[0]
+            resultados.append(ResultadoBusca(tipo, chave, t, pontos))
+    return resultados
+
+def autocompletar(texto: str, tipos: Iterable[str] = TIPOS_BUSCA, limite: int = LIMITE_BUSCA) -> List[ResultadoBusca]:
+    return buscar(texto, tipos, limite, prefixo=True)
+
+# ----- análise de coorte (todas as turmas, cursos e alunos de uma vez) -----
+FREQUENCIA_MINIMA = 75.0
+FAIXAS_NOTA = 10              # [0,1), [1,2), ..., [9,10]
+PERCENTIS_CR = (10, 25, 50, 75, 90)
+
+def versoes_tabelas() -> Dict[str, int]:
+    """Contadores de versao_tabelas: sobem a cada transação que altera a tabela (ver _alterou)."""
+    return dict(obter_conexao().execute("SELECT tabela, versao FROM versao_tabelas"))
+
+TABELAS_COORTE = ("desempenho_alunos", "matriculas", "turmas")
+
+def versao_dados() -> List[int]:
+    """
+    Versões das tabelas que a análise de coorte lê, na ordem de TABELAS_COORTE:
+    muda a cada alteração em qualquer uma delas (a soma podia repetir um valor).
+    """
+    versoes = versoes_tabelas()
+    return [versoes[t] for t in TABELAS_COORTE]
+
+def arquivo_cache_analise(incluir_arquivo: bool = False) -> str:
+    return DB_NAME + (".analise-arquivo.json" if incluir_arquivo else ".analise.json")
+
+def _fonte_coorte(incluir_arquivo: bool) -> str:
+    """(aluno_matricula, turma_codigo, curso_codigo, nota, frequencia) das matrículas lidas pela análise."""
+    fonte = ("SELECT m.aluno_matricula, m.turma_codigo, t.curso_codigo, m.nota, m.frequencia "
+             "FROM matriculas m LEFT JOIN turmas t ON t.codigo = m.turma_codigo")
+    if incluir_arquivo:
+        fonte += (" UNION ALL SELECT aluno_matricula, turma_codigo, curso_codigo, nota, frequencia "
+                  "FROM matriculas_arquivo")
+    return fonte
+
+def analise_coorte(usar_cache: bool = True, motor: Optional[str] = None, incluir_arquivo: bool = False) -> dict:
+    """
+    Taxas de aprovação, médias e histogramas de notas por turma e por curso,
+    alunos com frequência abaixo de FREQUENCIA_MINIMA e distribuição do CR.
+    Lê nota e frequência de todas as matrículas uma vez, em colunas, e agrega
+    por turma com NumPy (bincount) quando disponível; sem NumPy, o próprio
+    SQLite agrega (GROUP BY). Os totais por curso saem dos totais por turma.
+    Com usar_cache, o resultado fica em arquivo_cache_analise() e só é
+    recalculado quando versao_dados() muda. Com incluir_arquivo, entram
+    também as matrículas de períodos arquivados (turmas e cursos antigos
+    aparecem em por_turma e por_curso).
+    """
+    motor = motor or ("numpy" if carregar_numpy() is not None else "sqlite")
+    # motor="numpy" explícito: o módulo ainda não foi carregado neste processo
+    if motor == "numpy" and carregar_numpy() is None:
+        raise ValueError("motor numpy pedido, mas o NumPy não está instalado")
+    caminho = arquivo_cache_analise(incluir_arquivo)
+    with transacao() as con:
+        versao = versao_dados()
+        if usar_cache and os.path.exists(caminho):
+            try:
+                with open(caminho, encoding="utf-8") as arq:
+                    salvo = json.load(arq)
+                if salvo.get("versao_dados") == versao and salvo.get("versao_schema") == SCHEMA_VERSAO:
+                    return salvo
+            except (OSError, ValueError):
+                pass
+        if motor == "numpy":
+            turmas, cursos, brutos, histogramas, risco, crs = _agregar_numpy(con, incluir_arquivo)
+        else:
+            turmas, cursos, brutos, histogramas, risco, crs = _agregar_sqlite(con, incluir_arquivo)
+
+    por_turma, por_curso = {}, {}
+    acumulado_curso: Dict[str, list] = {}
+    for turma, curso, bruto, hist in zip(turmas, cursos, brutos, histogramas):
+        por_turma[turma] = _estatisticas_grupo(bruto, hist, curso=curso)
+        soma = acumulado_curso.setdefault(curso, [[0] * len(bruto), [0] * FAIXAS_NOTA])
+        soma[0] = [a + b for a, b in zip(soma[0], bruto)]
+        soma[1] = [a + b for a, b in zip(soma[1], hist)]
+    for curso, (bruto, hist) in sorted(acumulado_curso.items()):
+        por_curso[curso] = _estatisticas_grupo(bruto, hist)
+    resultado = {
+        "versao_dados": versao,
+        "versao_schema": SCHEMA_VERSAO,
+        "motor": motor,
+        "incluir_arquivo": incluir_arquivo,
+        "por_turma": por_turma,
+        "por_curso": por_curso,
+        "histograma_notas": [sum(h[i] for h in histogramas) for i in range(FAIXAS_NOTA)],
+        "risco_frequencia": [list(r) for r in risco],
+        "distribuicao_cr": crs,
+    }
+    if usar_cache:
+        temporario = caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as arq:
+            json.dump(resultado, arq, ensure_ascii=False)
+        os.replace(temporario, caminho)
+    return resultado
+
+def _estatisticas_grupo(bruto, histograma, **extra) -> dict:
+    matriculas, avaliados, aprovados, soma_notas, com_freq, soma_freq, em_risco = bruto
+    return {
+        **extra,
+        "matriculas": int(matriculas),
+        "avaliados": int(avaliados),
+        "aprovados": int(aprovados),
+        "taxa_aprovacao": round(aprovados / avaliados, 4) if avaliados else None,
+        "media_nota": round(soma_notas / avaliados, 4) if avaliados else None,
+        "media_frequencia": round(soma_freq / com_freq, 4) if com_freq else None,
+        "em_risco": int(em_risco),
+        "histograma": [int(q) for q in histograma],
+    }
+
+def _distribuicao_cr(n: int, media: Optional[float], percentis, histograma) -> dict:
+    return {
+        "alunos": n,
+        "media": round(media, 4) if n else None,
+        "percentis": {str(p): round(v, 4) for p, v in zip(PERCENTIS_CR, percentis)} if n else {},
+        "histograma": [int(q) for q in histograma],
+    }
+
+def _risco_frequencia(con: sqlite3.Connection, incluir_arquivo: bool) -> List[Tuple[str, str, float]]:
+    fonte = "matriculas" if not incluir_arquivo else f"({_fonte_coorte(True)})"
+    return con.execute(f"""
+        SELECT COALESCE(aluno_matricula, ''), COALESCE(turma_codigo, ''), frequencia FROM {fonte}
+        WHERE frequencia < ? ORDER BY frequencia, 1, 2
+    """, (FREQUENCIA_MINIMA,)).fetchall()
+
+def _agregar_numpy(con: sqlite3.Connection, incluir_arquivo: bool = False):
+    tabelas = ("matriculas", "matriculas_arquivo") if incluir_arquivo else ("matriculas",)
+    fonte = " UNION ALL ".join(f"SELECT COALESCE(turma_codigo, '') AS turma, nota, frequencia FROM {t}"
+                               for t in tabelas)
+    # as turmas viram inteiros no próprio SQLite (grupo = posição do código em
+    # turmas): cada linha chega como (int, float, float) e np.fromiter monta as
+    # colunas sem passar por código Python. DISTINCT sem COALESCE, por tabela,
+    # para o SQLite saltar pelo índice de turma_codigo.
+    turmas = sorted({t or "" for tabela in tabelas
+                     for (t,) in con.execute(f"SELECT DISTINCT turma_codigo FROM {tabela}")})
+    con.execute("CREATE TEMP TABLE grupos_coorte (turma TEXT PRIMARY KEY, grupo INTEGER NOT NULL) WITHOUT ROWID")
+    try:
+        con.executemany("INSERT INTO grupos_coorte VALUES (?, ?)", zip(turmas, itertools.count()))
+        colunas = np.fromiter(con.execute(f"""
+            SELECT g.grupo, f.nota, f.frequencia FROM ({fonte}) f JOIN grupos_coorte g ON g.turma = f.turma
+        """), dtype=[("grupo", np.int64), ("nota", float), ("frequencia", float)])    # NULL -> nan
+    finally:
+        con.execute("DROP TABLE temp.grupos_coorte")
+    grupo, nota, freq = colunas["grupo"], colunas["nota"], colunas["frequencia"]
+    k = len(turmas)
+
+    tem_nota = ~np.isnan(nota)
+    tem_freq = ~np.isnan(freq)
+    with np.errstate(invalid="ignore"):
+        aprovado = tem_nota & (nota >= 6)
+        risco = tem_freq & (freq < FREQUENCIA_MINIMA)
+    somas = np.vstack([
+        np.bincount(grupo, minlength=k),
+        np.bincount(grupo, weights=tem_nota, minlength=k),
+        np.bincount(grupo, weights=aprovado, minlength=k),
+        np.bincount(grupo, weights=np.where(tem_nota, nota, 0.0), minlength=k),
+        np.bincount(grupo, weights=tem_freq, minlength=k),
+        np.bincount(grupo, weights=np.where(tem_freq, freq, 0.0), minlength=k),
+        np.bincount(grupo, weights=risco, minlength=k),
+    ]).T.tolist()
+    faixa = np.clip(np.floor(nota[tem_nota]), 0, FAIXAS_NOTA - 1).astype(np.int64)
+    histogramas = np.bincount(grupo[tem_nota] * FAIXAS_NOTA + faixa,
+                              minlength=k * FAIXAS_NOTA).reshape(k, FAIXAS_NOTA).tolist()
+
+    curso_da_turma = dict(con.execute("SELECT codigo, curso_codigo FROM turmas"))
+    if incluir_arquivo:
+        # turma de período arquivado pode ter sido excluída: o arquivo guarda o curso
+        for t, c in con.execute("SELECT DISTINCT turma_codigo, curso_codigo FROM matriculas_arquivo"):
+            curso_da_turma.setdefault(t, c)
+    cursos = [curso_da_turma.get(t) or "" for t in turmas]
+
+    cr = np.array([r[0] for r in con.execute("SELECT cr FROM desempenho_alunos WHERE cr IS NOT NULL")], dtype=float)
+    hist_cr = np.bincount(np.clip(np.floor(cr), 0, FAIXAS_NOTA - 1).astype(np.int64), minlength=FAIXAS_NOTA)
+    crs = _distribuicao_cr(len(cr), float(cr.mean()) if len(cr) else None,
+                           np.percentile(cr, PERCENTIS_CR).tolist() if len(cr) else [], hist_cr.tolist())
+    return turmas, cursos, somas, histogramas, _risco_frequencia(con, incluir_arquivo), crs
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    """Interpolação linear entre vizinhos (o mesmo critério padrão do NumPy)."""
+    pos = (len(ordenados) - 1) * p / 100
+    baixo = int(pos)
+    alto = min(baixo + 1, len(ordenados) - 1)
+    return ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (pos - baixo)
+
+def _agregar_sqlite(con: sqlite3.Connection, incluir_arquivo: bool = False):
+    turmas, cursos, brutos = [], [], []
+    posicao = {}
+    for turma, curso, *bruto in con.execute(f"""
+        SELECT COALESCE(turma_codigo, ''), COALESCE(MAX(curso_codigo), ''),
+               COUNT(*), COUNT(nota), TOTAL(nota >= 6), TOTAL(nota),
+               COUNT(frequencia), TOTAL(frequencia), TOTAL(frequencia < ?)
+        FROM ({_fonte_coorte(incluir_arquivo)})
+        GROUP BY 1 ORDER BY 1
+    """, (FREQUENCIA_MINIMA,)):
+        posicao[turma] = len(turmas)
+        turmas.append(turma)
+        cursos.append(curso)
+        brutos.append(tuple(bruto))
+    histogramas = [[0] * FAIXAS_NOTA for _ in turmas]
+    for turma, faixa, qtd in con.execute(f"""
+        SELECT COALESCE(turma_codigo, ''), MAX(0, MIN(CAST(nota AS INTEGER), ?)), COUNT(*)
+        FROM {"matriculas" if not incluir_arquivo else f"({_fonte_coorte(True)})"} WHERE nota IS NOT NULL
+        GROUP BY 1, 2
+    """, (FAIXAS_NOTA - 1,)):
+        histogramas[posicao[turma]][faixa] = qtd
+    risco = _risco_frequencia(con, incluir_arquivo)
+
+    cr = [r[0] for r in con.execute("SELECT cr FROM desempenho_alunos WHERE cr IS NOT NULL ORDER BY cr")]
+    hist_cr = [0] * FAIXAS_NOTA
+    for faixa, qtd in con.execute("""
+        SELECT MAX(0, MIN(CAST(cr AS INTEGER), ?)), COUNT(*) FROM desempenho_alunos
+        WHERE cr IS NOT NULL GROUP BY 1
+    """, (FAIXAS_NOTA - 1,)):
+        hist_cr[faixa] = qtd
+    crs = _distribuicao_cr(len(cr), sum(cr) / len(cr) if cr else None,
+                           [_percentil(cr, p) for p in PERCENTIS_CR] if cr else [], hist_cr)
+    return turmas, cursos, brutos, histogramas, risco, crs
+
+# ----- snapshot colunar (somente leitura, para relatórios) -----
+# Cada coluna é um arquivo binário de largura fixa, na ordem de bytes da máquina
+# ("i" int32, "d" float64 com NaN para NULL, "q" int64 para deslocamentos).
+# Textos: deslocamentos "q" + bytes UTF-8. Códigos repetidos (curso da turma,
+# professor, horário, pré-requisitos) usam dicionário: textos únicos + int32.
+# Os nomes dos arquivos levam o hash do conteúdo, então um refresh só grava o
+# que mudou e leitores com o arquivo mapeado nunca veem uma escrita pela metade.
+FORMATO_SNAPSHOT = 2
+
+def pasta_snapshot() -> str:
+    return DB_NAME + ".snapshot"
+
+# tabela do snapshot -> tabelas do banco de que ela depende
+DEPENDENCIAS_SNAPSHOT = {
+    "alunos": ("alunos",),
+    "cursos": ("cursos", "prerequisitos"),
+    "turmas": ("turmas",),
+    "matriculas": ("matriculas", "alunos", "turmas"),
+}
+
+def _codificar_texto(valores: List[str]) -> Dict[str, bytes]:
+    deslocamentos = array("q", [0])
+    partes = []
+    total = 0
+    for v in valores:
+        b = (v or "").encode("utf-8")
+        partes.append(b)
+        total += len(b)
+        deslocamentos.append(total)
+    return {"deslocamentos": deslocamentos.tobytes(), "dados": b"".join(partes)}
+
+def _codificar_dicionario(valores: List[Optional[str]]) -> Dict[str, bytes]:
+    dicionario = sorted({v for v in valores if v is not None})
+    posicao = {v: i for i, v in enumerate(dicionario)}
+    codigos = array("i", [posicao[v] if v is not None else -1 for v in valores])
+    return {"codigos": codigos.tobytes(), **{f"dic_{k}": b for k, b in _codificar_texto(dicionario).items()}}
+
+def _colunas_snapshot(con: sqlite3.Connection, tabela: str) -> Dict[str, Tuple[str, Dict[str, bytes]]]:
+    """coluna -> (tipo, {parte: bytes}) de uma tabela do snapshot, lida numa transação já aberta."""
+    if tabela == "alunos":
+        linhas = con.execute("SELECT matricula, nome FROM alunos ORDER BY matricula").fetchall()
+        return {"matricula": ("texto", _codificar_texto([r[0] for r in linhas])),
+                "nome": ("texto", _codificar_texto([r[1] for r in linhas]))}
+    if tabela == "cursos":
+        linhas = con.execute("SELECT codigo, nome FROM cursos ORDER BY codigo").fetchall()
+        prereqs: Dict[str, List[str]] = {}
+        for c, p in con.execute("SELECT curso_codigo, prerequisito_codigo FROM prerequisitos ORDER BY curso_codigo, posicao"):
+            prereqs.setdefault(c, []).append(p)
+        inicio, lista = array("i", [0]), []
+        for c, _ in linhas:
+            lista.extend(prereqs.get(c, []))
+            inicio.append(len(lista))
+        return {"codigo": ("texto", _codificar_texto([r[0] for r in linhas])),
+                "nome": ("texto", _codificar_texto([r[1] for r in linhas])),
+                "inicio_prerequisitos": ("i", {"valores": inicio.tobytes()}),
+                "prerequisitos": ("dicionario", _codificar_dicionario(lista))}
+    if tabela == "turmas":
+        linhas = con.execute("""
+            SELECT codigo, curso_codigo, professor, horario, limite_vagas, COALESCE(vagas_ocupadas, 0)
+            FROM turmas ORDER BY codigo
+        """).fetchall()
+        colunas = list(zip(*linhas)) or [()] * 6
+        return {"codigo": ("texto", _codificar_texto(colunas[0])),
+                "curso": ("dicionario", _codificar_dicionario(colunas[1])),
+                "professor": ("dicionario", _codificar_dicionario(colunas[2])),
+                "horario": ("dicionario", _codificar_dicionario(colunas[3])),
+                "limite_vagas": ("i", {"valores": array("i", [v or 0 for v in colunas[4]]).tobytes()}),
+                "vagas_ocupadas": ("i", {"valores": array("i", colunas[5]).tobytes()})}
+    if tabela == "matriculas":
+        # linhas ordenadas por aluno: as correntes (por turma) e depois as arquivadas
+        # (por período); inicio_por_aluno[a] .. inicio_por_aluno[a+1] são as matrículas
+        # do aluno a. Matrículas de aluno inexistente e correntes de turma inexistente
+        # ficam de fora; arquivadas de turma já excluída ficam com turma -1.
+        alunos = {m: i for i, (m,) in enumerate(con.execute("SELECT matricula FROM alunos ORDER BY matricula"))}
+        turmas, curso_da_turma = {}, {}
+        for i, (t, c) in enumerate(con.execute("SELECT codigo, curso_codigo FROM turmas ORDER BY codigo")):
+            turmas[t], curso_da_turma[t] = i, c
+        aluno_col, turma_col, nota_col, freq_col = array("i"), array("i"), array("d"), array("d")
+        arquivada_col, curso_col = array("b"), []
+        inicio = array("i", [0] * (len(alunos) + 1))
+        nan = float("nan")
+        correntes = con.execute("""
+            SELECT aluno_matricula, 0, turma_codigo, NULL, nota, frequencia FROM matriculas
+            ORDER BY aluno_matricula, turma_codigo
+        """)
+        arquivadas = con.execute("""
+            SELECT aluno_matricula, 1, turma_codigo, curso_codigo, nota, frequencia FROM matriculas_arquivo
+            ORDER BY aluno_matricula, periodo, id
+        """)
+        for m, arquivada, t, curso, nota, freq in heapq.merge(correntes, arquivadas, key=lambda r: r[:2]):
+            a, i = alunos.get(m), turmas.get(t)
+            if a is None or (i is None and not arquivada):
+                continue
+            aluno_col.append(a)
+            turma_col.append(-1 if i is None else i)
+            nota_col.append(nan if nota is None else nota)
+            freq_col.append(nan if freq is None else freq)
+            arquivada_col.append(arquivada)
+            curso_col.append(curso if arquivada else curso_da_turma[t])
+            inicio[a + 1] += 1
+        for a in range(len(alunos)):
+            inicio[a + 1] += inicio[a]
+        return {"aluno": ("i", {"valores": aluno_col.tobytes()}),
+                "turma": ("i", {"valores": turma_col.tobytes()}),
+                "curso": ("dicionario", _codificar_dicionario(curso_col)),
+                "nota": ("d", {"valores": nota_col.tobytes()}),
+                "frequencia": ("d", {"valores": freq_col.tobytes()}),
+                "arquivada": ("b", {"valores": arquivada_col.tobytes()}),
+                "inicio_por_aluno": ("i", {"valores": inicio.tobytes()})}
+    raise ValueError(f"tabela desconhecida no snapshot: {tabela}")
+
+def _arquivos_snapshot(tabelas: dict) -> set:
+    return {a for t in tabelas.values() for c in t["colunas"].values() for a in c["arquivos"].values()}
+
+def exportar_snapshot(pasta: Optional[str] = None) -> str:
+    """
+    Cria ou atualiza o snapshot colunar em `pasta` (padrão: pasta_snapshot()).
+    Só relê as tabelas cujas versões (versoes_tabelas) mudaram desde o último
+    export e só grava os arquivos de coluna cujo conteúdo mudou.
+    """
+    pasta = pasta or pasta_snapshot()
+    os.makedirs(pasta, exist_ok=True)
+    caminho_manifesto = os.path.join(pasta, "manifesto.json")
+    try:
+        with open(caminho_manifesto, encoding="utf-8") as arq:
+            anterior = json.load(arq)
+        if anterior.get("formato") != FORMATO_SNAPSHOT or anterior.get("ordem_bytes") != sys.byteorder:
+            anterior = {}
+    except (OSError, ValueError):
+        anterior = {}
+
+    gravados = mantidos = 0
+    with transacao() as con:
+        versoes = versoes_tabelas()
+        tabelas = dict(anterior.get("tabelas", {}))
+        relidas = [t for t, deps in DEPENDENCIAS_SNAPSHOT.items()
+                   if t not in tabelas or any(anterior.get("versoes", {}).get(d) != versoes[d] for d in deps)]
+        for tabela in relidas:
+            colunas = {}
+            for nome, (tipo, partes) in _colunas_snapshot(con, tabela).items():
+                arquivos = {}
+                for parte, conteudo in partes.items():
+                    resumo = hashlib.sha1(conteudo).hexdigest()[:16]
+                    arquivo = f"{tabela}.{nome}.{parte}.{resumo}.bin"
+                    destino = os.path.join(pasta, arquivo)
+                    if os.path.exists(destino):
+                        mantidos += 1
+                    else:
+                        with open(destino + ".tmp", "wb") as arq:
+                            arq.write(conteudo)
+                        os.replace(destino + ".tmp", destino)
+                        gravados += 1
+                    arquivos[parte] = arquivo
+                colunas[nome] = {"tipo": tipo, "arquivos": arquivos}
+            tabelas[tabela] = {"colunas": colunas}
+
+    manifesto = {"formato": FORMATO_SNAPSHOT, "ordem_bytes": sys.byteorder, "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "versoes": versoes, "tabelas": tabelas}
+    with open(caminho_manifesto + ".tmp", "w", encoding="utf-8") as arq:
+        json.dump(manifesto, arq, ensure_ascii=False, indent=1)
+    os.replace(caminho_manifesto + ".tmp", caminho_manifesto)
+    # Só saem os arquivos que nem este manifesto nem o anterior usam: quem acabou
+    # de ler o manifesto anterior ainda acha os arquivos dele até o próximo export
+    # (e Snapshot mapeia tudo ao abrir; depois disso a remoção não o afeta).
+    em_uso = _arquivos_snapshot(tabelas) | _arquivos_snapshot(anterior.get("tabelas", {}))
+    for arquivo in os.listdir(pasta):
+        if arquivo.endswith(".bin") and arquivo not in em_uso:
+            try:
+                os.remove(os.path.join(pasta, arquivo))
+            except OSError:
+                pass    # ainda mapeado por um leitor (Windows): sai num próximo export
+    if not relidas:
+        return "✔ Snapshot já estava atualizado."
+    return (f"✔ Snapshot atualizado ({', '.join(relidas)}): {gravados} arquivo(s) gravado(s), "
+            f"{mantidos} sem mudança.")
+
+class ColunaTexto:
+    """Sequência de textos sobre os arquivos mapeados (decodifica só o item pedido)."""
+    __slots__ = ("_deslocamentos", "_dados")
+
+    def __init__(self, deslocamentos: memoryview, dados: memoryview):
+        self._deslocamentos = deslocamentos
+        self._dados = dados
+
+    def __len__(self):
+        return max(0, len(self._deslocamentos) - 1)
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return str(self._dados[self._deslocamentos[i]:self._deslocamentos[i + 1]], "utf-8")
+
+class ColunaDicionario:
+    __slots__ = ("codigos", "dicionario")
+
+    def __init__(self, codigos: memoryview, dicionario: ColunaTexto):
+        self.codigos = codigos
+        self.dicionario = dicionario
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def __getitem__(self, i: int) -> Optional[str]:
+        c = self.codigos[i]
+        return None if c < 0 else self.dicionario[c]
+
+class Snapshot:
+    """
+    Leitor do snapshot: mapeia os arquivos na memória (mmap) e expõe as colunas
+    numéricas como memoryview sem cópia. Responde relatorio_historico() e
+    calcular_cr() com a mesma semântica das funções sobre o banco (o CR conta
+    também as notas de períodos arquivados, como desempenho_alunos).
+    Todos os arquivos do manifesto são mapeados já na abertura: um export
+    posterior pode removê-los sem afetar este leitor. Se um export remover
+    algum entre a leitura do manifesto e o mapeamento, o manifesto é relido.
+    """
+    def __init__(self, pasta: Optional[str] = None, tentativas: int = 3):
+        self.pasta = pasta or pasta_snapshot()
+        self._mapas: List[mmap.mmap] = []
+        self._colunas: Dict[Tuple[str, str], object] = {}
+        for tentativa in range(tentativas):
+            with open(os.path.join(self.pasta, "manifesto.json"), encoding="utf-8") as arq:
+                self.manifesto = json.load(arq)
+            if self.manifesto.get("formato") != FORMATO_SNAPSHOT or self.manifesto.get("ordem_bytes") != sys.byteorder:
+                raise ValueError("snapshot em formato não suportado (ou gerado em máquina com outra ordem de bytes)")
+            try:
+                self._colunas = {
+                    (tabela, nome): self._abrir_coluna(info)
+                    for tabela, t in self.manifesto["tabelas"].items() for nome, info in t["colunas"].items()}
+                break
+            except FileNotFoundError:
+                self.fechar()
+                if tentativa == tentativas - 1:
+                    raise
+
+    def _mapear(self, arquivo: str, tipo: str) -> memoryview:
+        with open(os.path.join(self.pasta, arquivo), "rb") as arq:
+            if os.fstat(arq.fileno()).st_size == 0:
+                return memoryview(b"").cast(tipo)
+            mapa = mmap.mmap(arq.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapas.append(mapa)
+        vista = memoryview(mapa)
+        return vista if tipo == "B" else vista.cast(tipo)
+
+    def _abrir_coluna(self, info: dict):
+        arquivos = info["arquivos"]
+        if info["tipo"] == "texto":
+            return ColunaTexto(self._mapear(arquivos["deslocamentos"], "q"), self._mapear(arquivos["dados"], "B"))
+        if info["tipo"] == "dicionario":
+            return ColunaDicionario(self._mapear(arquivos["codigos"], "i"),
+                                    ColunaTexto(self._mapear(arquivos["dic_deslocamentos"], "q"),
+                                                self._mapear(arquivos["dic_dados"], "B")))
+        return self._mapear(arquivos["valores"], info["tipo"])
+
+    def coluna(self, tabela: str, nome: str):
+        return self._colunas[(tabela, nome)]
+
+    def _linhas_do_aluno(self, matricula: str) -> range:
+        alunos = self.coluna("alunos", "matricula")
+        a = bisect.bisect_left(alunos, matricula)
+        if a == len(alunos) or alunos[a] != matricula:
+            return range(0)
+        inicio = self.coluna("matriculas", "inicio_por_aluno")
+        return range(inicio[a], inicio[a + 1])
+
+    def relatorio_historico(self, matricula: str, incluir_arquivo: bool = False):
+        curso, nota, freq, arquivada = (self.coluna("matriculas", c)
+                                        for c in ("curso", "nota", "frequencia", "arquivada"))
+        resultado = []
+        for i in self._linhas_do_aluno(matricula):
+            if arquivada[i] and not incluir_arquivo:
+                continue
+            n, f = nota[i], freq[i]
+            resultado.append((curso[i], None if n != n else n, None if f != f else f))
+        return resultado
+
+    def calcular_cr(self, matricula: str) -> Optional[float]:
+        nota = self.coluna("matriculas", "nota")
+        notas = [nota[i] for i in self._linhas_do_aluno(matricula) if nota[i] == nota[i]]
+        return sum(notas) / len(notas) if notas else None
+
+    def fechar(self):
+        self._colunas.clear()
+        for mapa in self._mapas:
+            try:
+                mapa.close()
+            except BufferError:
+                pass    # ainda há memoryview em uso fora daqui; o GC fecha depois
+        self._mapas.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+# ----- réplicas de leitura (log de alterações) -----
+LOTE_REPLICACAO = 5000        # entradas do log aplicadas por transação na réplica
+INTERVALO_REPLICACAO = 0.2    # espera (s) do Replicador quando o log não tem nada novo
+
+class ErroReplica(Exception):
+    """A réplica não pode mais ser atualizada pelo log e precisa ser recriada."""
+
+def log_alteracoes_ativo() -> bool:
+    return obter_conexao().execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'tg_log_%'").fetchone() is not None
+
+def definir_log_alteracoes(ativo: bool) -> str:
+    """
+    Liga/desliga a gravação de log_alteracoes (gatilhos tg_log_*; vale para
+    todos os processos que usam o banco). Desligado, as escritas não pagam o
+    log. Desligar esvazia o log e salta uma posição em seq: réplicas
+    existentes passam a recusar o log (ErroReplica) e precisam ser recriadas.
+    """
+    with transacao(imediata=True) as con:
+        if (con.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'tg_log_%'").fetchone()
+                is not None) == ativo:
+            return f"✔ Log de alterações já estava {'ligado' if ativo else 'desligado'}."
+        if ativo:
+            for tabela in CHAVES_REPLICACAO:
+                _criar_gatilhos_log(con, tabela, com_linha=True)
+            return "✔ Log de alterações ligado."
+        _remover_gatilhos_log(con)
+        con.execute("DELETE FROM log_alteracoes")
+        con.execute("INSERT OR IGNORE INTO sqlite_sequence (name, seq) VALUES ('log_alteracoes', 0)")
+        con.execute("UPDATE sqlite_sequence SET seq = seq + 1 WHERE name = 'log_alteracoes'")
+    return "✔ Log de alterações desligado."
+
+def criar_replica(caminho: str) -> str:
+    """
+    Cria (ou recria) em `caminho` uma réplica de leitura do banco principal:
+    uma cópia consistente com VACUUM INTO que guarda a posição do log em que
+    foi tirada (o log é ligado antes, se ainda não estava). Dali em diante
+    AplicadorReplica só aplica o que entrou no log.
+    """
+    definir_log_alteracoes(True)
+    for sufixo in ("", "-wal", "-shm"):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+    obter_conexao().execute("VACUUM INTO ?", (caminho,))
+    rep = sqlite3.connect(caminho, isolation_level=None)
+    try:
+        rep.execute("PRAGMA journal_mode=WAL")
+        rep.execute("BEGIN IMMEDIATE")
+        row = rep.execute("SELECT seq FROM sqlite_sequence WHERE name = 'log_alteracoes'").fetchone()
+        seq = row[0] if row else 0
+        # a réplica não gera log próprio: só recebe o do principal
+        _remover_gatilhos_log(rep)
+        rep.execute("DELETE FROM log_alteracoes")
+        rep.execute("""
+            CREATE TABLE replica_estado (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                seq INTEGER NOT NULL,
+                origem TEXT NOT NULL
+            )
+        """)
+        rep.execute("INSERT INTO replica_estado VALUES (1, ?, ?)", (seq, os.path.abspath(DB_NAME)))
+        rep.execute("COMMIT")
+    finally:
+        rep.close()
+    return f"✔ Réplica criada em {caminho} (posição {seq} do log)."
+
+def exportar_log(caminho: str, desde: int = 0) -> int:
+    """
+    Grava em `caminho` (JSON Lines) as entradas do log depois da posição
+    `desde`, para aplicar numa réplica em outra máquina
+    (AplicadorReplica.aplicar_arquivo). A primeira linha diz a versão do
+    schema e de qual banco o log saiu. Retorna quantas entradas foram exportadas.
+    """
+    total = 0
+    with transacao() as con, open(caminho, "w", encoding="utf-8") as arq:
+        arq.write(json.dumps({"schema": versao_schema(con), "desde": desde,
+                              "origem": os.path.abspath(DB_NAME)}, ensure_ascii=False) + "\n")
+        for entrada in con.execute("""
+            SELECT seq, tabela, operacao, chave, linha FROM log_alteracoes WHERE seq > ? ORDER BY seq
+        """, (desde,)):
+            arq.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+            total += 1
+    return total
+
+class AplicadorReplica:
+    """
+    Mantém uma réplica em dia aplicando o log de alterações, que traz a
+    linha inteira de cada inserção/alteração: a réplica nunca lê as tabelas
+    do principal. As entradas vêm do log do principal na mesma máquina
+    (sincronizar) ou de um arquivo de exportar_log (aplicar_arquivo). Cada
+    lote vale só o estado final de cada chave e é gravado numa transação,
+    junto com a nova posição. Log de outro banco que não o de origem da
+    réplica (replica_estado.origem) é recusado com ErroReplica.
+    """
+    def __init__(self, caminho: str):
+        if not os.path.exists(caminho):
+            raise ErroReplica(f"réplica não encontrada: {caminho} (use criar_replica)")
+        self.caminho = caminho
+        self._con = sqlite3.connect(caminho, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                                    check_same_thread=False)
+        self._con.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self._con.execute("PRAGMA synchronous=NORMAL")
+        # o lote chega agrupado por tabela, não na ordem em que as linhas nasceram
+        self._con.execute("PRAGMA foreign_keys=OFF")
+
+    def posicao(self) -> int:
+        return self._con.execute("SELECT seq FROM replica_estado").fetchone()[0]
+
+    def origem(self) -> str:
+        return self._con.execute("SELECT origem FROM replica_estado").fetchone()[0]
+
+    def _conferir_origem(self, origem: str):
+        if origem != self.origem():
+            raise ErroReplica(f"o log vem de {origem}, mas a réplica {self.caminho} é de {self.origem()}")
+
+    def atraso(self) -> int:
+        """Quantas entradas do log ainda não chegaram à réplica."""
+        row = obter_conexao().execute("SELECT seq FROM sqlite_sequence WHERE name = 'log_alteracoes'").fetchone()
+        return (row[0] if row else 0) - self.posicao()
+
+    def _conferir_schema(self, versao: int):
+        if versao != versao_schema(self._con):
+            raise ErroReplica(f"schema do principal mudou; recrie a réplica {self.caminho}")
+
+    def sincronizar(self, lote: int = LOTE_REPLICACAO) -> int:
+        """Aplica até `lote` entradas do log do principal; retorna quantas aplicou."""
+        self._conferir_origem(os.path.abspath(DB_NAME))
+        with transacao() as origem:
+            self._conferir_schema(versao_schema(origem))
+            entradas = origem.execute("""
+                SELECT seq, tabela, operacao, chave, linha FROM log_alteracoes WHERE seq > ? ORDER BY seq LIMIT ?
+            """, (self.posicao(), lote)).fetchall()
+        return self.aplicar(entradas)
+
+    def aplicar_arquivo(self, caminho: str, lote: int = LOTE_REPLICACAO) -> int:
+        """Aplica as entradas de um arquivo de exportar_log(); as já aplicadas são puladas."""
+        total = 0
+        with open(caminho, encoding="utf-8") as arq:
+            cabecalho = json.loads(arq.readline())
+            self._conferir_origem(cabecalho["origem"])
+            self._conferir_schema(cabecalho["schema"])
+            entradas = []
+            for texto in arq:
+                entradas.append(json.loads(texto))
+                if len(entradas) >= lote:
+                    total += self.aplicar(entradas)
+                    entradas = []
+            total += self.aplicar(entradas)
+        return total
+
+    def aplicar(self, entradas: List[tuple]) -> int:
+        """Aplica entradas (seq, tabela, operação, chave, linha) em ordem de seq; retorna quantas aplicou."""
+        posicao = self.posicao()
+        entradas = [e for e in entradas if e[0] > posicao]
+        if not entradas:
+            return 0
+        if entradas[0][0] != posicao + 1:
+            raise ErroReplica(f"o log foi podado ou desligado além da posição {posicao}; recrie a réplica {self.caminho}")
+        # tabela -> chave -> linha final (None: a chave terminou o lote removida)
+        finais: Dict[str, Dict[str, Optional[str]]] = {}
+        for _, tabela, operacao, chave, linha in entradas:
+            finais.setdefault(tabela, {})[chave] = None if operacao == "D" else linha
+        rep = self._con
+        rep.execute("BEGIN IMMEDIATE")
+        try:
+            # primeiro remove todas as chaves citadas, depois grava as linhas finais: trocas de
+            # chave e índices únicos (aluno, turma) nunca colidem com um estado intermediário
+            for tabela, linhas in finais.items():
+                where = " AND ".join(f"{c} = ?" for c in CHAVES_REPLICACAO[tabela])
+                rep.executemany(f"DELETE FROM {tabela} WHERE {where}", map(json.loads, linhas))
+            for tabela, linhas in finais.items():
+                imagens = [json.loads(l) for l in linhas.values() if l is not None]
+                if imagens:
+                    colunas = list(imagens[0])
+                    rep.executemany(f"INSERT OR REPLACE INTO {tabela} ({', '.join(colunas)}) "
+                                    f"VALUES ({', '.join('?' * len(colunas))})",
+                                    [tuple(i[c] for c in colunas) for i in imagens])
+            _subir_versoes(rep, [t for t in finais if t in TABELAS_VERSIONADAS])
+            rep.execute("UPDATE replica_estado SET seq = ?", (entradas[-1][0],))
+        except BaseException:
+            rep.rollback()
+            raise
+        rep.execute("COMMIT")
+        return len(entradas)
+
+    def alcancar(self, lote: int = LOTE_REPLICACAO) -> int:
+        """Sincroniza até esvaziar o log pendente; retorna o total aplicado."""
+        total = 0
+        while True:
+            aplicadas = self.sincronizar(lote)
+            total += aplicadas
+            if aplicadas < lote:
+                return total
+
+    def fechar(self):
+        self._con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+class Replicador:
+    """
+    Thread que acompanha o log e mantém uma ou mais réplicas em dia. Com
+    podar=True, a cada ociosidade poda o log até a réplica mais atrasada;
+    só use se estas forem todas as réplicas do banco (exportar_log também lê o log).
+    """
+    def __init__(self, caminhos: List[str], intervalo: float = INTERVALO_REPLICACAO, podar: bool = False):
+        self.aplicadores = [AplicadorReplica(c) for c in caminhos]
+        self.intervalo = intervalo
+        self.podar = podar
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._acompanhar, name="replicador", daemon=True)
+
+    def _acompanhar(self):
+        podado = 0
+        while not self._parar.is_set():
+            if sum(a.alcancar() for a in self.aplicadores):
+                continue
+            if self.podar:
+                ate = min(a.posicao() for a in self.aplicadores)
+                if ate > podado:
+                    podar_log_alteracoes(ate)
+                    podado = ate
+            self._parar.wait(self.intervalo)
+
+    def iniciar(self) -> "Replicador":
+        self._thread.start()
+        return self
+
+    def parar(self):
+        """Aplica o que faltar e encerra a thread."""
+        self._parar.set()
+        self._thread.join()
+        for a in self.aplicadores:
+            a.alcancar()
+            a.fechar()
+
+def definir_replicas(caminhos: List[str]):
+    """
+    Passa a atender relatorio_historico, calcular_cr, ranking_cr,
+    alunos_por_faixa_cr e as listagens pelas réplicas em `caminhos`, em rodízio
+    (lista vazia volta tudo ao banco principal). As leituras enxergam a réplica
+    como estava na última sincronização.
+    """
+    for caminho in caminhos:
+        if not os.path.exists(caminho):
+            raise ErroReplica(f"réplica não encontrada: {caminho} (use criar_replica)")
+    global REPLICAS_LEITURA
+    REPLICAS_LEITURA = list(caminhos)
+
+def podar_log_alteracoes(ate_seq: int) -> int:
+    """
+    Remove do log as entradas até `ate_seq` (use a menor posição entre as
+    réplicas); uma réplica mais atrasada que isso precisa ser recriada.
+    """
+    with transacao() as con:
+        return con.execute("DELETE FROM log_alteracoes WHERE seq <= ?", (ate_seq,)).rowcount
+
+# ----- auditoria de alterações (somente acréscimo, uma partição por mês) -----
+# Código gravado no evento = posição na tupla: só acrescente no fim.
+EVENTOS_AUDITORIA = (
+    "matricula", "cancelamento", "nota", "frequencia",
+    "curso_editado", "curso_excluido", "turma_editada", "turma_excluida",
+    "aluno_editado", "aluno_excluido",
+)
+_CODIGO_EVENTO = {e: i for i, e in enumerate(EVENTOS_AUDITORIA)}
+# eventos de um campo só gravam antes/depois direto nas colunas; os demais, {campo: [antes, depois]} em JSON
+CAMPO_EVENTO = {"nota": "nota", "frequencia": "frequencia", "aluno_editado": "nome", "aluno_excluido": "nome"}
+AUDITORIA_ATIVA = True
+PENDENTES_AUDITORIA = 5000        # eventos em memória antes de gravar (ainda na mesma transação)
+LOTE_INDICE_AUDITORIA = 10_000    # eventos no fim da partição sem índice que uma consulta aceita percorrer
+LIMITE_CONSULTA_AUDITORIA = 1000
+
+_AUDITORIA = threading.local()    # .pendentes (só dentro de transacao()) e .usuario
+_USUARIO_PADRAO: Optional[str] = None
+# (banco, mês) de partição já criada -> INSERTs do evento (de um campo só, geral)
+_PARTICOES_AUDITORIA: Dict[Tuple[str, int], Tuple[str, str]] = {}
+# eventos de um campo só (nota, frequência, nome): curso '' e dados NULL vão no próprio SQL
+_SQL_EVENTO_CAMPO = ("INSERT INTO auditoria_{mes} (aluno, turma, curso, momento, evento, usuario, antes, depois) "
+                     "VALUES (?,?,'',?,?,?,?,?)")
+_SQL_EVENTO = ("INSERT INTO auditoria_{mes} (aluno, turma, curso, momento, evento, usuario, antes, depois, dados) "
+               "VALUES (?,?,?,?,?,?,?,?,?)")
+_ULTIMO_MOMENTO = 0
+_DIA_MES = (-1, 0)                                     # último dia (desde a época) convertido e o seu mês
+
+@dataclass(slots=True)
+class EventoAuditoria:
+    momento: str                  # UTC, AAAA-MM-DDTHH:MM:SS.ffffff
+    usuario: str
+    evento: str
+    aluno: Optional[str]
+    turma: Optional[str]
+    curso: Optional[str]
+    dados: Optional[dict]         # campo -> [antes, depois]
+
+CAMPOS_AUDITORIA = ("momento", "usuario", "evento", "aluno", "turma", "curso", "dados")
+
+def definir_auditoria(ativa: bool):
+    """Liga/desliga o registro de eventos (desligar só faz sentido em medições)."""
+    global AUDITORIA_ATIVA
+    AUDITORIA_ATIVA = ativa
+
+def definir_usuario(nome: Optional[str]):
+    """Usuário gravado nos eventos desta thread; None volta ao usuário do sistema operacional."""
+    _AUDITORIA.usuario = nome
 
-@dataclass
-class Aluno(EntidadeBase):
-    matricula: str
-    nome: str
+def usuario_atual() -> str:
+    global _USUARIO_PADRAO
+    nome = getattr(_AUDITORIA, "usuario", None)
+    if nome:
+        return nome
+    if _USUARIO_PADRAO is None:
+        import getpass
+        try:
+            _USUARIO_PADRAO = getpass.getuser()
+        except (KeyError, OSError):
+            _USUARIO_PADRAO = "desconhecido"
+    return _USUARIO_PADRAO
 
-@dataclass
-class Matricula(EntidadeBase):
-    aluno_matricula: str
-    turma_codigo: str
-    nota: Optional[float] = None
-    frequencia: Optional[float] = None
+def _mudancas(antes: dict, depois: dict) -> dict:
+    """campo -> [antes, depois] só dos campos que mudaram."""
+    return {c: [antes.get(c), v] for c, v in depois.items() if antes.get(c) != v}
 
+def _auditar(evento: str, aluno: str = "", turma: str = "", curso: str = "",
+             antes=None, depois=None, dados: Optional[dict] = None):
+    """
+    Registra um evento de alteração: antes/depois para os eventos de
+    CAMPO_EVENTO, dados ({campo: [antes, depois]}) para os outros. Dentro de
+    transacao() o evento só entra no buffer da thread e é gravado com os
+    demais antes do commit; se a transação desfizer, ele some junto.
+    """
+    global _ULTIMO_MOMENTO
+    if not AUDITORIA_ATIVA:
+        return
+    # nanossegundos, estritamente crescente: faz parte da chave da partição
+    momento = time.time_ns()
+    if momento <= _ULTIMO_MOMENTO:
+        momento = _ULTIMO_MOMENTO + 1
+    _ULTIMO_MOMENTO = momento
+    evento = (aluno, turma, curso, momento, _CODIGO_EVENTO[evento], usuario_atual(),
+              antes, depois, json.dumps(dados, ensure_ascii=False) if dados else None)
+    pendentes = getattr(_AUDITORIA, "pendentes", None)
+    if pendentes is None:
+        # escrita fora de transacao(): grava na hora, na transação (ou autocommit) corrente
+        _gravar_auditoria(obter_conexao(), [evento])
+        return
+    pendentes.append(evento)
+    if len(pendentes) >= PENDENTES_AUDITORIA:
+        _gravar_auditoria_pendente(obter_conexao())
 
-# ============================
-# SERVIÇOS / LÓGICA
-# ============================
-# ----- consultas básicas -----
-def curso_por_codigo(codigo: str) -> Optional[Curso]:
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("SELECT codigo, nome, prerequisitos FROM cursos WHERE codigo=?", (codigo,))
-    row = cur.fetchone()
-    con.close()
-    if not row:
-        return None
-    prereq = json.loads(row[2]) if row[2] else []
-    return Curso(row[0], row[1], prereq)
+def _gravar_auditoria_pendente(con: sqlite3.Connection):
+    pendentes = _AUDITORIA.pendentes
+    if pendentes:
+        _gravar_auditoria(con, pendentes)
+        pendentes.clear()
 
-def turma_por_codigo(codigo: str) -> Optional[Turma]:
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("""
-        SELECT codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas
-        FROM turmas WHERE codigo=?
-    """, (codigo,))
-    row = cur.fetchone()
-    con.close()
-    if not row:
-        return None
-    return Turma(row[0], row[1], row[2], row[3], row[4], row[5] or 0)
+def _mes_auditoria(momento: int) -> int:
+    global _DIA_MES
+    dia = momento // 86_400_000_000_000
+    if dia != _DIA_MES[0]:
+        t = time.gmtime(dia * 86_400)
+        _DIA_MES = (dia, t.tm_year * 100 + t.tm_mon)
+    return _DIA_MES[1]
 
-def aluno_por_matricula(m: str) -> Optional[Aluno]:
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("SELECT matricula, nome FROM alunos WHERE matricula=?", (m,))
-    row = cur.fetchone()
-    con.close()
-    if not row:
-        return None
-    return Aluno(row[0], row[1])
+def _criar_particao_auditoria(con: sqlite3.Connection, mes: int) -> Tuple[str, str]:
+    """
+    Partição do mês: os eventos entram no fim da tabela, em ordem de seq, e
+    cada commit costuma tocar só a última página. A chave de consulta
+    (aluno, turma, curso, seq) vai para auditoria_AAAAMM_chaves em lotes já
+    ordenados (_indexar_particao_auditoria), não evento a evento, e fora das
+    escritas: quem indexa é a consulta que encontra um fim de partição grande
+    (_indexar_cauda_auditoria). Campos que não se aplicam ao evento ficam ''.
+    Gatilhos recusam UPDATE e DELETE; só podar_auditoria() remove eventos, e
+    por partição inteira.
+    """
+    tabela = f"auditoria_{mes}"
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {tabela} (
+            seq INTEGER PRIMARY KEY,
+            aluno TEXT NOT NULL,
+            turma TEXT NOT NULL,
+            curso TEXT NOT NULL,
+            momento INTEGER NOT NULL,
+            evento INTEGER NOT NULL,
+            usuario TEXT NOT NULL,
+            antes,
+            depois,
+            dados TEXT
+        )
+    """)
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {tabela}_chaves (
+            aluno TEXT NOT NULL,
+            turma TEXT NOT NULL,
+            curso TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            PRIMARY KEY (aluno, turma, curso, seq)
+        ) WITHOUT ROWID
+    """)
+    for operacao in ("UPDATE", "DELETE"):
+        con.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS tg_{tabela}_{operacao.lower()} BEFORE {operacao} ON {tabela}
+            BEGIN SELECT RAISE(ABORT, 'auditoria: eventos não podem ser alterados nem removidos'); END
+        """)
+    con.execute("INSERT OR IGNORE INTO auditoria_particoes (mes) VALUES (?)", (mes,))
+    sqls = _PARTICOES_AUDITORIA[(DB_NAME, mes)] = (_SQL_EVENTO_CAMPO.format(mes=mes), _SQL_EVENTO.format(mes=mes))
+    return sqls
 
-# ----- util: parse horário e checar conflito -----
-def parse_horario(h: str):
+def _indexar_particao_auditoria(con: sqlite3.Connection, mes: int):
+    """Copia para auditoria_AAAAMM_chaves, em ordem de chave, os eventos gravados depois do último lote."""
+    row = con.execute("SELECT indexado_ate FROM auditoria_particoes WHERE mes=?", (mes,)).fetchone()
+    ultimo = con.execute(f"SELECT max(seq) FROM auditoria_{mes}").fetchone()[0]
+    if row is None or ultimo is None or ultimo <= row[0]:
+        return
+    con.execute(f"""
+        INSERT OR IGNORE INTO auditoria_{mes}_chaves (aluno, turma, curso, seq)
+        SELECT aluno, turma, curso, seq FROM auditoria_{mes} WHERE seq > ? AND seq <= ?
+        ORDER BY aluno, turma, curso, seq
+    """, (row[0], ultimo))
+    con.execute("UPDATE auditoria_particoes SET indexado_ate=? WHERE mes=?", (ultimo, mes))
+
+def _indexar_cauda_auditoria(con: sqlite3.Connection, mes: int, indexado_ate: int) -> int:
     """
-    Espera formato: dia-ini-fim  (ex: seg-8-10)
-    Retorna (dia, ini:int, fim:int)
+    Indexa o fim da partição se ele tem LOTE_INDICE_AUDITORIA eventos ou mais
+    e devolve o novo indexado_ate. O tamanho sai do banco (a partição só
+    recebe acréscimos e seq só cresce: max(seq) - indexado_ate), então conta
+    os eventos gravados por todos os processos, inclusive os de comandos
+    avulsos da linha de comando.
     """
+    ultimo = con.execute(f"SELECT max(seq) FROM auditoria_{mes}").fetchone()[0] or 0
+    if ultimo - indexado_ate < LOTE_INDICE_AUDITORIA:
+        return indexado_ate
+    with transacao(imediata=True) as escrita:
+        _indexar_particao_auditoria(escrita, mes)
+        return escrita.execute("SELECT indexado_ate FROM auditoria_particoes WHERE mes=?", (mes,)).fetchone()[0]
+
+def _gravar_auditoria(con: sqlite3.Connection, eventos: List[tuple]):
+    """
+    Um INSERT por partição; os eventos chegam em ordem de momento, quase
+    sempre todos do mesmo mês (e, nas escritas de uma linha, um só). A
+    gravação só acrescenta linhas: o índice da partição fica para as
+    consultas (_indexar_cauda_auditoria).
+    """
+    if len(eventos) == 1:
+        # escrita de uma linha: sem agrupar por mês nem copiar a lista
+        aluno, turma, curso, momento, evento, usuario, antes, depois, dados = eventos[0]
+        if curso == "" and dados is None:
+            _inserir_eventos(con, _mes_auditoria(momento), 0, [(aluno, turma, momento, evento, usuario, antes, depois)])
+        else:
+            _inserir_eventos(con, _mes_auditoria(momento), 1, eventos)
+        return
+    mes = _mes_auditoria(eventos[0][3])
+    if _mes_auditoria(eventos[-1][3]) == mes:
+        por_mes = {mes: eventos}
+    else:
+        por_mes = {}
+        for evento in eventos:
+            por_mes.setdefault(_mes_auditoria(evento[3]), []).append(evento)
+    for mes, linhas in por_mes.items():
+        # menos parâmetros por linha: o bind de cada um custa tanto quanto a inserção
+        if all(e[2] == "" and e[8] is None for e in linhas):
+            _inserir_eventos(con, mes, 0, [(a, t, m, e, u, antes, depois)
+                                           for a, t, _, m, e, u, antes, depois, _ in linhas])
+        else:
+            _inserir_eventos(con, mes, 1, linhas)
+
+def _inserir_eventos(con: sqlite3.Connection, mes: int, forma: int, linhas: List[tuple]):
+    """Grava na partição do mês linhas no formato do INSERT `forma` de _PARTICOES_AUDITORIA (0: de um campo só)."""
+    sql = (_PARTICOES_AUDITORIA.get((DB_NAME, mes)) or _criar_particao_auditoria(con, mes))[forma]
+    inserir, valores = (con.execute, linhas[0]) if len(linhas) == 1 else (con.executemany, linhas)
     try:
-        dia, ini, fim = h.split("-")
-        return dia.strip().lower(), int(ini), int(fim)
-    except Exception:
-        raise ValueError("Formato de horário inválido. Use dia-ini-fim, ex: seg-8-10")
+        inserir(sql, valores)
+    except sqlite3.OperationalError:
+        # partição removida por outro processo (podar_auditoria) depois de entrar no cache
+        sql = _criar_particao_auditoria(con, mes)[forma]
+        inserir(sql, valores)
 
-def horarios_conflitam(h1: str, h2: str) -> bool:
+def _momentos_lote_auditoria(n: int) -> Tuple[int, int]:
+    """Reserva n momentos consecutivos, todos no mesmo mês; devolve (primeiro, mês)."""
+    global _ULTIMO_MOMENTO
+    inicio = max(time.time_ns(), _ULTIMO_MOMENTO + 1)
+    mes = _mes_auditoria(inicio)
+    if _mes_auditoria(inicio + n - 1) != mes:
+        # o lote inteiro na mesma partição: começa no primeiro instante do mês seguinte
+        inicio = (inicio + n - 1) // 86_400_000_000_000 * 86_400_000_000_000
+        mes = _mes_auditoria(inicio)
+    _ULTIMO_MOMENTO = inicio + n - 1
+    return inicio, mes
+
+def _auditar_lote(con: sqlite3.Connection, evento: str, tabela: str):
     """
-    Retorna True se horários conflitam.
-    Considera mesmo 'dia' e intervalos numéricos [ini, fim)
+    _auditar() de um evento sem antes/depois para cada linha (ordem, aluno,
+    turma) da tabela temporária `tabela`, gravado com um INSERT ... SELECT
+    em vez de evento a evento (matricular_lote). Os momentos seguem `ordem`;
+    os eventos ainda pendentes da thread são gravados antes.
+    """
+    if not AUDITORIA_ATIVA:
+        return
+    n = con.execute(f"SELECT count(*) FROM {tabela}").fetchone()[0]
+    if not n:
+        return
+    if getattr(_AUDITORIA, "pendentes", None):
+        _gravar_auditoria_pendente(con)
+    inicio, mes = _momentos_lote_auditoria(n)
+    if (DB_NAME, mes) not in _PARTICOES_AUDITORIA:
+        _criar_particao_auditoria(con, mes)
+    sql = f"""
+        INSERT INTO auditoria_{mes} (aluno, turma, curso, momento, evento, usuario)
+        SELECT aluno, turma, '', ? + ordem, ?, ? FROM {tabela} ORDER BY ordem
     """
+    parametros = (inicio, _CODIGO_EVENTO[evento], usuario_atual())
     try:
-        dia1, ini1, fim1 = parse_horario(h1)
-        dia2, ini2, fim2 = parse_horario(h2)
-    except ValueError:
-        # se formato inválido, assume conservadoramente que conflitam
-        return True
+        con.execute(sql, parametros)
+    except sqlite3.OperationalError:
+        _criar_particao_auditoria(con, mes)
+        con.execute(sql, parametros)
 
-    if dia1 != dia2:
-        return False
-    return max(ini1, ini2) < min(fim1, fim2)
+def _auditar_campos(con: sqlite3.Connection, alteracoes: List[tuple]):
+    """
+    _auditar() de vários eventos de CAMPO_EVENTO, cada um (evento, aluno,
+    turma, antes, depois), em ordem: momentos consecutivos, o usuário lido
+    uma vez só e as linhas montadas já no formato do INSERT
+    (importar_notas_csv). Os eventos ainda pendentes da thread são gravados
+    antes.
+    """
+    if not AUDITORIA_ATIVA or not alteracoes:
+        return
+    if getattr(_AUDITORIA, "pendentes", None):
+        _gravar_auditoria_pendente(con)
+    inicio, mes = _momentos_lote_auditoria(len(alteracoes))
+    usuario, codigos = usuario_atual(), _CODIGO_EVENTO
+    _inserir_eventos(con, mes, 0, [(aluno, turma, inicio + i, codigos[evento], usuario, antes, depois)
+                                   for i, (evento, aluno, turma, antes, depois) in enumerate(alteracoes)])
 
-# ----- pré-requisitos -----
-def aluno_tem_prerequisitos(aluno_matricula: str, curso: Curso) -> bool:
-    if not curso.prerequisitos:
-        return True
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("""
-        SELECT t.curso_codigo
-        FROM matriculas m
-        JOIN turmas t ON t.codigo = m.turma_codigo
-        WHERE m.aluno_matricula=? AND m.nota >= 6
-    """, (aluno_matricula,))
-    historico = {row[0] for row in cur.fetchall()}
-    con.close()
-    return all(pr in historico for pr in curso.prerequisitos)
+def _momento_auditoria(texto: str) -> int:
+    """'AAAA-MM-DD' ou 'AAAA-MM-DDTHH:MM[:SS]', em UTC, para nanossegundos."""
+    from datetime import datetime, timezone
+    return int(datetime.fromisoformat(texto).replace(tzinfo=timezone.utc).timestamp()) * 1_000_000_000
 
-# ----- matrícula -----
-def matricular(aluno_matricula: str, turma_codigo: str) -> str:
-    aluno = aluno_por_matricula(aluno_matricula)
-    turma = turma_por_codigo(turma_codigo)
+def _formatar_momento(momento: int) -> str:
+    segundos, resto = divmod(momento, 1_000_000_000)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(segundos)) + f".{resto // 1000:06d}"
 
-    if not aluno:
-        return "❌ Erro: Aluno não encontrado."
-    if not turma:
-        return "❌ Erro: Turma não encontrada."
+def consultar_auditoria(aluno: Optional[str] = None, turma: Optional[str] = None, curso: Optional[str] = None,
+                        desde: Optional[str] = None, ate: Optional[str] = None,
+                        eventos: Optional[Iterable[str]] = None,
+                        limite: Optional[int] = LIMITE_CONSULTA_AUDITORIA) -> List[EventoAuditoria]:
+    """
+    Eventos de alteração em ordem cronológica, filtrados por aluno, turma,
+    curso, intervalo [desde, ate) (datas ISO, UTC) e tipos de evento. Só as
+    partições dos meses do intervalo são lidas; com aluno, cada uma é
+    consultada pelo índice (aluno, turma, curso) mais o trecho final ainda
+    não indexado (que a própria consulta indexa antes, se passar de
+    LOTE_INDICE_AUDITORIA eventos), sem aluno ela é percorrida inteira.
+    turma=X sem aluno traz as matrículas, notas e frequências da turma e as
+    alterações da própria turma.
+    """
+    chaves, valores_chaves = [], []
+    for coluna, valor in (("aluno", aluno), ("turma", turma), ("curso", curso)):
+        if valor is not None:
+            chaves.append(coluna + " = ?")
+            valores_chaves.append(valor)
+    filtros, params = [], []
+    primeiro_mes, ultimo_mes = 0, 999999
+    if desde:
+        inicio = _momento_auditoria(desde)
+        filtros.append("a.momento >= ?")
+        params.append(inicio)
+        primeiro_mes = _mes_auditoria(inicio)
+    if ate:
+        fim = _momento_auditoria(ate)
+        filtros.append("a.momento < ?")
+        params.append(fim)
+        ultimo_mes = _mes_auditoria(fim - 1)
+    if eventos is not None:
+        codigos = [_CODIGO_EVENTO[e] for e in eventos]
+        filtros.append(f"a.evento IN ({', '.join('?' * len(codigos))})")
+        params.extend(codigos)
+    colunas = "a.aluno, a.turma, a.curso, a.momento, a.evento, a.usuario, a.antes, a.depois, a.dados"
+    todos = " AND ".join(["a." + c for c in chaves] + filtros) or "1"
 
-    curso = curso_por_codigo(turma.curso_codigo)
-    if not curso:
-        return "❌ Erro: Curso da turma não encontrado."
+    con = obter_conexao()
+    resultados: List[EventoAuditoria] = []
+    for mes, indexado_ate in con.execute("""
+        SELECT mes, indexado_ate FROM auditoria_particoes WHERE mes BETWEEN ? AND ? ORDER BY mes
+    """, (primeiro_mes, ultimo_mes)).fetchall():
+        restante = -1 if limite is None else limite - len(resultados)
+        if aluno is not None:
+            indexado_ate = _indexar_cauda_auditoria(con, mes, indexado_ate)
+            sql = f"""
+                SELECT {colunas} FROM auditoria_{mes}_chaves k JOIN auditoria_{mes} a ON a.seq = k.seq
+                WHERE {" AND ".join(["k." + c for c in chaves] + filtros)} AND k.seq <= ?
+                UNION ALL
+                SELECT {colunas} FROM auditoria_{mes} a WHERE a.seq > ? AND {todos}
+                ORDER BY 4 LIMIT ?
+            """
+            # as duas metades cortam no mesmo indexado_ate: se outro processo indexar o fim da partição
+            # entre a leitura dele e esta consulta, os eventos novos do índice não voltam duas vezes
+            valores = (*valores_chaves, *params, indexado_ate, indexado_ate, *valores_chaves, *params, restante)
+        else:
+            sql = f"SELECT {colunas} FROM auditoria_{mes} a WHERE {todos} ORDER BY a.momento LIMIT ?"
+            valores = (*valores_chaves, *params, restante)
+        for a, t, c, momento, codigo, usuario, antes, depois, dados in con.execute(sql, valores):
+            evento = EVENTOS_AUDITORIA[codigo]
+            campo = CAMPO_EVENTO.get(evento)
+            resultados.append(EventoAuditoria(
+                _formatar_momento(momento), usuario, evento, a or None, t or None, c or None,
+                {campo: [antes, depois]} if campo else json.loads(dados) if dados else None))
+        if limite is not None and len(resultados) >= limite:
+            break
+    return resultados
 
-    con = conectar()
-    cur = con.cursor()
+def particoes_auditoria() -> List[str]:
+    """Meses com eventos gravados ('AAAA-MM'), do mais antigo ao mais recente."""
+    con = obter_conexao()
+    return [f"{m // 100:04d}-{m % 100:02d}" for (m,) in con.execute("SELECT mes FROM auditoria_particoes ORDER BY mes")]
 
-    # 1. Matricula duplicada?
-    cur.execute("SELECT 1 FROM matriculas WHERE aluno_matricula=? AND turma_codigo=?",
-                (aluno_matricula, turma_codigo))
-    if cur.fetchone():
-        con.close()
-        return "⚠ Aluno já está matriculado nesta turma."
+def podar_auditoria(ate_mes: str) -> int:
+    """
+    Remove as partições inteiras até o mês `ate_mes` ('AAAA-MM', inclusive),
+    conforme a política de retenção: DROP TABLE, sem apagar evento por evento.
+    Retorna quantas partições foram removidas.
+    """
+    ano, mes = (int(p) for p in ate_mes.split("-"))
+    with transacao(imediata=True) as con:
+        meses = [m for (m,) in con.execute("SELECT mes FROM auditoria_particoes WHERE mes <= ?", (ano * 100 + mes,))]
+        for m in meses:
+            con.execute(f"DROP TABLE IF EXISTS auditoria_{m}")
+            con.execute(f"DROP TABLE IF EXISTS auditoria_{m}_chaves")
+            con.execute("DELETE FROM auditoria_particoes WHERE mes=?", (m,))
+            _PARTICOES_AUDITORIA.pop((DB_NAME, m), None)
+    return len(meses)
 
-    # 2. Já aprovado no curso?
-    cur.execute("""
-        SELECT t.curso_codigo FROM matriculas m
-        JOIN turmas t ON t.codigo = m.turma_codigo
-        WHERE m.aluno_matricula=? AND m.nota >= 6
-    """, (aluno_matricula,))
-    aprovados = {r[0] for r in cur.fetchall()}
-    if curso.codigo in aprovados:
-        con.close()
-        return "⚠ Aluno já foi aprovado neste curso."
+# ============================
+# CRUD: Cursos / Turmas / Alunos
+# ============================
+# --- paginação por chave (keyset) para as listagens ---
+TAMANHO_PAGINA = 500
 
-    # 3. Pré-requisitos
-    if not aluno_tem_prerequisitos(aluno_matricula, curso):
-        con.close()
-        return "❌ Aluno não possui os pré-requisitos."
+def _paginas(con: sqlite3.Connection, sql_base: str, chave: str, filtros: List[str], params: List,
+             tamanho_pagina: int):
+    """
+    Gera páginas (listas de linhas) de `sql_base` em ordem de `chave`, usando
+    WHERE chave > última_vista ... LIMIT n. Nenhum cursor fica aberto entre páginas.
+    A chave precisa ser a primeira coluna do SELECT.
+    """
+    ultima = None
+    while True:
+        condicoes = list(filtros)
+        valores = list(params)
+        if ultima is not None:
+            condicoes.append(f"{chave} > ?")
+            valores.append(ultima)
+        where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        pagina = con.execute(f"{sql_base}{where} ORDER BY {chave} LIMIT ?",
+                             (*valores, tamanho_pagina)).fetchall()
+        if not pagina:
+            return
+        yield pagina
+        if len(pagina) < tamanho_pagina:
+            return
+        ultima = pagina[-1][0]
 
-    # 4. Vagas
-    if turma.vagas_ocupadas >= turma.limite_vagas:
-        con.close()
-        return f"❌ Turma sem vagas. (Limite: {turma.limite_vagas})"
+# formato das listagens: "objetos" (dataclasses), "tuplas" (linhas cruas)
+# ou "colunas" (dict coluna -> lista de valores, sem criar nenhum objeto por linha)
+FORMATOS = ("objetos", "tuplas", "colunas")
+CAMPOS_CURSO = ("codigo", "nome", "prerequisitos")
+CAMPOS_TURMA = ("codigo", "curso_codigo", "professor", "horario", "limite_vagas", "vagas_ocupadas")
+CAMPOS_ALUNO = ("matricula", "nome")
 
-    # 5. Conflito de horários
-    cur.execute("""
-        SELECT t.horario FROM matriculas m
-        JOIN turmas t ON t.codigo = m.turma_codigo
-        WHERE m.aluno_matricula=?
-    """, (aluno_matricula,))
-    horarios = [r[0] for r in cur.fetchall()]
-    for h in horarios:
-        if horarios_conflitam(h, turma.horario):
-            con.close()
-            return f"❌ Conflito de horário com turma no horário: {h}"
-
-    # 6. Efetivar matrícula
-    cur.execute("INSERT INTO matriculas (aluno_matricula, turma_codigo) VALUES (?,?)",
-                (aluno_matricula, turma_codigo))
-    cur.execute("UPDATE turmas SET vagas_ocupadas = vagas_ocupadas + 1 WHERE codigo=?",
-                (turma_codigo,))
-    con.commit()
-    con.close()
-    return "✅ Matrícula realizada com sucesso!"
+def _formato_tuplas(formato: str) -> bool:
+    if formato not in ("objetos", "tuplas"):
+        raise ValueError(f"Formato inválido para iteração: {formato} (use objetos ou tuplas)")
+    return formato == "tuplas"
 
-# ----- registrar nota / frequência -----
-def registrar_nota(matricula: str, turma: str, nota: float) -> str:
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("UPDATE matriculas SET nota=? WHERE aluno_matricula=? AND turma_codigo=?",
-                (nota, matricula, turma))
-    con.commit()
-    con.close()
-    return "✔ Nota registrada."
+def _formato_iteracao(formato: str) -> str:
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato} (use {', '.join(FORMATOS)})")
+    return "objetos" if formato == "objetos" else "tuplas"
 
-def registrar_frequencia(matricula: str, turma: str, freq: float) -> str:
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("UPDATE matriculas SET frequencia=? WHERE aluno_matricula=? AND turma_codigo=?",
-                (freq, matricula, turma))
-    con.commit()
-    con.close()
-    return "✔ Frequência registrada."
+def _listar(itens, campos: Tuple[str, ...], formato: str):
+    if formato != "colunas":
+        return list(itens)
+    colunas = {c: [] for c in campos}
+    anexos = [colunas[c].append for c in campos]
+    for linha in itens:
+        for anexar, valor in zip(anexos, linha):
+            anexar(valor)
+    return colunas
 
-# ----- relatórios -----
-def relatorio_historico(matricula: str):
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("""
-        SELECT t.curso_codigo, m.nota, m.frequencia
-        FROM matriculas m
-        JOIN turmas t ON t.codigo = m.turma_codigo
-        WHERE aluno_matricula=?
-    """, (matricula,))
-    dados = cur.fetchall()
-    con.close()
-    return dados
+def _filtro_prefixo(coluna: str, prefixo: Optional[str]):
+    if not prefixo:
+        return [], []
+    escapado = prefixo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return [f"{coluna} LIKE ? ESCAPE '\\'"], [escapado + "%"]
 
-def calcular_cr(matricula: str) -> Optional[float]:
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("""
-        SELECT m.nota FROM matriculas m
-        WHERE m.aluno_matricula=? AND m.nota IS NOT NULL
-    """, (matricula,))
-    notas = [r[0] for r in cur.fetchall() if r[0] is not None]
-    con.close()
-    if not notas:
+# --- Cursos ---
+def _gravar_prerequisitos(con: sqlite3.Connection, codigo: str, prerequisitos: List[str]):
+    con.execute("DELETE FROM prerequisitos WHERE curso_codigo=?", (codigo,))
+    con.executemany("INSERT OR IGNORE INTO prerequisitos VALUES (?,?,?)",
+                    [(codigo, pr, pos) for pos, pr in enumerate(prerequisitos)])
+    _alterou(con, "prerequisitos")
+
+def _mensagem_ciclo(codigo: str, prerequisitos: List[str]) -> Optional[str]:
+    ciclo = grafo_prerequisitos().ciclo_ao_definir(codigo, prerequisitos)
+    if ciclo is None:
         return None
-    return sum(notas) / len(notas)
+    return f"❌ Pré-requisitos criariam um ciclo: {' → '.join(ciclo)}"
 
-# ============================
-# CRUD: Cursos / Turmas / Alunos
-# ============================
-# --- Cursos ---
 def criar_curso(codigo: str, nome: str, prerequisitos: List[str]) -> str:
-    con = conectar()
-    cur = con.cursor()
     try:
-        cur.execute("INSERT INTO cursos (codigo, nome, prerequisitos) VALUES (?,?,?)",
-                    (codigo, nome, json.dumps(prerequisitos)))
-        con.commit()
+        # ciclo checado já com o lock de escrita: ninguém muda o grafo entre a checagem e a gravação
+        with transacao(imediata=True) as con:
+            erro = _mensagem_ciclo(codigo, prerequisitos)
+            if erro:
+                return erro
+            con.execute("INSERT INTO cursos (codigo, nome) VALUES (?,?)", (codigo, nome))
+            _alterou(con, "cursos")
+            _gravar_prerequisitos(con, codigo, prerequisitos)
         return "✔ Curso criado."
     except sqlite3.IntegrityError:
         return "❌ Erro: já existe um curso com este código."
-    finally:
-        con.close()
 
 def editar_curso(codigo: str, novo_nome: Optional[str], novos_prereq: Optional[List[str]]) -> str:
-    curso = curso_por_codigo(codigo)
-    if not curso:
-        return "❌ Curso não encontrado."
-    nome = novo_nome or curso.nome
-    prereq = novos_prereq if novos_prereq is not None else curso.prerequisitos
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("UPDATE cursos SET nome=?, prerequisitos=? WHERE codigo=?",
-                (nome, json.dumps(prereq), codigo))
-    con.commit()
-    con.close()
+    with transacao(imediata=True) as con:
+        # valores de antes lidos do banco, já com o lock de escrita (o cache pode estar vencido)
+        curso = _curso_do_banco(codigo)
+        if not curso:
+            return "❌ Curso não encontrado."
+        nome = novo_nome or curso.nome
+        prereq = novos_prereq if novos_prereq is not None else curso.prerequisitos
+        erro = _mensagem_ciclo(codigo, prereq)
+        if erro:
+            return erro
+        con.execute("UPDATE cursos SET nome=? WHERE codigo=?", (nome, codigo))
+        _alterou(con, "cursos")
+        _gravar_prerequisitos(con, codigo, prereq)
+        dados = _mudancas({"nome": curso.nome, "prerequisitos": curso.prerequisitos},
+                          {"nome": nome, "prerequisitos": list(prereq)})
+        if dados:
+            _auditar("curso_editado", curso=codigo, dados=dados)
+    CACHE_CURSOS.invalidar(codigo)
     return "✔ Curso atualizado."
 
 def excluir_curso(codigo: str) -> str:
-    con = conectar()
-    cur = con.cursor()
-    # impedir exclusão se houver turmas
-    cur.execute("SELECT 1 FROM turmas WHERE curso_codigo=?", (codigo,))
-    if cur.fetchone():
-        con.close()
-        return "❌ Não é possível excluir: há turmas vinculadas a este curso."
-    cur.execute("DELETE FROM cursos WHERE codigo=?", (codigo,))
-    con.commit()
-    con.close()
+    with transacao(imediata=True) as con:
+        # impedir exclusão se houver turmas
+        if con.execute("SELECT 1 FROM turmas WHERE curso_codigo=?", (codigo,)).fetchone():
+            return "❌ Não é possível excluir: há turmas vinculadas a este curso."
+        curso = _curso_do_banco(codigo)
+        con.execute("DELETE FROM cursos WHERE codigo=?", (codigo,))
+        _alterou(con, "cursos", "prerequisitos")    # pré-requisitos saem em cascata
+        if curso:
+            _auditar("curso_excluido", curso=codigo,
+                     dados={"nome": [curso.nome, None], "prerequisitos": [curso.prerequisitos, None]})
+    CACHE_CURSOS.invalidar(codigo)
     return "✔ Curso excluído."
 
-def listar_cursos():
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("SELECT codigo, nome, prerequisitos FROM cursos ORDER BY codigo")
-    linhas = cur.fetchall()
-    con.close()
-    resultados = []
-    for c, n, p in linhas:
-        prereq = json.loads(p) if p else []
-        resultados.append(Curso(c, n, prereq))
-    return resultados
+def iterar_cursos(prefixo_nome: Optional[str] = None, tamanho_pagina: int = TAMANHO_PAGINA,
+                  formato: str = "objetos") -> Iterator[Curso]:
+    """
+    Cursos em ordem de código, buscados página a página (keyset), sem carregar tudo.
+    formato="tuplas" produz (codigo, nome, prerequisitos) sem criar objetos.
+    """
+    tuplas = _formato_tuplas(formato)
+    con = obter_conexao_leitura()
+    filtros, params = _filtro_prefixo("nome", prefixo_nome)
+    for pagina in _paginas(con, "SELECT codigo, nome FROM cursos", "codigo", filtros, params, tamanho_pagina):
+        prereqs = {}
+        for c, p in con.execute("""
+            SELECT curso_codigo, prerequisito_codigo FROM prerequisitos
+            WHERE curso_codigo BETWEEN ? AND ? ORDER BY curso_codigo, posicao
+        """, (pagina[0][0], pagina[-1][0])):
+            prereqs.setdefault(c, []).append(p)
+        for c, n in pagina:
+            yield (c, n, prereqs.get(c, [])) if tuplas else Curso(c, n, prereqs.get(c, []))
+
+def listar_cursos(formato: str = "objetos"):
+    return _listar(iterar_cursos(formato=_formato_iteracao(formato)), CAMPOS_CURSO, formato)
 
 # --- Turmas ---
-def criar_turma(codigo: str, curso_codigo: str, professor: str, horario: str, limite_vagas: int) -> str:
+def criar_turma(codigo: str, curso_codigo: str, professor: str, horario: str, limite_vagas: int,
+                periodo: Optional[str] = None) -> str:
     if not curso_por_codigo(curso_codigo):
         return "❌ Curso referenciado não existe."
-    con = conectar()
-    cur = con.cursor()
     try:
-        cur.execute("INSERT INTO turmas (codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas) VALUES (?,?,?,?,?,?)",
-                    (codigo, curso_codigo, professor, horario, limite_vagas, 0))
-        con.commit()
+        with transacao() as con:
+            con.execute("INSERT INTO turmas (codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas, dia, hora_ini, hora_fim, periodo) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                        (codigo, curso_codigo, professor, horario, limite_vagas, 0, *colunas_horario(horario), periodo))
+            _alterou(con, "turmas")
         return "✔ Turma criada."
     except sqlite3.IntegrityError:
         return "❌ Erro: já existe uma turma com este código."
-    finally:
-        con.close()
 
-def editar_turma(codigo: str, novo_prof: Optional[str], novo_horario: Optional[str], novo_limite: Optional[int]) -> str:
-    turma = turma_por_codigo(codigo)
-    if not turma:
-        return "❌ Turma não encontrada."
-    prof = novo_prof or turma.professor
-    horario = novo_horario or turma.horario
-    limite = novo_limite if novo_limite is not None else turma.limite_vagas
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("UPDATE turmas SET professor=?, horario=?, limite_vagas=? WHERE codigo=?",
-                (prof, horario, limite, codigo))
-    con.commit()
-    con.close()
-    return "✔ Turma atualizada."
+def editar_turma(codigo: str, novo_prof: Optional[str], novo_horario: Optional[str], novo_limite: Optional[int],
+                 novo_periodo: Optional[str] = None) -> str:
+    with transacao(imediata=True) as con:
+        # valores de antes lidos do banco, já com o lock de escrita (o cache pode estar vencido)
+        turma = _turma_do_banco(codigo)
+        if not turma:
+            return "❌ Turma não encontrada."
+        prof = novo_prof or turma.professor
+        horario = novo_horario or turma.horario
+        limite = novo_limite if novo_limite is not None else turma.limite_vagas
+        (periodo,) = con.execute("SELECT periodo FROM turmas WHERE codigo=?", (codigo,)).fetchone()
+        con.execute("UPDATE turmas SET professor=?, horario=?, limite_vagas=?, dia=?, hora_ini=?, hora_fim=?, "
+                    "periodo=COALESCE(?, periodo) WHERE codigo=?",
+                    (prof, horario, limite, *colunas_horario(horario), novo_periodo, codigo))
+        _alterou(con, "turmas")
+        dados = _mudancas({"professor": turma.professor, "horario": turma.horario,
+                           "limite_vagas": turma.limite_vagas, "periodo": periodo},
+                          {"professor": prof, "horario": horario, "limite_vagas": limite,
+                           "periodo": novo_periodo or periodo})
+        if dados:
+            _auditar("turma_editada", turma=codigo, dados=dados)
+        # se sobrou vaga (limite maior, ou vaga que a fila ainda não ocupou), a fila é
+        # atendida na mesma transação; _promover_lista_espera relê limite e ocupação no banco
+        promovidos = _promover_lista_espera(con, codigo)
+    CACHE_TURMAS.invalidar(codigo)
+    return "✔ Turma atualizada." + _resumo_promocao(promovidos)
 
 def excluir_turma(codigo: str) -> str:
-    con = conectar()
-    cur = con.cursor()
-    # impedir exclusão se houver matrículas
-    cur.execute("SELECT 1 FROM matriculas WHERE turma_codigo=?", (codigo,))
-    if cur.fetchone():
-        con.close()
-        return "❌ Não é possível excluir: há matrículas vinculadas a esta turma."
-    cur.execute("DELETE FROM turmas WHERE codigo=?", (codigo,))
-    con.commit()
-    con.close()
+    with transacao(imediata=True) as con:
+        # impedir exclusão se houver matrículas
+        if con.execute("SELECT 1 FROM matriculas WHERE turma_codigo=?", (codigo,)).fetchone():
+            return "❌ Não é possível excluir: há matrículas vinculadas a esta turma."
+        turma = _turma_do_banco(codigo)
+        con.execute("DELETE FROM turmas WHERE codigo=?", (codigo,))
+        _alterou(con, "turmas")
+        if turma:
+            _auditar("turma_excluida", turma=codigo, dados={
+                "curso_codigo": [turma.curso_codigo, None], "professor": [turma.professor, None],
+                "horario": [turma.horario, None], "limite_vagas": [turma.limite_vagas, None]})
+    CACHE_TURMAS.invalidar(codigo)
     return "✔ Turma excluída."
 
-def listar_turmas():
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("SELECT codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas FROM turmas ORDER BY codigo")
-    linhas = cur.fetchall()
-    con.close()
-    resultados = []
-    for cod, curso, prof, hor, lim, ocup in linhas:
-        resultados.append(Turma(cod, curso, prof, hor, lim, ocup or 0))
-    return resultados
+def iterar_turmas(curso_codigo: Optional[str] = None, professor: Optional[str] = None,
+                  tamanho_pagina: int = TAMANHO_PAGINA, formato: str = "objetos") -> Iterator[Turma]:
+    """Turmas em ordem de código, paginadas por chave; filtros opcionais por curso e professor."""
+    tuplas = _formato_tuplas(formato)
+    filtros, params = [], []
+    if curso_codigo is not None:
+        filtros.append("curso_codigo = ?")
+        params.append(curso_codigo)
+    if professor is not None:
+        filtros.append("professor = ?")
+        params.append(professor)
+    sql = "SELECT codigo, curso_codigo, professor, horario, limite_vagas, vagas_ocupadas FROM turmas"
+    for pagina in _paginas(obter_conexao_leitura(), sql, "codigo", filtros, params, tamanho_pagina):
+        if tuplas:
+            yield from pagina
+            continue
+        for cod, curso, prof, hor, lim, ocup in pagina:
+            yield Turma(cod, curso, prof, hor, lim, ocup or 0)
+
+def listar_turmas(formato: str = "objetos"):
+    return _listar(iterar_turmas(formato=_formato_iteracao(formato)), CAMPOS_TURMA, formato)
 
 # --- Alunos ---
 def criar_aluno(matricula: str, nome: str) -> str:
-    con = conectar()
-    cur = con.cursor()
     try:
-        cur.execute("INSERT INTO alunos (matricula, nome) VALUES (?,?)", (matricula, nome))
-        con.commit()
+        with transacao() as con:
+            con.execute("INSERT INTO alunos (matricula, nome) VALUES (?,?)", (matricula, nome))
+            _alterou(con, "alunos")
         return "✔ Aluno criado."
     except sqlite3.IntegrityError:
         return "❌ Erro: já existe um aluno com esta matrícula."
-    finally:
-        con.close()
 
 def editar_aluno(matricula: str, novo_nome: Optional[str]) -> str:
-    aluno = aluno_por_matricula(matricula)
-    if not aluno:
-        return "❌ Aluno não encontrado."
-    nome = novo_nome or aluno.nome
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("UPDATE alunos SET nome=? WHERE matricula=?", (nome, matricula))
-    con.commit()
-    con.close()
+    with transacao(imediata=True) as con:
+        # nome de antes lido do banco, já com o lock de escrita (o cache pode estar vencido)
+        aluno = _aluno_do_banco(matricula)
+        if not aluno:
+            return "❌ Aluno não encontrado."
+        nome = novo_nome or aluno.nome
+        con.execute("UPDATE alunos SET nome=? WHERE matricula=?", (nome, matricula))
+        _alterou(con, "alunos")
+        if nome != aluno.nome:
+            _auditar("aluno_editado", matricula, antes=aluno.nome, depois=nome)
+    CACHE_ALUNOS.invalidar(matricula)
     return "✔ Aluno atualizado."
 
 def excluir_aluno(matricula: str) -> str:
-    con = conectar()
-    cur = con.cursor()
-    # impedir exclusão se houver matrículas
-    cur.execute("SELECT 1 FROM matriculas WHERE aluno_matricula=?", (matricula,))
-    if cur.fetchone():
-        con.close()
-        return "❌ Não é possível excluir: o aluno possui matrículas."
-    cur.execute("DELETE FROM alunos WHERE matricula=?", (matricula,))
-    con.commit()
-    con.close()
+    with transacao(imediata=True) as con:
+        # impedir exclusão se houver matrículas
+        if con.execute("SELECT 1 FROM matriculas WHERE aluno_matricula=?", (matricula,)).fetchone():
+            return "❌ Não é possível excluir: o aluno possui matrículas."
+        if con.execute("SELECT 1 FROM matriculas_arquivo WHERE aluno_matricula=?", (matricula,)).fetchone():
+            return "❌ Não é possível excluir: o aluno possui histórico em períodos arquivados."
+        aluno = _aluno_do_banco(matricula)
+        con.execute("DELETE FROM alunos WHERE matricula=?", (matricula,))
+        _alterou(con, "alunos")
+        if aluno:
+            _auditar("aluno_excluido", matricula, antes=aluno.nome)
+    CACHE_ALUNOS.invalidar(matricula)
     return "✔ Aluno excluído."
 
-def listar_alunos():
-    con = conectar()
-    cur = con.cursor()
-    cur.execute("SELECT matricula, nome FROM alunos ORDER BY matricula")
-    linhas = cur.fetchall()
-    con.close()
-    resultados = []
-    for m, n in linhas:
-        resultados.append(Aluno(m, n))
-    return resultados
+def iterar_alunos(prefixo_nome: Optional[str] = None, tamanho_pagina: int = TAMANHO_PAGINA,
+                  formato: str = "objetos") -> Iterator[Aluno]:
+    """Alunos em ordem de matrícula, paginados por chave; filtro opcional por início do nome."""
+    tuplas = _formato_tuplas(formato)
+    filtros, params = _filtro_prefixo("nome", prefixo_nome)
+    for pagina in _paginas(obter_conexao_leitura(), "SELECT matricula, nome FROM alunos", "matricula", filtros, params, tamanho_pagina):
+        if tuplas:
+            yield from pagina
+            continue
+        for m, n in pagina:
+            yield Aluno(m, n)
+
+def listar_alunos(formato: str = "objetos"):
+    return _listar(iterar_alunos(formato=_formato_iteracao(formato)), CAMPOS_ALUNO, formato)
 
 # ============================
 # CLI (menu)
 # ============================
+LINHAS_POR_TELA = 20
+
+def _imprimir_paginado(itens, formatar, mensagem_vazio: str):
+    """Mostra LINHAS_POR_TELA itens por vez; o usuário pode parar digitando q."""
+    it = iter(itens)
+    pagina = list(itertools.islice(it, LINHAS_POR_TELA))
+    if not pagina:
+        print(mensagem_vazio)
+        return
+    while pagina:
+        for item in pagina:
+            print(formatar(item))
+        pagina = list(itertools.islice(it, LINHAS_POR_TELA))
+        if pagina and input("-- Enter para continuar, q para parar -- ").strip().lower() == "q":
+            break
+
 def menu():
     while True:
         print("\n=== MENU DO SISTEMA ACADÊMICO ===")
@@ -479,6 +4313,20 @@ def menu():
         print("15. Listar turmas")
         print("16. Listar alunos")
         print("17. Calcular CR (aluno)")
+        print("18. Turmas compatíveis com o horário do aluno")
+        print("19. Ranking de CR")
+        print("20. Verificar/recalcular desempenho (CR e aprovações)")
+        print("21. Importar notas/frequência de CSV")
+        print("22. Cursos que o aluno pode cursar (pré-requisitos)")
+        print("23. Rodada de alocação de turmas (preferências em CSV, prioridade por CR)")
+        print("24. Instrumentação (tempos por função e por SQL)")
+        print("25. Análise geral: aprovação por turma/curso, frequência em risco e distribuição do CR")
+        print("26. Lista de espera / cancelar matrícula")
+        print("27. Buscar aluno, curso ou professor")
+        print("28. Gerar grade de horários (minimiza choques entre turmas com alunos em comum)")
+        print("29. Boletins de todos os alunos (arquivos por faixa de matrícula)")
+        print("30. Arquivar período letivo encerrado")
+        print("31. Auditoria de alterações (por aluno/turma)")
         print("0. Sair")
 
         op = input("Escolha: ").strip()
@@ -497,7 +4345,8 @@ def menu():
                 prof = input("Professor: ").strip()
                 horario = input("Horário (dia-ini-fim, ex: seg-8-10): ").strip()
                 limite = int(input("Limite de vagas: ").strip())
-                print(criar_turma(codigo, curso, prof, horario, limite))
+                periodo = input("Período letivo (ex: 2025.1) [vazio se nenhum]: ").strip() or None
+                print(criar_turma(codigo, curso, prof, horario, limite, periodo))
 
             elif op == "3":
                 matricula = input("Matrícula: ").strip()
@@ -523,7 +4372,8 @@ def menu():
 
             elif op == "7":
                 m = input("Matrícula: ").strip()
-                hist = relatorio_historico(m)
+                arquivo = input("Incluir períodos arquivados? (s/n): ").strip().lower() == "s"
+                hist = relatorio_historico(m, incluir_arquivo=arquivo)
                 print("\n=== HISTÓRICO ===")
                 if not hist:
                     print("Nenhuma matrícula encontrada.")
@@ -551,7 +4401,8 @@ def menu():
                 novo_hor = input("Novo horário (dia-ini-fim) (deixe vazio para manter): ").strip() or None
                 novo_lim = input("Novo limite de vagas (deixe vazio para manter): ").strip()
                 novo_lim_val = int(novo_lim) if novo_lim else None
-                print(editar_turma(codigo, novo_prof, novo_hor, novo_lim_val))
+                novo_periodo = input("Novo período letivo (deixe vazio para manter): ").strip() or None
+                print(editar_turma(codigo, novo_prof, novo_hor, novo_lim_val, novo_periodo))
 
             elif op == "11":
                 codigo = input("Código da turma a excluir: ").strip()
@@ -575,28 +4426,26 @@ def menu():
                     print("Operação cancelada.")
 
             elif op == "14":
-                cursos = listar_cursos()
+                prefixo = input("Filtrar por início do nome (deixe vazio para todos): ").strip() or None
                 print("\n=== CURSOS ===")
-                if not cursos:
-                    print("Nenhum curso cadastrado.")
-                for c in cursos:
-                    print(f"Código: {c.codigo} | Nome: {c.nome} | Pré: {c.prerequisitos}")
+                _imprimir_paginado(iterar_cursos(prefixo),
+                                   lambda c: f"Código: {c.codigo} | Nome: {c.nome} | Pré: {c.prerequisitos}",
+                                   "Nenhum curso cadastrado.")
 
             elif op == "15":
-                turmas = listar_turmas()
+                curso = input("Filtrar por curso (deixe vazio para todos): ").strip() or None
+                prof = input("Filtrar por professor (deixe vazio para todos): ").strip() or None
                 print("\n=== TURMAS ===")
-                if not turmas:
-                    print("Nenhuma turma cadastrada.")
-                for t in turmas:
-                    print(f"Código: {t.codigo} | Curso: {t.curso_codigo} | Prof: {t.professor} | Horário: {t.horario} | Vagas: {t.vagas_ocupadas}/{t.limite_vagas}")
+                _imprimir_paginado(iterar_turmas(curso, prof),
+                                   lambda t: f"Código: {t.codigo} | Curso: {t.curso_codigo} | Prof: {t.professor} | Horário: {t.horario} | Vagas: {t.vagas_ocupadas}/{t.limite_vagas}",
+                                   "Nenhuma turma cadastrada.")
 
             elif op == "16":
-                alunos = listar_alunos()
+                prefixo = input("Filtrar por início do nome (deixe vazio para todos): ").strip() or None
                 print("\n=== ALUNOS ===")
-                if not alunos:
-                    print("Nenhum aluno cadastrado.")
-                for a in alunos:
-                    print(f"Matrícula: {a.matricula} | Nome: {a.nome}")
+                _imprimir_paginado(iterar_alunos(prefixo),
+                                   lambda a: f"Matrícula: {a.matricula} | Nome: {a.nome}",
+                                   "Nenhum aluno cadastrado.")
 
             elif op == "17":
                 m = input("Matrícula: ").strip()
@@ -606,6 +4455,169 @@ def menu():
                 else:
                     print(f"CR: {cr:.2f}")
 
+            elif op == "18":
+                m = input("Matrícula: ").strip()
+                turmas = turmas_compativeis(m)
+                print("\n=== TURMAS COMPATÍVEIS ===")
+                if not turmas:
+                    print("Nenhuma turma com vaga cabe no horário do aluno.")
+                for t in turmas:
+                    print(f"Código: {t.codigo} | Curso: {t.curso_codigo} | Prof: {t.professor} | Horário: {t.horario} | Vagas: {t.vagas_ocupadas}/{t.limite_vagas}")
+
+            elif op == "19":
+                k = input("Quantos alunos (deixe vazio para 10): ").strip()
+                ranking = ranking_cr(int(k) if k else 10)
+                print("\n=== RANKING DE CR ===")
+                if not ranking:
+                    print("Nenhum aluno com notas.")
+                for pos, (m, cr) in enumerate(ranking, start=1):
+                    print(f"{pos}. Matrícula: {m} | CR: {cr:.2f}")
+
+            elif op == "20":
+                problemas = verificar_desempenho()
+                if not problemas:
+                    print("✔ Desempenho consistente com as matrículas.")
+                else:
+                    for p in problemas[:20]:
+                        print(f"⚠ {p}")
+                    print(f"{len(problemas)} divergência(s) encontrada(s).")
+                    confirm = input("Recalcular agora? (s/n): ").strip().lower()
+                    if confirm == "s":
+                        print(reconstruir_desempenho())
+
+            elif op == "21":
+                caminho = input("Arquivo CSV (colunas matricula, turma, nota, frequencia): ").strip()
+                saida = input("Gravar linhas rejeitadas em (deixe vazio para não gravar): ").strip() or None
+                resultado = importar_notas_csv(caminho, saida)
+                print(resultado)
+                for r in resultado.amostra_rejeitadas:
+                    print(f"⚠ {r}")
+
+            elif op == "22":
+                m = input("Matrícula: ").strip()
+                cursos = cursos_elegiveis(m)
+                print("\n=== CURSOS DISPONÍVEIS ===")
+                if not cursos:
+                    print("Nenhum curso disponível.")
+                for codigo in cursos:
+                    c = curso_por_codigo(codigo)
+                    print(f"Código: {codigo} | Nome: {c.nome if c else ''}")
+
+            elif op == "23":
+                caminho = input("Arquivo CSV (colunas matricula, turma; uma linha por opção, em ordem de preferência): ").strip()
+                limite = input("Máximo de turmas por aluno (deixe vazio para sem limite): ").strip()
+                preferencias = ler_csv_preferencias(caminho)
+                simulacao = alocar_turmas(preferencias, int(limite) if limite else None, efetivar=False)
+                print(simulacao)
+                confirm = input("Efetivar as matrículas? (s/n): ").strip().lower()
+                if confirm == "s":
+                    resultado = alocar_turmas(preferencias, int(limite) if limite else None)
+                    print(resultado)
+                    for f in resultado.falhas[:20]:
+                        print(f"⚠ {f}")
+
+            elif op == "24":
+                print(f"Instrumentação {'ligada' if INSTRUMENTACAO_ATIVA else 'desligada'}.")
+                acao = input("(l)igar, (d)esligar, (r)elatório, (e)xportar Prometheus, (z)erar: ").strip().lower()
+                if acao == "l":
+                    definir_instrumentacao(True)
+                    print("✔ Instrumentação ligada.")
+                elif acao == "d":
+                    definir_instrumentacao(False)
+                    print("✔ Instrumentação desligada.")
+                elif acao == "r":
+                    print(relatorio_instrumentacao())
+                elif acao == "e":
+                    caminho = input("Arquivo de saída (deixe vazio para metricas.prom): ").strip() or "metricas.prom"
+                    exportar_prometheus(caminho)
+                    print(f"✔ Métricas gravadas em {caminho}.")
+                elif acao == "z":
+                    METRICAS.limpar()
+                    print("✔ Métricas zeradas.")
+
+            elif op == "25":
+                analise = analise_coorte()
+                print("\n=== APROVAÇÃO POR CURSO ===")
+                for codigo, g in analise["por_curso"].items():
+                    taxa = f"{g['taxa_aprovacao'] * 100:.1f}%" if g["taxa_aprovacao"] is not None else "-"
+                    media = f"{g['media_nota']:.2f}" if g["media_nota"] is not None else "-"
+                    print(f"Curso: {codigo} | Matrículas: {g['matriculas']} | Aprovação: {taxa} | Média: {media} | Em risco: {g['em_risco']}")
+                print("\n=== NOTAS (faixas 0-1 ... 9-10) ===")
+                print(" | ".join(str(q) for q in analise["histograma_notas"]))
+                cr = analise["distribuicao_cr"]
+                print(f"\n=== CR ({cr['alunos']} alunos) ===")
+                if cr["alunos"]:
+                    print(f"Média: {cr['media']:.2f} | " + " | ".join(f"p{p}: {v:.2f}" for p, v in cr["percentis"].items()))
+                risco = analise["risco_frequencia"]
+                print(f"\n=== FREQUÊNCIA ABAIXO DE {FREQUENCIA_MINIMA:.0f}% ({len(risco)}) ===")
+                _imprimir_paginado(risco, lambda r: f"Matrícula: {r[0]} | Turma: {r[1]} | Frequência: {r[2]}",
+                                   "Nenhum aluno em risco.")
+
+            elif op == "26":
+                acao = input("(e)ntrar na fila, (s)air da fila, (v)er fila da turma, (c)ancelar matrícula: ").strip().lower()
+                if acao == "v":
+                    t = input("Turma: ").strip()
+                    _imprimir_paginado(enumerate(lista_espera(t), start=1),
+                                       lambda r: f"{r[0]}. Matrícula: {r[1][0]} | Desde: {r[1][1]}",
+                                       "Lista de espera vazia.")
+                elif acao in ("e", "s", "c"):
+                    m = input("Matrícula: ").strip()
+                    t = input("Turma: ").strip()
+                    if acao == "e":
+                        print(entrar_lista_espera(m, t))
+                        posicao = posicao_lista_espera(m, t)
+                        if posicao:
+                            print(f"Posição na fila: {posicao}")
+                    elif acao == "s":
+                        print(sair_lista_espera(m, t))
+                    else:
+                        print(cancelar_matricula(m, t))
+
+            elif op == "27":
+                texto = input("Buscar (nome ou parte do início dele): ").strip()
+                resultados = autocompletar(texto)
+                if not resultados:
+                    print("Nada encontrado.")
+                rotulos = {"aluno": "Aluno", "curso": "Curso", "professor": "Professor"}
+                for r in resultados:
+                    print(f"{rotulos[r.tipo]}: {r.texto}" + (f" ({r.chave})" if r.chave != r.texto else ""))
+
+            elif op == "28":
+                caminho = input("CSV de disponibilidade (colunas professor, horario) [vazio se todos livres]: ").strip()
+                limite = input(f"Tempo de busca em segundos [{TEMPO_GRADE:.0f}]: ").strip()
+                disponibilidade = ler_csv_disponibilidade(caminho) if caminho else None
+                simulacao = gerar_grade(disponibilidade=disponibilidade,
+                                        tempo_limite=float(limite) if limite else TEMPO_GRADE)
+                print(simulacao)
+                for codigo in simulacao.sem_horario[:20]:
+                    print(f"⚠ Turma {codigo}: professor sem horário livre disponível; horário mantido.")
+                if simulacao.horarios and input("Aplicar a nova grade? (s/n): ").strip().lower() == "s":
+                    print(f"✔ {aplicar_grade(simulacao).aplicadas} turma(s) com horário atualizado.")
+
+            elif op == "29":
+                pasta = input("Pasta de destino: ").strip()
+                formato = input(f"Formato ({', '.join(FORMATOS_BOLETIM)}) [texto]: ").strip().lower() or "texto"
+                processos = input(f"Processos [{os.cpu_count() or 1}]: ").strip()
+                arquivo = input("Incluir períodos arquivados? (s/n) [s]: ").strip().lower() != "n"
+                print(gerar_boletins(pasta, formato, int(processos) if processos else None, incluir_arquivo=arquivo))
+
+            elif op == "30":
+                periodo = input("Período a arquivar (ex: 2024.2): ").strip()
+                confirm = input(f"Mover as matrículas de {periodo} para o arquivo? (s/n): ").strip().lower()
+                if confirm == "s":
+                    print(arquivar_periodo(periodo))
+
+            elif op == "31":
+                aluno = input("Matrícula do aluno (vazio = todos): ").strip() or None
+                turma = input("Turma (vazio = todas): ").strip() or None
+                desde = input("Desde (AAAA-MM-DD, vazio = início): ").strip() or None
+                eventos = consultar_auditoria(aluno, turma, desde=desde, limite=50)
+                if not eventos:
+                    print("Nenhum evento.")
+                for e in eventos:
+                    alvo = " ".join(x for x in (e.aluno, e.turma, e.curso) if x)
+                    print(f"{e.momento}  {e.usuario:<12} {e.evento:<15} {alvo}  {json.dumps(e.dados, ensure_ascii=False) if e.dados else ''}")
+
             elif op == "0":
                 print("Encerrado.")
                 break
@@ -616,10 +4628,487 @@ def menu():
         except Exception as e:
             print(f"Erro: {e}")
 
+# ============================
+# Serviço assíncrono e servidor HTTP/JSON
+# ============================
+LEITORES_HTTP = 4             # threads de leitura (cada uma com sua conexão)
+PENDENTES_HTTP = 256          # pedidos aguardando uma thread; acima disso o cliente espera
+LIMITE_CORPO_HTTP = 1 << 20
+LIMITE_LISTAGEM_HTTP = 100
+
+class ServicoAssincrono:
+    """
+    Fachada asyncio sobre as funções de serviço. O trabalho com SQLite roda
+    fora do event loop: leituras num pool limitado de threads e escritas numa
+    thread única, que serializa as transações (um só escritor, como o SQLite).
+    """
+    def __init__(self, leitores: int = LEITORES_HTTP, pendentes: int = PENDENTES_HTTP):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        self._leitura = ThreadPoolExecutor(max_workers=leitores, thread_name_prefix="leitura")
+        self._escrita = ThreadPoolExecutor(max_workers=1, thread_name_prefix="escrita")
+        self._vagas = asyncio.Semaphore(pendentes)
+
+    async def _executar(self, executor, func, *args):
+        import asyncio
+        async with self._vagas:
+            return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args))
+
+    async def ler(self, func, *args):
+        return await self._executar(self._leitura, func, *args)
+
+    async def escrever(self, func, *args):
+        return await self._executar(self._escrita, func, *args)
+
+    def fechar(self):
+        self._leitura.shutdown(wait=True)
+        self._escrita.shutdown(wait=True)
+
+    # --- escrita ---
+    async def matricular(self, aluno_matricula: str, turma_codigo: str) -> str:
+        return await self.escrever(matricular, aluno_matricula, turma_codigo)
+
+    async def registrar_nota(self, matricula: str, turma: str, nota: float) -> str:
+        return await self.escrever(registrar_nota, matricula, turma, nota)
+
+    async def registrar_frequencia(self, matricula: str, turma: str, freq: float) -> str:
+        return await self.escrever(registrar_frequencia, matricula, turma, freq)
+
+    async def entrar_lista_espera(self, aluno_matricula: str, turma_codigo: str) -> str:
+        return await self.escrever(entrar_lista_espera, aluno_matricula, turma_codigo)
+
+    async def cancelar_matricula(self, aluno_matricula: str, turma_codigo: str) -> str:
+        return await self.escrever(cancelar_matricula, aluno_matricula, turma_codigo)
+
+    # --- leitura ---
+    async def relatorio_historico(self, matricula: str, incluir_arquivo: bool = False):
+        return await self.ler(relatorio_historico, matricula, incluir_arquivo)
+
+    async def calcular_cr(self, matricula: str) -> Optional[float]:
+        return await self.ler(calcular_cr, matricula)
+
+    async def cursos_elegiveis(self, matricula: str) -> List[str]:
+        return await self.ler(cursos_elegiveis, matricula)
+
+    async def buscar(self, texto: str, tipos: Iterable[str] = TIPOS_BUSCA, limite: int = LIMITE_BUSCA,
+                     prefixo: bool = False) -> List[ResultadoBusca]:
+        return await self.ler(buscar, texto, tipos, limite, prefixo)
+
+    async def listar_cursos(self, prefixo_nome: Optional[str] = None, limite: int = LIMITE_LISTAGEM_HTTP):
+        return await self.ler(_fatia, iterar_cursos, limite, prefixo_nome)
+
+    async def listar_turmas(self, curso_codigo: Optional[str] = None, professor: Optional[str] = None,
+                            limite: int = LIMITE_LISTAGEM_HTTP):
+        return await self.ler(_fatia, iterar_turmas, limite, curso_codigo, professor)
+
+    async def listar_alunos(self, prefixo_nome: Optional[str] = None, limite: int = LIMITE_LISTAGEM_HTTP):
+        return await self.ler(_fatia, iterar_alunos, limite, prefixo_nome)
+
+def _fatia(iterar, limite: int, *filtros) -> List[dict]:
+    """Primeiros `limite` itens de iterar_*(), como dicionários prontos para JSON."""
+    return [asdict(item) for item in itertools.islice(iterar(*filtros, tamanho_pagina=min(limite, TAMANHO_PAGINA)), limite)]
+
+class ErroHTTP(Exception):
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+RAZOES_HTTP = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+class ServidorHTTP:
+    """
+    Servidor HTTP/1.1 mínimo (keep-alive, JSON) sobre asyncio, só para uso local.
+      GET  /cursos?prefixo=&limite=          GET  /alunos/{m}/historico?arquivo=1
+      GET  /turmas?curso=&professor=&limite= GET  /alunos/{m}/cr
+      GET  /alunos?prefixo=&limite=          GET  /alunos/{m}/elegiveis
+      POST /matriculas   {"aluno", "turma"}
+      POST /notas        {"aluno", "turma", "nota"}
+      POST /frequencias  {"aluno", "turma", "frequencia"}
+    Respostas das operações trazem {"ok", "mensagem"} com a mesma mensagem do menu.
+    """
+    def __init__(self, servico: ServicoAssincrono):
+        self.servico = servico
+
+    async def atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        import asyncio
+        try:
+            while True:
+                try:
+                    cabecalho = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                linhas = cabecalho.decode("latin-1").split("\r\n")
+                partes = linhas[0].split(" ")
+                cabecalhos = {}
+                for linha in linhas[1:]:
+                    nome, _, valor = linha.partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                manter = (len(partes) == 3 and partes[2] == "HTTP/1.1"
+                          and cabecalhos.get("connection", "").lower() != "close")
+                try:
+                    if len(partes) != 3:
+                        raise ErroHTTP(400, "linha de requisição inválida")
+                    try:
+                        tamanho = int(cabecalhos.get("content-length") or 0)
+                    except ValueError:
+                        tamanho = -1
+                    if tamanho < 0:
+                        manter = False    # sem saber onde o corpo termina, a conexão não serve para a próxima
+                        raise ErroHTTP(400, "Content-Length inválido")
+                    if tamanho > LIMITE_CORPO_HTTP:
+                        manter = False
+                        raise ErroHTTP(413, "corpo grande demais")
+                    corpo = await reader.readexactly(tamanho) if tamanho else b""
+                    status, dados = 200, await self.rotear(partes[0], partes[1], corpo)
+                except ErroHTTP as e:
+                    status, dados = e.status, {"erro": str(e)}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    status, dados = 500, {"erro": str(e)}
+                conteudo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {RAZOES_HTTP[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(conteudo)}\r\n"
+                    f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode("latin-1") + conteudo)
+                await writer.drain()
+                if not manter:
+                    break
+        finally:
+            writer.close()
+
+    async def rotear(self, metodo: str, alvo: str, corpo: bytes):
+        url = urllib.parse.urlsplit(alvo)
+        caminho = [urllib.parse.unquote(p) for p in url.path.split("/") if p]
+        consulta = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        s = self.servico
+        if metodo == "GET":
+            limite = self._inteiro(consulta.get("limite"), LIMITE_LISTAGEM_HTTP)
+            if caminho == ["cursos"]:
+                return await s.listar_cursos(consulta.get("prefixo"), limite)
+            if caminho == ["turmas"]:
+                return await s.listar_turmas(consulta.get("curso"), consulta.get("professor"), limite)
+            if caminho == ["alunos"]:
+                return await s.listar_alunos(consulta.get("prefixo"), limite)
+            if caminho == ["busca"]:
+                tipos = consulta["tipo"].split(",") if consulta.get("tipo") else TIPOS_BUSCA
+                if any(t not in FONTES_BUSCA for t in tipos):
+                    raise ErroHTTP(400, f"tipo inválido (use {', '.join(TIPOS_BUSCA)})")
+                resultados = await s.buscar(consulta.get("q", ""), tipos, self._inteiro(consulta.get("limite"), LIMITE_BUSCA),
+                                            consulta.get("prefixo") == "1")
+                return [asdict(r) for r in resultados]
+            if len(caminho) == 3 and caminho[0] == "alunos":
+                m = caminho[1]
+                if caminho[2] == "historico":
+                    historico = await s.relatorio_historico(m, consulta.get("arquivo") == "1")
+                    return [{"curso": c, "nota": n, "frequencia": f} for c, n, f in historico]
+                if caminho[2] == "cr":
+                    return {"matricula": m, "cr": await s.calcular_cr(m)}
+                if caminho[2] == "elegiveis":
+                    return await s.cursos_elegiveis(m)
+        elif metodo == "POST":
+            if caminho == ["matriculas"]:
+                dados = self._json(corpo, "aluno", "turma")
+                return self._resposta(await s.matricular(dados["aluno"], dados["turma"]))
+            if caminho == ["lista-espera"]:
+                dados = self._json(corpo, "aluno", "turma")
+                return self._resposta(await s.entrar_lista_espera(dados["aluno"], dados["turma"]))
+            if caminho == ["cancelamentos"]:
+                dados = self._json(corpo, "aluno", "turma")
+                return self._resposta(await s.cancelar_matricula(dados["aluno"], dados["turma"]))
+            if caminho == ["notas"]:
+                dados = self._json(corpo, "aluno", "turma", "nota")
+                return self._resposta(await s.registrar_nota(dados["aluno"], dados["turma"],
+                                                             self._numero(dados, "nota")))
+            if caminho == ["frequencias"]:
+                dados = self._json(corpo, "aluno", "turma", "frequencia")
+                return self._resposta(await s.registrar_frequencia(dados["aluno"], dados["turma"],
+                                                                   self._numero(dados, "frequencia")))
+        else:
+            raise ErroHTTP(405, f"método {metodo} não suportado")
+        raise ErroHTTP(404, f"rota não encontrada: {metodo} {url.path}")
+
+    @staticmethod
+    def _inteiro(texto: Optional[str], padrao: int) -> int:
+        try:
+            return max(1, int(texto)) if texto else padrao
+        except ValueError:
+            raise ErroHTTP(400, f"número inválido: {texto}")
+
+    @staticmethod
+    def _numero(dados: dict, campo: str) -> float:
+        """Número finito (JSON ou texto); bool, lista, "abc", NaN etc. são erro do cliente."""
+        valor = dados[campo]
+        if isinstance(valor, (int, float, str)) and not isinstance(valor, bool):
+            try:
+                numero = float(valor)
+            except ValueError:
+                numero = math.nan
+            if math.isfinite(numero):
+                return numero
+        raise ErroHTTP(400, f"{campo} inválido: {valor!r}")
+
+    @staticmethod
+    def _json(corpo: bytes, *campos: str) -> dict:
+        try:
+            dados = json.loads(corpo or b"{}")
+        except ValueError:
+            raise ErroHTTP(400, "JSON inválido")
+        faltando = [c for c in campos if not isinstance(dados, dict) or dados.get(c) in (None, "")]
+        if faltando:
+            raise ErroHTTP(400, f"campos obrigatórios: {', '.join(faltando)}")
+        return dados
+
+    @staticmethod
+    def _resposta(mensagem: str) -> dict:
+        return {"ok": mensagem.startswith(("✅", "✔")), "mensagem": mensagem}
+
+async def iniciar_servidor_http(host: str = "127.0.0.1", porta: int = 8080,
+                                servico: Optional[ServicoAssincrono] = None) -> asyncio.AbstractServer:
+    """Sobe o servidor no event loop atual (porta=0 escolhe uma porta livre)."""
+    import asyncio
+    servidor = ServidorHTTP(servico or ServicoAssincrono())
+    return await asyncio.start_server(servidor.atender, host, porta)
+
+def executar_servidor_http(host: str = "127.0.0.1", porta: int = 8080):
+    """Bloqueia servindo HTTP até Ctrl+C."""
+    import asyncio
+    servico = ServicoAssincrono()
+
+    async def principal():
+        servidor = await iniciar_servidor_http(host, porta, servico)
+        print(f"Servidor em http://{host}:{servidor.sockets[0].getsockname()[1]} (Ctrl+C para sair)")
+        async with servidor:
+            await servidor.serve_forever()
+
+    try:
+        asyncio.run(principal())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servico.fechar()
+
+# ============================
+# Comandos não interativos
+# ============================
+FORMATOS_SAIDA = ("texto", "csv", "json")
+
+def _mensagem(texto: str) -> int:
+    """
+    Imprime a mensagem do serviço; código de saída 0 só quando a operação foi
+    feita (✔/✅). Recusas (⚠ "já está matriculado", "já foi aprovado", ...)
+    e erros (❌) saem com 1.
+    """
+    print(texto)
+    return 0 if texto.startswith(("✔", "✅")) else 1
+
+def _imprimir_registros(campos: Tuple[str, ...], linhas: Iterable[tuple], formato: str) -> int:
+    """texto: colunas separadas por TAB, sem cabeçalho; csv: com cabeçalho; json: lista de objetos."""
+    saida = sys.stdout
+    if formato == "csv":
+        escritor = csv.writer(saida, lineterminator="\n")
+        escritor.writerow(campos)
+        escritor.writerows(linhas)
+    elif formato == "json":
+        # escrito item a item: listagens grandes não ficam inteiras na memória
+        saida.write("[")
+        for i, linha in enumerate(linhas):
+            saida.write((",\n" if i else "\n") + json.dumps(dict(zip(campos, linha)), ensure_ascii=False))
+        saida.write("\n]\n")
+    else:
+        for linha in linhas:
+            saida.write("\t".join("" if v is None else str(v) for v in linha) + "\n")
+    return 0
+
+def _comando_listar(opcoes) -> int:
+    if opcoes.entidade == "cursos":
+        linhas = iterar_cursos(opcoes.prefixo, formato="tuplas")
+        if opcoes.formato != "json":
+            linhas = ((c, n, ",".join(p)) for c, n, p in linhas)
+        return _imprimir_registros(CAMPOS_CURSO, linhas, opcoes.formato)
+    if opcoes.entidade == "turmas":
+        return _imprimir_registros(CAMPOS_TURMA, iterar_turmas(opcoes.curso, opcoes.professor, formato="tuplas"),
+                                   opcoes.formato)
+    return _imprimir_registros(CAMPOS_ALUNO, iterar_alunos(opcoes.prefixo, formato="tuplas"), opcoes.formato)
+
+def _comando_cr(opcoes) -> int:
+    cr = calcular_cr(opcoes.aluno)
+    print("-" if cr is None else f"{cr:.2f}")
+    return 0
+
+def _comando_importar_notas(opcoes) -> int:
+    resultado = importar_notas_csv(opcoes.arquivo, opcoes.rejeitadas)
+    print(resultado)
+    for r in resultado.amostra_rejeitadas:
+        print(f"⚠ {r}")
+    return 0
+
+def _comando_replica(opcoes) -> int:
+    if not os.path.exists(opcoes.arquivo):
+        if opcoes.log:
+            return _mensagem(f"❌ Réplica não encontrada: {opcoes.arquivo} (crie-a no servidor principal).")
+        return _mensagem(criar_replica(opcoes.arquivo))
+    try:
+        with AplicadorReplica(opcoes.arquivo) as aplicador:
+            aplicadas = aplicador.aplicar_arquivo(opcoes.log) if opcoes.log else aplicador.alcancar()
+            print(f"✔ {aplicadas} alteração(ões) aplicada(s) na réplica (posição {aplicador.posicao()}).")
+    except ErroReplica as e:
+        return _mensagem(f"❌ {e}")
+    return 0
+
+def _comando_auditoria(opcoes) -> int:
+    eventos = opcoes.eventos.split(",") if opcoes.eventos else None
+    if eventos and any(e not in _CODIGO_EVENTO for e in eventos):
+        return _mensagem(f"❌ Evento inválido (use {', '.join(EVENTOS_AUDITORIA)}).")
+    registros = consultar_auditoria(opcoes.aluno, opcoes.turma, opcoes.curso, opcoes.desde, opcoes.ate,
+                                    eventos, opcoes.limite)
+    linhas = (astuple(e) for e in registros)
+    if opcoes.formato != "json":
+        linhas = (l[:-1] + (json.dumps(l[-1], ensure_ascii=False) if l[-1] else None,) for l in linhas)
+    return _imprimir_registros(CAMPOS_AUDITORIA, linhas, opcoes.formato)
+
+def _comando_lote(opcoes) -> int:
+    """
+    Um comando por linha da entrada padrão (mesma sintaxe da linha de comando;
+    linhas vazias e começadas por # são ignoradas), todos no mesmo processo e
+    na mesma conexão: milhares de operações custam uma partida só.
+    """
+    import shlex
+    parser = montar_parser()
+    total = erros = 0
+    try:
+        for numero, linha in enumerate(sys.stdin, start=1):
+            linha = linha.strip()
+            if not linha or linha.startswith("#"):
+                continue
+            total += 1
+            try:
+                sub = parser.parse_args(shlex.split(linha))
+                if sub.comando in (None, "lote", "servidor") or sub.banco or sub.usuario:
+                    raise ValueError("comando não permitido dentro do lote")
+                codigo = sub.executar(sub)
+            except SystemExit as e:          # erro de sintaxe: o argparse já explicou no stderr
+                codigo = e.code if isinstance(e.code, int) else 2
+            except (ValueError, OSError, sqlite3.Error) as e:
+                codigo = _mensagem(f"❌ linha {numero}: {e}")
+            except Exception as e:           # defeito num comando não derruba os seguintes
+                codigo = _mensagem(f"❌ linha {numero}: erro inesperado ({type(e).__name__}: {e})")
+            if codigo:
+                erros += 1
+                if opcoes.parar_no_erro:
+                    break
+    finally:    # também no Ctrl+C: quem chamou sabe até onde o lote foi
+        print(f"✔ {total} comando(s), {erros} com erro.", file=sys.stderr)
+    return 1 if erros else 0
+
+def montar_parser():
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="sistema_academico.py",
+        description="Sistema Acadêmico. Sem comando, abre o menu interativo. Código de saída 1 quando a operação "
+                    "é recusada (mensagens ⚠ e ❌).")
+    parser.add_argument("--banco", help=f"arquivo SQLite (padrão: {DB_NAME})")
+    parser.add_argument("--usuario", help="usuário gravado na auditoria (padrão: usuário do sistema)")
+    sub = parser.add_subparsers(dest="comando", metavar="COMANDO")
+
+    def comando(nome: str, ajuda: str, executar, *argumentos, **opcoes):
+        p = sub.add_parser(nome, help=ajuda)
+        for arg in argumentos:
+            p.add_argument(arg)
+        for opcao, kwargs in opcoes.items():
+            p.add_argument("--" + opcao.replace("_", "-"), **kwargs)
+        p.set_defaults(executar=executar)
+        return p
+
+    saida = {"choices": FORMATOS_SAIDA, "default": "texto"}
+    comando("matricular", "matricula o aluno na turma",
+            lambda o: _mensagem(matricular(o.aluno, o.turma)), "aluno", "turma")
+    comando("cancelar", "cancela a matrícula (sem nota) e chama o próximo da fila",
+            lambda o: _mensagem(cancelar_matricula(o.aluno, o.turma)), "aluno", "turma")
+    comando("espera", "entra na lista de espera da turma (matricula direto se houver vaga)",
+            lambda o: _mensagem(entrar_lista_espera(o.aluno, o.turma)), "aluno", "turma")
+    comando("nota", "registra a nota",
+            lambda o: _mensagem(registrar_nota(o.aluno, o.turma, o.valor)), "aluno", "turma").add_argument(
+        "valor", type=float)
+    comando("frequencia", "registra a frequência",
+            lambda o: _mensagem(registrar_frequencia(o.aluno, o.turma, o.valor)), "aluno", "turma").add_argument(
+        "valor", type=float)
+    comando("criar-curso", "cadastra um curso",
+            lambda o: _mensagem(criar_curso(o.codigo, o.nome, [p.strip() for p in o.prerequisitos.split(",") if p.strip()])),
+            "codigo", "nome", prerequisitos={"default": "", "help": "códigos separados por vírgula"})
+    comando("criar-turma", "cadastra uma turma",
+            lambda o: _mensagem(criar_turma(o.codigo, o.curso, o.professor, o.horario, o.limite, o.periodo)),
+            "codigo", "curso", "professor", "horario", periodo={"help": "período letivo, ex: 2025.1"}).add_argument(
+        "limite", type=int)
+    comando("criar-aluno", "cadastra um aluno",
+            lambda o: _mensagem(criar_aluno(o.matricula, o.nome)), "matricula", "nome")
+    comando("historico", "histórico do aluno (curso, nota, frequência)",
+            lambda o: _imprimir_registros(("curso", "nota", "frequencia"),
+                                          relatorio_historico(o.aluno, o.arquivo), o.formato),
+            "aluno", arquivo={"action": "store_true", "help": "inclui períodos arquivados"}, formato=saida)
+    comando("cr", "coeficiente de rendimento do aluno", _comando_cr, "aluno")
+    comando("buscar", "busca aluno, curso ou professor pelo nome",
+            lambda o: _imprimir_registros(("tipo", "chave", "texto", "relevancia"),
+                                          (astuple(r) for r in buscar(o.texto, o.tipo.split(","), o.limite, o.prefixo)),
+                                          o.formato),
+            "texto", tipo={"default": ",".join(TIPOS_BUSCA)}, limite={"type": int, "default": LIMITE_BUSCA},
+            prefixo={"action": "store_true", "help": "última palavra incompleta (autocompletar)"}, formato=saida)
+    comando("listar", "lista cursos, turmas ou alunos", _comando_listar, prefixo={"help": "início do nome"},
+            curso={}, professor={}, formato=saida).add_argument("entidade", choices=("cursos", "turmas", "alunos"))
+    comando("importar-notas", "importa notas/frequências de CSV", _comando_importar_notas, "arquivo").add_argument(
+        "rejeitadas", nargs="?")
+    comando("snapshot", "exporta/atualiza o snapshot colunar",
+            lambda o: _mensagem(exportar_snapshot(o.pasta))).add_argument("pasta", nargs="?")
+    comando("replica", "cria a réplica ou aplica o log pendente", _comando_replica, "arquivo",
+            log={"help": "aplica um arquivo de exportar-log em vez de ler o banco principal"})
+    comando("exportar-log", "grava o log de alterações em JSON Lines (para réplicas em outra máquina)",
+            lambda o: _mensagem(f"✔ {exportar_log(o.arquivo, o.desde)} entrada(s) exportada(s) para {o.arquivo}."),
+            "arquivo", desde={"type": int, "default": 0, "help": "posição da réplica de destino"})
+    comando("log-alteracoes", "liga/desliga o log usado pelas réplicas",
+            lambda o: _mensagem(definir_log_alteracoes(o.estado == "ligar"))).add_argument(
+        "estado", choices=("ligar", "desligar"))
+    comando("arquivar-periodo", "move as matrículas do período para o arquivo",
+            lambda o: _mensagem(arquivar_periodo(o.periodo)), "periodo")
+    p = comando("boletins", "boletins de todos os alunos, em paralelo",
+                lambda o: _mensagem(str(gerar_boletins(o.pasta, o.formato, o.processos,
+                                                       incluir_arquivo=not o.sem_arquivo))),
+                "pasta", sem_arquivo={"action": "store_true", "help": "omite os períodos arquivados"})
+    p.add_argument("formato", nargs="?", choices=tuple(FORMATOS_BOLETIM), default="texto")
+    p.add_argument("processos", nargs="?", type=int)
+    comando("auditoria", "eventos de alteração (matrículas, notas, frequências, edições e exclusões)",
+            _comando_auditoria, aluno={}, turma={}, curso={}, desde={"help": "AAAA-MM-DD[THH:MM], UTC"},
+            ate={"help": "AAAA-MM-DD[THH:MM], UTC, exclusivo"},
+            eventos={"help": "separados por vírgula: " + ",".join(EVENTOS_AUDITORIA)},
+            limite={"type": int, "default": LIMITE_CONSULTA_AUDITORIA}, formato=saida)
+    comando("servidor", "HTTP/JSON em 127.0.0.1",
+            lambda o: executar_servidor_http(porta=o.porta) or 0).add_argument("porta", nargs="?", type=int, default=8080)
+    comando("lote", "lê um comando por linha da entrada padrão", _comando_lote,
+            parar_no_erro={"action": "store_true", "help": "para no primeiro comando recusado"})
+    return parser
+
+def executar_comando(args: List[str]) -> int:
+    """Executa a linha de comando (sem comando: menu interativo); retorna o código de saída."""
+    global DB_NAME
+    opcoes = montar_parser().parse_args(args)
+    if opcoes.banco:
+        DB_NAME = opcoes.banco
+    if opcoes.usuario:
+        definir_usuario(opcoes.usuario)
+    # com o schema em dia, só lê PRAGMA user_version
+    inicializar()
+    if opcoes.comando is None:
+        print("Sistema carregado! Execute o menu para iniciar.")
+        menu()
+        return 0
+    return opcoes.executar(opcoes)
+
 # ============================
 # Entrypoint
 # ============================
 if __name__ == "__main__":
-    inicializar()
-    print("Sistema carregado! Execute o menu para iniciar.")
-    menu()
+    try:
+        sys.exit(executar_comando(sys.argv[1:]))
+    finally:
+        fechar_conexoes()
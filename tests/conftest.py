@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sistema_academico as sa  # noqa: E402
+
+
+@pytest.fixture
+def banco(tmp_path):
+    """Banco novo e migrado em tmp_path; devolve o caminho."""
+    sa.fechar_conexoes()
+    anterior = sa.DB_NAME
+    sa.DB_NAME = str(tmp_path / "teste.db")
+    sa.inicializar()
+    sa.limpar_caches()
+    yield sa.DB_NAME
+    sa.fechar_conexoes()
+    sa.DB_NAME = anterior
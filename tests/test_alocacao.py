@@ -0,0 +1,46 @@
+import pytest
+
+import sistema_academico as sa
+
+
+@pytest.fixture
+def rodada(banco):
+    """A (CR 9) e B (CR 7) aprovados em C0; C sem aprovação; D já matriculado em T9 (seg-8-10)."""
+    sa.criar_curso("C0", "Introdução", [])
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_curso("C2", "Física", [])
+    sa.criar_curso("C3", "Cálculo II", ["C0"])
+    sa.criar_curso("C9", "Seminário", [])
+    sa.criar_turma("T0", "C0", "Prof", "sex-8-10", 10)
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 1)
+    sa.criar_turma("T2", "C2", "Prof", "ter-8-10", 1)
+    sa.criar_turma("T3", "C3", "Prof", "qua-8-10", 1)
+    sa.criar_turma("T9", "C9", "Prof", "seg-8-10", 10)
+    for m, nota in (("A", 9.0), ("B", 7.0)):
+        sa.criar_aluno(m, f"Aluno {m}")
+        sa.matricular(m, "T0")
+        sa.registrar_nota(m, "T0", nota)
+    sa.criar_aluno("C", "Aluno C")
+    sa.criar_aluno("D", "Aluno D")
+    assert sa.matricular("D", "T9").startswith("✅")
+    return banco
+
+
+def test_escolha_serial_nao_e_emparelhamento_maximo(rodada):
+    # o ótimo atende os dois (A em T2, B em T1); por CR, A fica com a 1ª opção e B sem vaga
+    resultado = sa.alocar_turmas({"B": ["T1"], "A": ["T1", "T2"]}, max_por_aluno=1, efetivar=False)
+    assert resultado.atribuicoes == [("A", "T1")]
+    assert resultado.por_opcao == {1: 1}
+    assert (resultado.sem_vaga, resultado.recusadas) == (1, 0)
+    assert sa.turma_por_codigo("T1").vagas_ocupadas == 0
+
+
+def test_turma_cheia_barrada_por_outra_regra_nao_conta_como_sem_vaga(rodada):
+    resultado = sa.alocar_turmas({"A": ["T3", "T1"], "B": ["T3", "T1"], "C": ["T3"], "D": ["T1"]})
+    assert resultado.atribuicoes == [("A", "T3"), ("B", "T1")]
+    # sem vaga: B em T3 e A em T1 (rodada 2); barradas, já cheias: C sem pré-requisito
+    # de T3 e D em conflito de T1 com T9
+    assert (resultado.sem_vaga, resultado.recusadas) == (2, 2)
+    assert resultado.efetivadas == 2 and not resultado.falhas
+    assert [c for c, _, _ in sa.relatorio_historico("A")] == ["C0", "C3"]
+    assert [c for c, _, _ in sa.relatorio_historico("B")] == ["C0", "C1"]
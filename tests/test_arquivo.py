@@ -0,0 +1,56 @@
+import pytest
+
+import sistema_academico as sa
+
+
+@pytest.fixture
+def periodos(banco):
+    """T0 (2024.2) com A1 e A2 avaliados; T1 (2025.1) com A1 ainda sem nota."""
+    sa.criar_curso("C0", "Introdução", [])
+    sa.criar_curso("C1", "Cálculo", ["C0"])
+    sa.criar_turma("T0", "C0", "Prof", "seg-8-10", 10, "2024.2")
+    sa.criar_turma("T1", "C1", "Prof", "ter-8-10", 10, "2025.1")
+    for m, nota in (("A1", 8.0), ("A2", 4.0)):
+        sa.criar_aluno(m, f"Aluno {m}")
+        sa.matricular(m, "T0")
+        sa.registrar_nota(m, "T0", nota)
+    sa.criar_aluno("A3", "Aluno A3")
+    assert sa.matricular("A1", "T1").startswith("✅")
+    return banco
+
+
+def _contagens():
+    con = sa.obter_conexao()
+    return con.execute("""
+        SELECT t.codigo, t.vagas_ocupadas,
+               (SELECT COUNT(*) FROM matriculas m WHERE m.turma_codigo = t.codigo),
+               (SELECT COUNT(*) FROM matriculas_arquivo a WHERE a.turma_codigo = t.codigo)
+        FROM turmas t ORDER BY t.codigo
+    """).fetchall()
+
+
+def test_arquivar_move_as_linhas_e_mantem_vagas_e_aprovacoes(periodos):
+    assert sa.arquivar_periodo("2025.1").startswith("❌ 1 matrícula(s) do período 2025.1 sem nota")
+    assert sa.arquivar_periodo("2023.1") == "❌ Nenhuma turma no período 2023.1."
+    cr = sa.calcular_cr("A1")
+
+    assert sa.arquivar_periodo("2024.2", linhas_por_lote=1) == "✔ Período 2024.2 arquivado: 2 matrícula(s) de 1 turma(s)."
+    # vagas da turma arquivada continuam ocupadas: correntes + arquivadas
+    assert _contagens() == [("T0", 2, 0, 2), ("T1", 1, 1, 0)]
+    assert sa.obter_conexao().execute(
+        "SELECT aluno_matricula, curso_codigo, periodo, nota FROM matriculas_arquivo ORDER BY id").fetchall() == [
+        ("A1", "C0", "2024.2", 8.0), ("A2", "C0", "2024.2", 4.0)]
+    assert sa.relatorio_historico("A1") == [("C1", None, None)]
+    assert sa.relatorio_historico("A1", incluir_arquivo=True) == [("C1", None, None), ("C0", 8.0, None)]
+    assert sa.calcular_cr("A1") == cr and sa.cursos_aprovados("A1") == {"C0"}
+    assert sa.verificar_desempenho() == []
+    assert sa.matricular("A2", "T1") == "❌ Aluno não possui os pré-requisitos."
+    assert sa.arquivar_periodo("2024.2") == "✔ Período 2024.2 arquivado: 0 matrícula(s) de 1 turma(s)."
+
+
+def test_excluir_aluno_com_historico_arquivado(periodos):
+    sa.arquivar_periodo("2024.2")
+    assert sa.excluir_aluno("A2") == "❌ Não é possível excluir: o aluno possui histórico em períodos arquivados."
+    assert sa.aluno_por_matricula("A2") is not None
+    assert sa.excluir_aluno("A1") == "❌ Não é possível excluir: o aluno possui matrículas."
+    assert sa.excluir_aluno("A3") == "✔ Aluno excluído."
@@ -0,0 +1,57 @@
+import sqlite3
+
+import sistema_academico as sa
+
+
+def _turma(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 10)
+    sa.criar_aluno("A1", "Ana")
+    assert sa.matricular("A1", "T1").startswith("✅")
+
+
+def _indexado_ate(banco):
+    with sqlite3.connect(banco) as con:
+        return con.execute("SELECT max(indexado_ate) FROM auditoria_particoes").fetchone()[0]
+
+
+def test_consulta_indexa_eventos_de_varios_processos(banco, monkeypatch):
+    _turma(banco)
+    monkeypatch.setattr(sa, "LOTE_INDICE_AUDITORIA", 5)
+    for i in range(6):
+        sa.fechar_conexoes()              # cada comando da linha de comando é um processo novo
+        sa._PARTICOES_AUDITORIA.clear()
+        assert sa.registrar_nota("A1", "T1", float(i)).startswith("✔")
+    assert _indexado_ate(banco) == 0      # escritas só acrescentam eventos
+    eventos = sa.consultar_auditoria(aluno="A1", eventos=["nota"])
+    assert [e.dados["nota"][1] for e in eventos] == [float(i) for i in range(6)]
+    assert _indexado_ate(banco) >= 7      # matrícula + 6 notas já no índice
+    assert len(sa.consultar_auditoria(aluno="A1", eventos=["nota"])) == 6
+
+
+def test_editar_audita_valor_do_banco_com_cache_vencido(banco):
+    _turma(banco)
+    assert sa.aluno_por_matricula("A1").nome == "Ana"     # aluno no cache
+    with sqlite3.connect(banco) as con:               # outro processo renomeia
+        con.execute("UPDATE alunos SET nome='Ana Maria' WHERE matricula='A1'")
+    assert sa.editar_aluno("A1", "Ana Souza").startswith("✔")
+    evento, = sa.consultar_auditoria(aluno="A1", eventos=["aluno_editado"])
+    assert evento.dados == {"nome": ["Ana Maria", "Ana Souza"]}
+
+
+def test_indice_feito_entre_leitura_e_consulta_nao_duplica(banco, monkeypatch):
+    _turma(banco)
+    for i in range(3):
+        assert sa.registrar_nota("A1", "T1", float(i)).startswith("✔")
+    original = sa._indexar_cauda_auditoria
+
+    def outro_processo_indexa(con, mes, indexado_ate):
+        indexado_ate = original(con, mes, indexado_ate)     # fim ainda pequeno: nada indexado
+        with sa.transacao(imediata=True) as escrita:
+            sa._indexar_particao_auditoria(escrita, mes)
+        return indexado_ate
+
+    monkeypatch.setattr(sa, "_indexar_cauda_auditoria", outro_processo_indexa)
+    eventos = sa.consultar_auditoria(aluno="A1")
+    assert [e.evento for e in eventos] == ["matricula", "nota", "nota", "nota"]
+    assert _indexado_ate(banco) > 0
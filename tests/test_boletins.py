@@ -0,0 +1,73 @@
+import os
+
+import sistema_academico as sa
+
+
+def _alunos(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 10)
+    for m in ("A1", "A2", "A3", "A4"):
+        sa.criar_aluno(m, f"Aluno {m}")
+        assert sa.matricular(m, "T1").startswith("✅")
+
+
+def test_texto_sem_nota_mostra_traco(banco, tmp_path):
+    _alunos(banco)
+    resultado = sa.gerar_boletins(str(tmp_path / "bol"), "texto", processos=1, faixas=1)
+    with open(resultado.arquivos[0], encoding="utf-8") as arq:
+        texto = arq.read()
+    assert "None" not in texto
+    assert "Curso: C1 | Turma: T1 | Nota: - | Frequência: -" in texto
+    assert os.listdir(tmp_path / "bol") == ["boletins-0000.txt"]    # cópia do banco apagada
+
+
+def test_faixas_leem_a_mesma_fotografia(banco, tmp_path, monkeypatch):
+    _alunos(banco)
+    original = sa._escrever_boletins
+    chamadas = []
+
+    def escrever(*args):
+        if not chamadas:    # escrita concorrente entre a primeira faixa e as seguintes
+            assert sa.registrar_nota("A4", "T1", 9.0).startswith("✔")
+        chamadas.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(sa, "_escrever_boletins", escrever)
+    resultado = sa.gerar_boletins(str(tmp_path / "bol"), "csv", processos=1, faixas=4)
+    # a escrita caiu entre as faixas: tudo refeito de uma cópia tirada depois dela
+    assert resultado.copia and len(chamadas) == 8 and resultado.alunos == 4
+    assert all(c[0].endswith(".boletins-base.db") for c in chamadas[4:])
+    texto = "".join(open(a, encoding="utf-8").read() for a in resultado.arquivos)
+    assert "A4,Aluno A4,9.0,C1,T1,9.0,\n" in texto.replace("\r\n", "\n")
+    assert sorted(os.listdir(tmp_path / "bol")) == [f"boletins-{i:04d}.csv" for i in range(4)]
+
+
+def test_sem_escrita_le_o_banco_direto(banco, tmp_path, monkeypatch):
+    _alunos(banco)
+    monkeypatch.setattr(sa, "_copiar_base_boletins", None)     # não pode ser chamada
+    resultado = sa.gerar_boletins(str(tmp_path / "bol"), "json", processos=1, faixas=2)
+    assert not resultado.copia and resultado.alunos == 4
+
+
+def _periodo_arquivado(banco):
+    sa.criar_curso("C0", "Introdução", [])
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T0", "C0", "Prof", "seg-8-10", 10, "2024.2")
+    sa.criar_turma("T1", "C1", "Prof", "ter-8-10", 10, "2025.1")
+    sa.criar_aluno("A1", "Ana")
+    for turma, nota in (("T0", 8.0), ("T1", 6.0)):
+        assert sa.matricular("A1", turma).startswith("✅")
+        assert sa.registrar_nota("A1", turma, nota).startswith("✔")
+    assert sa.arquivar_periodo("2024.2").startswith("✔")
+
+
+def test_boletim_inclui_periodos_arquivados(banco, tmp_path):
+    _periodo_arquivado(banco)
+    resultado = sa.gerar_boletins(str(tmp_path / "bol"), "texto", processos=1, faixas=1)
+    with open(resultado.arquivos[0], encoding="utf-8") as arq:
+        texto = arq.read()
+    assert resultado.linhas == 2
+    assert texto.index("Turma: T0 | Nota: 8.0") < texto.index("Turma: T1 | Nota: 6.0")
+
+    resultado = sa.gerar_boletins(str(tmp_path / "bol"), "json", processos=1, incluir_arquivo=False)
+    assert resultado.linhas == 1
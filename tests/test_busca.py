@@ -0,0 +1,13 @@
+import sistema_academico as sa
+
+
+def test_nome_curto_aparece_mesmo_depois_de_muitos_nomes_longos(banco):
+    with sa.transacao() as con:
+        con.executemany("INSERT INTO alunos (matricula, nome) VALUES (?, ?)",
+                        [(f"A{i:04d}", "Ana Maria Silva Costa Pereira") for i in range(250)])
+    sa.criar_aluno("B0001", "Silva")
+    sa.criar_aluno("B0002", "Silva Santos")
+
+    chaves = [r.chave for r in sa.buscar("Silva", tipos=("aluno",), limite=3)]
+    assert chaves[:2] == ["B0001", "B0002"]
+    assert [r.chave for r in sa.autocompletar("sil", tipos=("aluno",), limite=1)] == ["B0001"]
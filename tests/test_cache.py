@@ -0,0 +1,31 @@
+import threading
+
+import pytest
+
+import sistema_academico as sa
+
+
+def test_rollback_da_transacao_externa_descarta_o_que_foi_lido_dentro_dela(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 30)
+    assert sa.turma_por_codigo("T1").horario == "seg-8-10"
+    with pytest.raises(RuntimeError):
+        with sa.transacao(imediata=True):
+            assert sa.editar_turma("T1", None, "ter-8-10", None).startswith("✔")
+            assert sa.turma_por_codigo("T1").horario == "ter-8-10"
+            raise RuntimeError("desfaz")
+    assert sa.turma_por_codigo("T1").horario == "seg-8-10"
+
+
+def test_leitura_de_outra_thread_antes_do_commit_nao_fica_no_cache(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 30)
+    with sa.transacao(imediata=True):
+        sa.editar_turma("T1", None, "ter-8-10", None)
+        # outra thread ainda enxerga o valor confirmado e o guarda no cache
+        vista = []
+        leitor = threading.Thread(target=lambda: vista.append(sa.turma_por_codigo("T1").horario))
+        leitor.start()
+        leitor.join()
+        assert vista == ["seg-8-10"]
+    assert sa.turma_por_codigo("T1").horario == "ter-8-10"
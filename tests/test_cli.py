@@ -0,0 +1,39 @@
+import io
+
+import pytest
+
+import sistema_academico as sa
+
+
+@pytest.fixture
+def turma(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 10)
+    sa.criar_aluno("A1", "Ana")
+    return banco
+
+
+def test_recusa_sai_com_codigo_1(turma, capsys):
+    assert sa.executar_comando(["matricular", "A1", "T1"]) == 0
+    assert sa.executar_comando(["matricular", "A1", "T1"]) == 1
+    assert capsys.readouterr().out.splitlines()[-1] == "⚠ Aluno já está matriculado nesta turma."
+
+
+def test_lote_segue_apos_excecao_inesperada(turma, capsys, monkeypatch):
+    def quebrado(matricula):
+        raise RuntimeError("defeito")
+
+    monkeypatch.setattr(sa, "calcular_cr", quebrado)
+    monkeypatch.setattr("sys.stdin", io.StringIO("cr A1\nmatricular A1 T1\n"))
+    assert sa.executar_comando(["lote"]) == 1
+    saida = capsys.readouterr()
+    assert "❌ linha 1: erro inesperado (RuntimeError: defeito)" in saida.out
+    assert "✅" in saida.out
+    assert saida.err.strip() == "✔ 2 comando(s), 1 com erro."
+
+
+def test_motor_numpy_carrega_o_modulo(turma, monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr(sa, "np", None)
+    monkeypatch.setattr(sa, "_NUMPY_CARREGADO", False)
+    assert sa.analise_coorte(False, "numpy")["motor"] == "numpy"
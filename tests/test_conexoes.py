@@ -0,0 +1,40 @@
+import sqlite3
+import threading
+
+import pytest
+
+import sistema_academico as sa
+
+
+def test_mesma_conexao_na_thread_e_outra_em_cada_thread(banco):
+    con = sa.obter_conexao()
+    assert sa.obter_conexao() is con
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_aluno("A1", "Ana")
+    assert sa.obter_conexao() is con
+    assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert con.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+    outras = []
+    thread = threading.Thread(target=lambda: outras.extend([sa.obter_conexao(), sa.obter_conexao()]))
+    thread.start()
+    thread.join()
+    assert outras[0] is outras[1] and outras[0] is not con
+
+
+def test_fechar_conexoes_fecha_e_a_proxima_chamada_reabre(banco):
+    con = sa.obter_conexao()
+    sa.fechar_conexoes()
+    with pytest.raises(sqlite3.ProgrammingError):
+        con.execute("SELECT 1")
+    nova = sa.obter_conexao()
+    assert nova is not con
+    sa.criar_aluno("A1", "Ana")
+    assert sa.aluno_por_matricula("A1").nome == "Ana"
+
+
+def test_reabrir_nao_troca_a_conexao_no_meio_da_transacao(banco):
+    with sa.transacao(imediata=True) as con:
+        sa.GERENCIADOR.reabrir()
+        assert sa.obter_conexao() is con
+    assert sa.obter_conexao() is not con
@@ -0,0 +1,72 @@
+import pytest
+
+import sistema_academico as sa
+
+
+@pytest.fixture
+def arquivado(banco):
+    sa.criar_curso("C0", "Introdução", [])
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T0", "C0", "Prof", "seg-8-10", 10, "2024.2")
+    sa.criar_turma("T1", "C1", "Prof", "ter-8-10", 10, "2025.1")
+    for m, nota in (("A1", 8.0), ("A2", 4.0)):
+        sa.criar_aluno(m, f"Aluno {m}")
+        for turma in ("T0", "T1"):
+            sa.matricular(m, turma)
+            sa.registrar_nota(m, turma, nota)
+    sa.registrar_frequencia("A2", "T0", 50.0)
+    assert sa.arquivar_periodo("2024.2").startswith("✔")
+    return banco
+
+
+@pytest.mark.parametrize("motor", [None, "sqlite"])     # None: NumPy, se instalado
+def test_analise_com_periodos_arquivados(arquivado, motor):
+    correntes = sa.analise_coorte(False, motor)
+    assert list(correntes["por_turma"]) == ["T1"] and not correntes["risco_frequencia"]
+
+    todas = sa.analise_coorte(False, motor, incluir_arquivo=True)
+    assert list(todas["por_turma"]) == ["T0", "T1"]
+    assert todas["por_turma"]["T0"]["curso"] == "C0"
+    assert todas["por_curso"]["C0"]["aprovados"] == 1 and todas["por_curso"]["C0"]["avaliados"] == 2
+    assert todas["risco_frequencia"] == [["A2", "T0", 50.0]]
+
+
+def test_motores_concordam_com_arquivo(arquivado):
+    if sa.carregar_numpy() is None:
+        pytest.skip("NumPy não instalado")
+    numpy, sqlite = (sa.analise_coorte(False, m, incluir_arquivo=True) for m in ("numpy", "sqlite"))
+    assert {**numpy, "motor": ""} == {**sqlite, "motor": ""}
+
+
+def test_cache_separado_com_arquivo(arquivado):
+    sa.analise_coorte()
+    assert "T0" in sa.analise_coorte(incluir_arquivo=True)["por_turma"]
+    assert "T0" not in sa.analise_coorte()["por_turma"]
+
+
+def test_motores_concordam_com_turmas_fora_de_ordem(banco):
+    if sa.carregar_numpy() is None:
+        pytest.skip("NumPy não instalado")
+    sa.criar_curso("C1", "Cálculo", [])
+    for i, turma in enumerate(("T9", "T2", "T5")):
+        sa.criar_turma(turma, "C1", "Prof", f"seg-{8 + 2 * i}-{10 + 2 * i}", 10)
+    for a in range(6):
+        sa.criar_aluno(f"A{a}", f"Aluno {a}")
+        for turma in ("T9", "T2", "T5")[a % 3:]:
+            sa.matricular(f"A{a}", turma)
+            if a % 2:
+                sa.registrar_nota(f"A{a}", turma, float(a + len(turma)))
+    numpy = sa.analise_coorte(False, "numpy")
+    assert sa.analise_coorte(False, "numpy") == numpy       # tabela temporária desfeita
+    assert list(numpy["por_turma"]) == ["T2", "T5", "T9"]
+    assert {**numpy, "motor": ""} == {**sa.analise_coorte(False, "sqlite"), "motor": ""}
+
+
+def test_cache_confere_cada_versao_e_nao_a_soma(arquivado):
+    assert sa.analise_coorte()["por_turma"]["T1"]["aprovados"] == 1
+    # outro banco no mesmo caminho (cópia restaurada) com a mesma soma de versões
+    with sa.transacao(imediata=True) as con:
+        con.execute("UPDATE matriculas SET nota = 9 WHERE aluno_matricula = 'A2'")
+        con.execute("UPDATE versao_tabelas SET versao = versao + 1 WHERE tabela = 'matriculas'")
+        con.execute("UPDATE versao_tabelas SET versao = versao - 1 WHERE tabela = 'turmas'")
+    assert sa.analise_coorte()["por_turma"]["T1"]["aprovados"] == 2
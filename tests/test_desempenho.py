@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+import sistema_academico as sa
+
+
+@pytest.fixture
+def cadeia(banco):
+    """C0 -> C1 -> C2 (pré-requisitos em cadeia) e C9 sem pré-requisito; A1 e A2 em T0 e T9."""
+    sa.criar_curso("C0", "Introdução", [])
+    sa.criar_curso("C1", "Cálculo I", ["C0"])
+    sa.criar_curso("C2", "Cálculo II", ["C1"])
+    sa.criar_curso("C9", "Seminário", [])
+    sa.criar_turma("T0", "C0", "Prof", "seg-8-10", 10)
+    sa.criar_turma("T1", "C1", "Prof", "ter-8-10", 10)
+    sa.criar_turma("T2", "C2", "Prof", "qua-8-10", 10)
+    sa.criar_turma("T9", "C9", "Prof", "qui-8-10", 10)
+    for m in ("A1", "A2"):
+        sa.criar_aluno(m, f"Aluno {m}")
+        sa.matricular(m, "T0")
+        sa.matricular(m, "T9")
+    return banco
+
+
+def test_cr_e_aprovacoes_acompanham_cada_nota(cadeia):
+    assert sa.calcular_cr("A1") is None
+    sa.registrar_nota("A1", "T0", 5.0)
+    sa.registrar_nota("A1", "T9", 9.0)
+    assert sa.calcular_cr("A1") == 7.0 and sa.cursos_aprovados("A1") == {"C9"}
+    sa.registrar_nota("A1", "T0", 7.0)          # cruza a média: passa a aprovado
+    sa.registrar_nota("A1", "T9", 4.0)          # e aqui deixa de ser
+    sa.registrar_nota("A2", "T0", 10.0)
+    assert sa.calcular_cr("A1") == 5.5 and sa.cursos_aprovados("A1") == {"C0"}
+    assert sa.ranking_cr(1) == [("A2", 10.0)]
+    assert sa.alunos_por_faixa_cr(5.0, 6.0) == [("A1", 5.5)]
+    assert sa.verificar_desempenho() == []
+
+
+def test_verificar_aponta_divergencia_e_reconstruir_corrige(cadeia):
+    sa.registrar_nota("A1", "T0", 8.0)
+    with sqlite3.connect(cadeia) as con:
+        con.execute("UPDATE desempenho_alunos SET soma_notas = 3, cr = 3 WHERE aluno_matricula = 'A1'")
+        con.execute("DELETE FROM aprovacoes")
+    problemas = sa.verificar_desempenho()
+    assert len(problemas) == 2 and all(p.startswith("A1:") for p in problemas)
+    assert sa.reconstruir_desempenho().startswith("✔")
+    assert sa.verificar_desempenho() == []
+    assert sa.calcular_cr("A1") == 8.0 and sa.cursos_aprovados("A1") == {"C0"}
+
+
+def test_elegibilidade_segue_a_cadeia_de_prerequisitos(cadeia):
+    sa.registrar_nota("A1", "T0", 4.0)
+    assert sa.cursos_elegiveis("A1") == ["C0", "C9"]
+    assert sa.matricular("A1", "T1") == "❌ Aluno não possui os pré-requisitos."
+
+    sa.registrar_nota("A1", "T0", 6.0)
+    sa.registrar_nota("A1", "T9", 8.0)
+    assert sa.cursos_elegiveis("A1") == ["C1"]          # C2 ainda depende de C1
+    assert sa.matricular("A1", "T1").startswith("✅")
+    assert sa.matricular("A1", "T2") == "❌ Aluno não possui os pré-requisitos."
+
+    geral = sa.elegibilidade_geral()
+    assert geral.cursos_do_aluno("A1") == ["C1"]
+    assert dict(geral.por_aluno()) == {m: sa.cursos_elegiveis(m) for m in ("A1", "A2")}
+    assert geral.alunos_do_curso("C0") == ["A2"]
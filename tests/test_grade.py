@@ -0,0 +1,25 @@
+import pytest
+
+import sistema_academico as sa
+
+
+def _turmas_do_mesmo_professor(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T1", "C1", "Prof", "ter-8-10", 30)
+    sa.criar_turma("T2", "C1", "Prof", "seg-8-10", 30)
+
+
+def test_turma_sem_horario_reserva_o_horario_mantido(banco):
+    _turmas_do_mesmo_professor(banco)
+    resultado = sa.gerar_grade(disponibilidade={"Prof": ["seg-8-10"]}, tempo_limite=0.1, aplicar=True)
+    horarios = dict(sa.obter_conexao().execute("SELECT codigo, horario FROM turmas"))
+    assert horarios["T1"] != horarios["T2"], (resultado, horarios)
+
+
+def test_aplicar_grade_desfaz_tudo_se_uma_turma_falha(banco):
+    _turmas_do_mesmo_professor(banco)
+    simulacao = sa.ResultadoGrade(horarios={"T1": "qua-8-10", "T9": "qui-8-10"})
+    with pytest.raises(ValueError, match="T9"):
+        sa.aplicar_grade(simulacao)
+    assert sa.turma_por_codigo("T1").horario == "ter-8-10"
+    assert simulacao.aplicadas == 0
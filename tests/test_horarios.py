@@ -0,0 +1,35 @@
+import pytest
+
+import sistema_academico as sa
+
+
+@pytest.mark.parametrize("horario", ["seg-0-10000000000", "seg-10000000000-10000000001", "seg--1-2", "seg-8-25"])
+def test_hora_fora_do_dia_e_formato_invalido(horario):
+    with pytest.raises(ValueError, match="Formato de horário inválido"):
+        sa.parse_horario(horario)
+    assert sa.colunas_horario(horario) == (None, None, None)
+    assert sa.faixa_horario(horario) is None
+    assert sa.horarios_conflitam(horario, "ter-8-10")
+
+
+def test_turma_com_hora_enorme_conflita_com_tudo(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_curso("C2", "Física", [])
+    sa.criar_turma("T1", "C1", "Prof", "seg-0-10000000000", 10)
+    sa.criar_turma("T2", "C2", "Prof", "ter-0-24", 10)
+    sa.criar_aluno("A1", "Ana")
+    assert sa.obter_conexao().execute("SELECT dia, hora_ini, hora_fim FROM turmas WHERE codigo = 'T1'").fetchone() \
+        == (None, None, None)
+    assert sa.matricular("A1", "T1").startswith("✅")
+    assert sa.matricular("A1", "T2").startswith("❌ Conflito de horário")
+    assert sa.turmas_compativeis("A1") == []
+
+
+def test_migracao_limpa_colunas_fora_do_dia(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 10)
+    con = sa.obter_conexao()
+    con.execute("UPDATE turmas SET horario = 'seg-0-99999', hora_fim = 99999 WHERE codigo = 'T1'")
+    con.commit()
+    sa._migracao_16_horas_no_dia(con)
+    assert con.execute("SELECT dia, hora_ini, hora_fim FROM turmas").fetchone() == (None, None, None)
@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+import pytest
+
+import sistema_academico as sa
+
+
+async def _requisicao(porta: int, bruto: bytes):
+    reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+    writer.write(bruto)
+    await writer.drain()
+    cabecalho = await reader.readuntil(b"\r\n\r\n")
+    status = int(cabecalho.split(b" ")[1])
+    tamanho = int(cabecalho.lower().split(b"content-length: ")[1].split(b"\r\n")[0])
+    corpo = json.loads(await reader.readexactly(tamanho))
+    writer.close()
+    return status, corpo
+
+
+def _post(caminho: str, dados) -> bytes:
+    corpo = json.dumps(dados).encode()
+    return (f"POST {caminho} HTTP/1.1\r\nContent-Length: {len(corpo)}\r\n\r\n").encode() + corpo
+
+
+@pytest.mark.parametrize("bruto", [
+    _post("/notas", {"aluno": "A1", "turma": "T1", "nota": "dez"}),
+    _post("/notas", {"aluno": "A1", "turma": "T1", "nota": [7]}),
+    _post("/notas", {"aluno": "A1", "turma": "T1", "nota": True}),
+    _post("/notas", {"aluno": "A1", "turma": "T1", "nota": "nan"}),
+    _post("/frequencias", {"aluno": "A1", "turma": "T1", "frequencia": {"x": 1}}),
+    b"POST /notas HTTP/1.1\r\nContent-Length: -5\r\n\r\n",
+    b"POST /notas HTTP/1.1\r\nContent-Length: muito\r\n\r\n",
+])
+def test_entrada_invalida_responde_400(banco, bruto):
+    async def cenario():
+        servico = sa.ServicoAssincrono()
+        servidor = await sa.iniciar_servidor_http(porta=0, servico=servico)
+        try:
+            return await _requisicao(servidor.sockets[0].getsockname()[1], bruto)
+        finally:
+            servidor.close()
+            await servidor.wait_closed()
+            servico.fechar()
+
+    status, corpo = asyncio.run(cenario())
+    assert status == 400, corpo
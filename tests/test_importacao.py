@@ -0,0 +1,50 @@
+import pytest
+
+import sistema_academico as sa
+
+
+@pytest.fixture
+def turma(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 10)
+    for m in ("A1", "A2", "A3"):
+        sa.criar_aluno(m, f"Aluno {m}")
+        sa.matricular(m, "T1")
+    sa.registrar_nota("A3", "T1", 5.0)
+    return banco
+
+
+def _csv(tmp_path, texto):
+    caminho = tmp_path / "notas.csv"
+    caminho.write_text(texto, encoding="utf-8")
+    return str(caminho)
+
+
+def test_contagens_e_valores_importados(turma, tmp_path):
+    caminho = _csv(tmp_path, "matricula;turma;nota;frequencia\n"
+                             "A1;T1;7,5;90\n"
+                             "A2;T1;;60\n"          # só frequência: nota fica como está
+                             "A3;T1;;\n"            # em branco: pulada
+                             "A9;T1;8;80\n"         # sem matrícula
+                             "A1;T1;abc;80\n"       # inválida
+                             ";T1;8;80\n"           # matrícula em branco
+                             "A2;T1;6;\n")          # mesma matrícula, outro bloco
+    rejeitadas = str(tmp_path / "rejeitadas.txt")
+    resultado = sa.importar_notas_csv(caminho, rejeitadas, tamanho_lote=2)
+    assert (resultado.lidas, resultado.atualizadas, resultado.sem_matricula,
+            resultado.invalidas, resultado.em_branco) == (7, 3, 1, 2, 1)
+    assert str(resultado).endswith("2 inválida(s), 1 em branco.")
+    with open(rejeitadas, encoding="utf-8") as arq:
+        assert [linha.split(" - ")[0] for linha in arq] == ["linha 5: A9;T1", "linha 6: A1;T1", "linha 7: ;T1"]
+    assert sorted(sa.obter_conexao().execute("SELECT aluno_matricula, nota, frequencia FROM matriculas")) == [
+        ("A1", 7.5, 90.0), ("A2", 6.0, 60.0), ("A3", 5.0, None)]
+    assert sa.calcular_cr("A2") == 6.0 and sa.cursos_aprovados("A2") == {"C1"}
+    assert sa.verificar_desempenho() == []
+
+
+def test_arquivo_so_com_linhas_em_branco_nao_grava(turma, tmp_path):
+    caminho = _csv(tmp_path, "matricula,turma,nota,frequencia\nA1,T1,,\nA2,T1, ,\n")
+    versao = sa.versoes_tabelas()["matriculas"]
+    resultado = sa.importar_notas_csv(caminho)
+    assert (resultado.lidas, resultado.atualizadas, resultado.em_branco) == (2, 0, 2)
+    assert sa.versoes_tabelas()["matriculas"] == versao
@@ -0,0 +1,33 @@
+import threading
+
+import sistema_academico as sa
+
+
+def test_ligar_instrumentacao_nao_fecha_conexao_de_outra_thread(banco):
+    em_transacao, ligada, erros = threading.Event(), threading.Event(), []
+
+    def escritor():
+        try:
+            with sa.transacao(imediata=True) as con:
+                con.execute("INSERT INTO alunos (matricula, nome) VALUES ('A1', 'Ana')")
+                em_transacao.set()
+                ligada.wait()
+                # a transação segue na mesma conexão até o commit
+                assert sa.obter_conexao() is con
+                con.execute("INSERT INTO alunos (matricula, nome) VALUES ('A2', 'Bia')")
+            assert isinstance(sa.obter_conexao(), sa.ConexaoInstrumentada)
+        except Exception as e:  # noqa: BLE001 - repassado à thread do teste
+            erros.append(e)
+
+    t = threading.Thread(target=escritor)
+    t.start()
+    em_transacao.wait()
+    try:
+        sa.definir_instrumentacao(True)
+        ligada.set()
+        t.join()
+    finally:
+        sa.definir_instrumentacao(False)
+    assert not erros, erros
+    assert not isinstance(sa.obter_conexao(), sa.ConexaoInstrumentada)
+    assert sa.obter_conexao().execute("SELECT COUNT(*) FROM alunos").fetchone()[0] == 2
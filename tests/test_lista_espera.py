@@ -0,0 +1,32 @@
+import sqlite3
+
+import sistema_academico as sa
+
+
+def _turma_lotada(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 1)
+    for m, nome in (("A1", "Ana"), ("A2", "Bia")):
+        sa.criar_aluno(m, nome)
+    assert sa.matricular("A1", "T1").startswith("✅")
+    assert sa.entrar_lista_espera("A2", "T1") == "✔ Turma sem vagas: aluno entrou na lista de espera."
+
+
+def test_entrar_duas_vezes_na_fila(banco):
+    _turma_lotada(banco)
+    assert sa.entrar_lista_espera("A2", "T1") == "⚠ Aluno já está na lista de espera desta turma."
+
+
+def test_editar_turma_atende_fila_com_vaga_aberta_por_outro_processo(banco):
+    _turma_lotada(banco)
+    assert sa.turma_por_codigo("T1").vagas_ocupadas == 1    # fica no cache
+
+    # outro processo libera a vaga sem passar por cancelar_matricula
+    outro = sqlite3.connect(banco, isolation_level=None)
+    outro.execute("DELETE FROM matriculas WHERE aluno_matricula = 'A1'")
+    outro.execute("UPDATE turmas SET vagas_ocupadas = 0 WHERE codigo = 'T1'")
+    outro.close()
+
+    assert sa.editar_turma("T1", "Outro Prof", None, None).endswith("1 aluno(s) promovido(s) da lista de espera.")
+    assert sa.posicao_lista_espera("A2", "T1") is None
+    assert [c for c, _, _ in sa.relatorio_historico("A2")] == ["C1"]
@@ -0,0 +1,40 @@
+import sistema_academico as sa
+
+
+def test_paginas_por_chave_sem_repetir_nem_pular(banco):
+    for i in range(7):
+        sa.criar_aluno(f"A{i}", f"Aluno {i}")
+    vistos = []
+    for aluno in sa.iterar_alunos(tamanho_pagina=3):
+        vistos.append(aluno.matricula)
+        if aluno.matricula == "A1":
+            # gravações entre páginas: chave depois da última vista aparece, antes não
+            sa.criar_aluno("A00", "Novo antes")
+            sa.criar_aluno("A9", "Novo depois")
+    assert vistos == ["A0", "A1", "A2", "A3", "A4", "A5", "A6", "A9"]
+
+
+def test_filtros_e_prefixo_literal(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_curso("C2", "Física", ["C1"])
+    for i, (curso, prof) in enumerate([("C1", "Ana"), ("C2", "Ana"), ("C1", "Bia"), ("C1", "Ana"), ("C2", "Bia")]):
+        sa.criar_turma(f"T{i}", curso, prof, f"seg-{8 + i}-{9 + i}", 10)
+    for m, nome in (("A1", "50% bolsista"), ("A2", "500 pontos"), ("A3", "Ana_Maria"), ("A4", "AnaXMaria")):
+        sa.criar_aluno(m, nome)
+
+    assert [t.codigo for t in sa.iterar_turmas("C1", "Ana", tamanho_pagina=1)] == ["T0", "T3"]
+    assert [t[0] for t in sa.iterar_turmas(professor="Bia", formato="tuplas")] == ["T2", "T4"]
+    assert [a.matricula for a in sa.iterar_alunos("50%", tamanho_pagina=1)] == ["A1"]
+    assert [a.matricula for a in sa.iterar_alunos("Ana_")] == ["A3"]
+    assert [(c.codigo, c.prerequisitos) for c in sa.iterar_cursos(tamanho_pagina=1)] == [("C1", []), ("C2", ["C1"])]
+    assert [c.codigo for c in sa.iterar_cursos("Fís")] == ["C2"]
+
+
+def test_menu_mostra_uma_tela_por_vez(banco, monkeypatch, capsys):
+    for i in range(5):
+        sa.criar_aluno(f"A{i}", f"Aluno {i}")
+    monkeypatch.setattr(sa, "LINHAS_POR_TELA", 2)
+    respostas = iter(["", "q"])
+    monkeypatch.setattr("builtins.input", lambda _: next(respostas))
+    sa._imprimir_paginado(sa.iterar_alunos(), lambda a: a.matricula, "nenhum")
+    assert capsys.readouterr().out.split() == ["A0", "A1", "A2", "A3"]
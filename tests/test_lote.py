@@ -0,0 +1,53 @@
+import sistema_academico as sa
+
+PEDIDOS = [
+    ("A1", "T1"),       # ok
+    ("A1", "T1"),       # repetido no mesmo lote
+    ("A2", "T1"),       # ok: última vaga
+    ("A3", "T1"),       # sem vaga
+    ("A1", "T2"),       # conflita com T1, pedida antes no lote
+    ("A2", "T3"),       # sem o pré-requisito
+    ("A3", "T0"),       # já aprovado em C0
+    ("A3", "T3"),       # ok
+    ("A9", "T1"),       # aluno inexistente
+    ("A1", "T9"),       # turma inexistente
+]
+
+
+def _cenario():
+    sa.criar_curso("C0", "Introdução", [])
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_curso("C2", "Física", [])
+    sa.criar_curso("C3", "Cálculo II", ["C0"])
+    sa.criar_turma("T0", "C0", "Prof", "sex-8-10", 10)
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 2)
+    sa.criar_turma("T2", "C2", "Prof", "seg-9-11", 10)
+    sa.criar_turma("T3", "C3", "Prof", "ter-8-10", 10)
+    for m in ("A1", "A2", "A3"):
+        sa.criar_aluno(m, f"Aluno {m}")
+    sa.matricular("A3", "T0")
+    sa.registrar_nota("A3", "T0", 8.0)
+
+
+def _estado():
+    con = sa.obter_conexao()
+    return (con.execute("SELECT aluno_matricula, turma_codigo FROM matriculas ORDER BY 1, 2").fetchall(),
+            con.execute("SELECT codigo, vagas_ocupadas FROM turmas ORDER BY 1").fetchall())
+
+
+def test_lote_responde_como_matricular_um_a_um(banco, tmp_path):
+    _cenario()
+    em_lote = sa.matricular_lote(PEDIDOS, tamanho_lote=3)      # blocos de 3: regras valem entre blocos
+    estado_lote = _estado()
+
+    sa.fechar_conexoes()
+    sa.DB_NAME = str(tmp_path / "um_a_um.db")
+    sa.inicializar()
+    sa.limpar_caches()
+    _cenario()
+    um_a_um = [sa.matricular(m, t) for m, t in PEDIDOS]
+
+    assert em_lote == um_a_um
+    assert [r[0] for r in em_lote] == ["✅", "⚠", "✅", "❌", "❌", "❌", "⚠", "✅", "❌", "❌"]
+    assert estado_lote == _estado()
+    assert estado_lote[0] == [("A1", "T1"), ("A2", "T1"), ("A3", "T0"), ("A3", "T3")]
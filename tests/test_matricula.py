@@ -0,0 +1,32 @@
+import multiprocessing
+
+import sistema_academico as sa
+
+PROCESSOS = 4
+LIMITE = 5
+
+
+def _matricular_varios(alunos):
+    # processo filho (fork): herda DB_NAME e abre a própria conexão
+    return [sa.matricular(m, "T1") for m in alunos]
+
+
+def test_processos_concorrentes_nao_excedem_o_limite(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", LIMITE)
+    alunos = [f"A{i:02d}" for i in range(PROCESSOS * 4)]
+    for m in alunos:
+        sa.criar_aluno(m, f"Aluno {m}")
+    # cada aluno é pedido por dois processos: a segunda tentativa nunca duplica
+    pedidos = [alunos[p::PROCESSOS] + alunos[(p + 1) % PROCESSOS::PROCESSOS] for p in range(PROCESSOS)]
+    sa.fechar_conexoes()
+    with multiprocessing.get_context("fork").Pool(PROCESSOS) as pool:
+        respostas = [r for lote in pool.map(_matricular_varios, pedidos) for r in lote]
+
+    assert sum(r.startswith("✅") for r in respostas) == LIMITE
+    assert all(r.startswith(("✅", "❌ Turma sem vagas", "⚠ Aluno já está matriculado")) for r in respostas)
+    con = sa.obter_conexao()
+    assert con.execute("SELECT vagas_ocupadas FROM turmas WHERE codigo = 'T1'").fetchone()[0] == LIMITE
+    assert con.execute("""
+        SELECT COUNT(*), COUNT(DISTINCT aluno_matricula) FROM matriculas WHERE turma_codigo = 'T1'
+    """).fetchone() == (LIMITE, LIMITE)
@@ -0,0 +1,34 @@
+import sqlite3
+
+import sistema_academico as sa
+
+
+def test_matriculas_repetidas_sao_fundidas_sem_perder_nota(tmp_path):
+    caminho = str(tmp_path / "antigo.db")
+    antigo = sqlite3.connect(caminho)
+    antigo.executescript("""
+        CREATE TABLE cursos (codigo TEXT PRIMARY KEY, nome TEXT, prerequisitos TEXT);
+        CREATE TABLE turmas (codigo TEXT PRIMARY KEY, curso_codigo TEXT, professor TEXT, horario TEXT,
+                             limite_vagas INTEGER, vagas_ocupadas INTEGER);
+        CREATE TABLE alunos (matricula TEXT PRIMARY KEY, nome TEXT);
+        CREATE TABLE matriculas (id INTEGER PRIMARY KEY AUTOINCREMENT, aluno_matricula TEXT,
+                                 turma_codigo TEXT, nota REAL, frequencia REAL);
+        INSERT INTO cursos VALUES ('C1', 'Cálculo', '[]');
+        INSERT INTO turmas VALUES ('T1', 'C1', 'Prof', 'seg-8-10', 30, 2);
+        INSERT INTO alunos VALUES ('A1', 'Ana'), ('A2', 'Bia');
+        INSERT INTO matriculas (aluno_matricula, turma_codigo, nota, frequencia) VALUES
+            ('A1', 'T1', NULL, 80), ('A1', 'T1', 7.5, NULL), ('A2', 'T1', 9, 95);
+    """)
+    antigo.commit()
+    antigo.close()
+
+    sa.fechar_conexoes()
+    anterior, sa.DB_NAME = sa.DB_NAME, caminho
+    try:
+        sa.inicializar()
+        linhas = sa.obter_conexao().execute(
+            "SELECT id, aluno_matricula, nota, frequencia FROM matriculas ORDER BY id").fetchall()
+    finally:
+        sa.fechar_conexoes()
+        sa.DB_NAME = anterior
+    assert linhas == [(1, "A1", 7.5, 80.0), (3, "A2", 9.0, 95.0)]
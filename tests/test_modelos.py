@@ -0,0 +1,34 @@
+from dataclasses import astuple
+
+import pytest
+
+import sistema_academico as sa
+
+
+@pytest.mark.parametrize("modelo", [sa.Curso("C1", "Cálculo"), sa.Turma("T1", "C1", "Prof", "seg-8-10", 10),
+                                    sa.Aluno("A1", "Ana"), sa.Matricula("A1", "T1", 7.0)])
+def test_modelos_sem_dict_por_instancia(modelo):
+    assert not hasattr(modelo, "__dict__")
+    with pytest.raises(AttributeError):
+        modelo.extra = 1
+    assert repr(modelo).startswith(f"{type(modelo).__name__}(")
+
+
+def test_formatos_da_listagem_tem_os_mesmos_dados(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_curso("C2", "Física", ["C1"])
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 10)
+    sa.criar_turma("T2", "C2", "Bia", "ter-8-10", 5)
+    sa.criar_aluno("A1", "Ana")
+    assert sa.matricular("A1", "T2").startswith("❌")     # sem o pré-requisito
+    sa.matricular("A1", "T1")
+    for listar, campos in ((sa.listar_cursos, sa.CAMPOS_CURSO), (sa.listar_turmas, sa.CAMPOS_TURMA),
+                           (sa.listar_alunos, sa.CAMPOS_ALUNO)):
+        objetos = [astuple(o) for o in listar()]
+        assert listar("tuplas") == objetos
+        assert listar("colunas") == {c: [linha[i] for linha in objetos] for i, c in enumerate(campos)}
+    assert sa.listar_turmas("colunas")["vagas_ocupadas"] == [1, 0]
+    with pytest.raises(ValueError, match="Formato inválido"):
+        sa.listar_alunos("linhas")
+    with pytest.raises(ValueError, match="objetos ou tuplas"):
+        next(sa.iterar_alunos(formato="colunas"))
@@ -0,0 +1,20 @@
+"""EXPLAIN QUERY PLAN: nenhuma consulta quente pode voltar a percorrer a tabela inteira."""
+import pytest
+
+import benchmarks
+import sistema_academico as sa
+
+
+@pytest.fixture
+def con(banco):
+    benchmarks.popular_basico()
+    con = sa.obter_conexao()
+    con.execute("ANALYZE")
+    return con
+
+
+@pytest.mark.parametrize("nome", list(benchmarks.CONSULTAS_SEM_SCAN))
+def test_consulta_usa_indice(con, nome):
+    sql, params = benchmarks.CONSULTAS_SEM_SCAN[nome]
+    plano = [r[3] for r in con.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    assert not [p for p in plano if p.startswith("SCAN")], plano
@@ -0,0 +1,21 @@
+import sqlite3
+
+import sistema_academico as sa
+
+
+def test_grafo_em_cache_enxerga_alteracao_de_outro_processo(banco):
+    sa.criar_curso("C1", "Cálculo I", [])
+    sa.criar_curso("C2", "Cálculo II", ["C1"])
+    assert sa.grafo_prerequisitos().ciclo_ao_definir("C1", ["C2"]) is not None
+
+    # outro processo tira o pré-requisito, pela mesma convenção de versao_tabelas
+    outro = sqlite3.connect(banco, isolation_level=None)
+    outro.execute("BEGIN IMMEDIATE")
+    outro.execute("DELETE FROM prerequisitos WHERE curso_codigo = 'C2'")
+    outro.execute("UPDATE versao_tabelas SET versao = versao + 1 WHERE tabela = 'prerequisitos'")
+    outro.execute("COMMIT")
+    outro.close()
+
+    assert sa.grafo_prerequisitos().ciclo_ao_definir("C1", ["C2"]) is None
+    assert sa.editar_curso("C1", None, ["C2"]) == "✔ Curso atualizado."
+    assert sa.editar_curso("C2", None, ["C1"]).startswith("❌ Pré-requisitos criariam um ciclo")
@@ -0,0 +1,112 @@
+import sqlite3
+
+import pytest
+
+import sistema_academico as sa
+
+
+def _turma(banco):
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 10)
+    sa.criar_aluno("A1", "Ana")
+    assert sa.matricular("A1", "T1").startswith("✅")
+
+
+def _linhas(caminho):
+    with sqlite3.connect(caminho) as con:
+        return {
+            "alunos": con.execute("SELECT matricula, nome FROM alunos ORDER BY matricula").fetchall(),
+            "matriculas": con.execute("""
+                SELECT aluno_matricula, turma_codigo, nota, frequencia FROM matriculas ORDER BY 1, 2
+            """).fetchall(),
+        }
+
+
+def _alterar():
+    assert sa.registrar_nota("A1", "T1", 8.5).startswith("✔")
+    sa.criar_aluno("A2", "Bruno")
+    assert sa.matricular("A2", "T1").startswith("✅")
+    assert sa.editar_aluno("A1", "Ana Souza").startswith("✔")
+
+
+def test_replica_alcanca_o_principal(banco, tmp_path):
+    _turma(banco)
+    replica = str(tmp_path / "leitura.db")
+    assert sa.criar_replica(replica).startswith("✔")
+    assert sa.log_alteracoes_ativo()
+    assert _linhas(replica) == _linhas(banco)
+    _alterar()
+    with sa.AplicadorReplica(replica) as aplicador:
+        assert aplicador.atraso() > 0
+        assert aplicador.alcancar(lote=2) > 0
+        assert aplicador.atraso() == 0
+        assert aplicador.alcancar() == 0
+    assert _linhas(replica) == _linhas(banco)
+
+
+def test_arquivo_de_log_aplicado_duas_vezes(banco, tmp_path):
+    _turma(banco)
+    replica, log = str(tmp_path / "leitura.db"), str(tmp_path / "log.jsonl")
+    sa.criar_replica(replica)
+    _alterar()
+    with sa.AplicadorReplica(replica) as aplicador:
+        exportadas = sa.exportar_log(log, aplicador.posicao())
+        assert exportadas > 0
+        assert aplicador.aplicar_arquivo(log, lote=3) == exportadas
+        posicao = aplicador.posicao()
+        assert aplicador.aplicar_arquivo(log) == 0
+        assert aplicador.posicao() == posicao
+    assert _linhas(replica) == _linhas(banco)
+
+
+def test_lacuna_no_log_recusa(banco, tmp_path):
+    _turma(banco)
+    replica = str(tmp_path / "leitura.db")
+    sa.criar_replica(replica)
+    _alterar()
+    with sa.transacao() as con:
+        entradas = con.execute("SELECT seq, tabela, operacao, chave, linha FROM log_alteracoes ORDER BY seq").fetchall()
+    with sa.AplicadorReplica(replica) as aplicador:
+        with pytest.raises(sa.ErroReplica):
+            aplicador.aplicar(entradas[1:])          # falta a primeira: fora de ordem
+        assert aplicador.posicao() == entradas[0][0] - 1
+        sa.podar_log_alteracoes(entradas[0][0])
+        with pytest.raises(sa.ErroReplica):
+            aplicador.alcancar()                     # log podado além da posição
+    assert _linhas(replica)["alunos"] == [("A1", "Ana")]
+
+
+def test_log_de_outro_banco_recusa(banco, tmp_path):
+    _turma(banco)
+    replica, log = str(tmp_path / "leitura.db"), str(tmp_path / "log.jsonl")
+    sa.criar_replica(replica)
+    sa.fechar_conexoes()
+    sa.DB_NAME = str(tmp_path / "outro.db")
+    sa.inicializar()
+    _turma(sa.DB_NAME)
+    sa.definir_log_alteracoes(True)
+    _alterar()
+    sa.exportar_log(log)
+    with sa.AplicadorReplica(replica) as aplicador:
+        with pytest.raises(sa.ErroReplica, match="outro.db"):
+            aplicador.alcancar()
+        with pytest.raises(sa.ErroReplica, match="outro.db"):
+            aplicador.aplicar_arquivo(log)
+        assert aplicador.posicao() == 0
+
+
+def test_comandos_replica_e_exportar_log(banco, tmp_path, capsys):
+    _turma(banco)
+    replica, log = str(tmp_path / "leitura.db"), str(tmp_path / "log.jsonl")
+    remota = str(tmp_path / "remota.db")
+    assert sa.executar_comando(["replica", remota, "--log", log]) == 1
+    assert sa.executar_comando(["replica", replica]) == 0
+    assert sa.executar_comando(["replica", remota]) == 0
+    _alterar()
+    assert sa.executar_comando(["replica", replica]) == 0
+    assert sa.executar_comando(["exportar-log", log, "--desde", "0"]) == 0
+    assert sa.executar_comando(["replica", remota, "--log", log]) == 0
+    saida = capsys.readouterr().out.splitlines()
+    assert saida[0].startswith("❌ Réplica não encontrada")
+    assert "entrada(s) exportada(s)" in saida[-2]
+    assert _linhas(replica) == _linhas(remota) == _linhas(banco)
@@ -0,0 +1,41 @@
+import sistema_academico as sa
+
+
+def test_leitor_do_manifesto_anterior_sobrevive_a_dois_exports(banco, tmp_path):
+    pasta = str(tmp_path / "snap")
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T1", "C1", "Prof", "seg-8-10", 30)
+    sa.criar_aluno("A1", "Ana")
+    sa.matricular("A1", "T1")
+    sa.registrar_nota("A1", "T1", 7.0)
+    sa.exportar_snapshot(pasta)
+
+    with sa.Snapshot(pasta) as leitor:
+        for nota in (8.0, 9.0):
+            sa.registrar_nota("A1", "T1", nota)
+            sa.exportar_snapshot(pasta)
+        # arquivos da primeira geração já removidos; o leitor segue com os dele
+        assert leitor.relatorio_historico("A1") == [("C1", 7.0, None)]
+        assert leitor.calcular_cr("A1") == 7.0
+    with sa.Snapshot(pasta) as leitor:
+        assert leitor.relatorio_historico("A1") == [("C1", 9.0, None)]
+
+
+def test_snapshot_com_periodos_arquivados(banco, tmp_path):
+    pasta = str(tmp_path / "snap")
+    sa.criar_curso("C0", "Introdução", [])
+    sa.criar_curso("C1", "Cálculo", [])
+    sa.criar_turma("T0", "C0", "Prof", "seg-8-10", 10, "2024.2")
+    sa.criar_turma("T1", "C1", "Prof", "ter-8-10", 10, "2025.1")
+    sa.criar_aluno("A1", "Ana")
+    for turma, nota in (("T0", 8.0), ("T1", 6.0)):
+        sa.matricular("A1", turma)
+        sa.registrar_nota("A1", turma, nota)
+    assert sa.arquivar_periodo("2024.2").startswith("✔")
+    sa.exportar_snapshot(pasta)
+
+    with sa.Snapshot(pasta) as leitor:
+        assert leitor.relatorio_historico("A1") == sa.relatorio_historico("A1") == [("C1", 6.0, None)]
+        assert leitor.relatorio_historico("A1", incluir_arquivo=True) == [("C1", 6.0, None), ("C0", 8.0, None)]
+        assert sorted(sa.relatorio_historico("A1", incluir_arquivo=True)) == [("C0", 8.0, None), ("C1", 6.0, None)]
+        assert leitor.calcular_cr("A1") == sa.calcular_cr("A1") == 7.0